@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Benchmark - Answer Grading
+Compares the old grading path (json.loads of the answer key plus
+_check_answer_correct for every answer) against the precompiled
+GradingEngine, per question type. The engine is timed cold (every grader
+compiled, as on the first attempt after a restart) and warm (graders
+cached, the steady state).
+
+Before timing, every answer is graded both ways and any disagreement is
+reported, so this doubles as a check that the engine kept the old rules.
+
+Runs against a throwaway database in a temp directory; the real
+quiz_master.db is never touched.
+
+Usage:
+  python bench_grading.py                       # 90-question attempts, 200 runs
+  python bench_grading.py --questions 500 --runs 50
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import tempfile
+
+# Point the server module at a scratch database before importing it
+_tmpdir = tempfile.mkdtemp(prefix='quiz-bench-')
+os.environ['QUIZ_DATABASE'] = os.path.join(_tmpdir, 'bench.db')
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import quiz_server  # noqa: E402
+
+TYPES = ('choice', 'multichoice', 'truefalse', 'matching', 'ordering')
+
+
+def legacy_check(user_answer, correct_data, q_type, qrow):
+    """The pre-engine _check_answer_correct."""
+    if user_answer is None:
+        return False
+    if q_type == 'truefalse':
+        if isinstance(correct_data, list) and len(correct_data) > 0:
+            correct_bool = correct_data[0] == 0
+            user_bool = bool(user_answer)
+            return user_bool == correct_bool
+        return False
+    if q_type == 'choice':
+        if isinstance(correct_data, list) and len(correct_data) > 0:
+            if isinstance(user_answer, list):
+                return set(user_answer) == set(correct_data)
+            return user_answer == correct_data[0]
+        return user_answer == correct_data
+    elif q_type == 'matching':
+        if isinstance(user_answer, dict):
+            pairs = json.loads(qrow['pairs']) if qrow['pairs'] else []
+            return len(user_answer) == len(pairs)
+        return False
+    elif q_type == 'ordering':
+        if isinstance(user_answer, list):
+            expected = list(range(len(user_answer)))
+            actual = [item.get('origIndex', i) if isinstance(item, dict) else item for i, item in enumerate(user_answer)]
+            return actual == expected
+        return False
+    return False
+
+
+def legacy_grade(rows, answers):
+    """The pre-engine loop: parse each answer key, then check."""
+    out = []
+    for row, answer in zip(rows, answers):
+        correct_data = json.loads(row['correct']) if row['correct'] else []
+        out.append(legacy_check(answer, correct_data, row['type'], row))
+    return out
+
+
+def make_attempt(kind, n, first_id):
+    """n question rows of one type plus a mix of right and wrong answers.
+
+    'multichoice' is a choice question with several correct options.
+    """
+    rows, answers = [], []
+    for i in range(n):
+        row = {'id': first_id + i, 'quiz_id': 1, 'type': 'choice' if kind == 'multichoice' else kind, 'pairs': None}
+        right = random.random() < 0.6
+        if kind == 'choice':
+            row['correct'] = json.dumps([i % 4])
+            answer = i % 4 if right else (i + 1) % 4
+        elif kind == 'multichoice':
+            row['correct'] = json.dumps([0, 2, 3])
+            answer = [3, 0, 2] if right else [0, 1]
+        elif kind == 'truefalse':
+            row['correct'] = json.dumps([i % 2])
+            answer = (i % 2 == 0) == right
+        elif kind == 'matching':
+            pairs = [{'left': f'term {j}', 'right': f'definition {j}'} for j in range(4)]
+            row['correct'], row['pairs'] = json.dumps(list(range(4))), json.dumps(pairs)
+            answer = {str(j): j for j in range(4 if right else 3)}
+        else:
+            row['correct'] = json.dumps(list(range(5)))
+            order = list(range(5)) if right else [1, 0, 2, 3, 4]
+            answer = [{'text': f'step {j}', 'origIndex': j} for j in order]
+        rows.append(row)
+        answers.append(answer)
+    return rows, answers
+
+
+def best_of(fn, runs):
+    best = float('inf')
+    for _ in range(runs):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def run(questions, runs):
+    mismatches = 0
+    print(f"{'type':>12}  {'legacy us/ans':>13}  {'cold us/ans':>11}  {'warm us/ans':>11}  {'warm speedup':>12}")
+    for t, kind in enumerate(TYPES):
+        rows, answers = make_attempt(kind, questions, first_id=t * questions + 1)
+        engine = quiz_server.GradingEngine(questions)
+
+        expected = legacy_grade(rows, answers)
+        mismatches += sum(1 for a, b in zip(expected, engine.grade_many(rows, answers)) if a != b)
+
+        def cold():
+            engine.clear()
+            engine.grade_many(rows, answers)
+
+        legacy = best_of(lambda: legacy_grade(rows, answers), runs)
+        cold_t = best_of(cold, runs)
+        engine.grade_many(rows, answers)
+        warm = best_of(lambda: engine.grade_many(rows, answers), runs)
+        per = 1e6 / questions
+        print(f"{kind:>12}  {legacy * per:>13.2f}  {cold_t * per:>11.2f}  {warm * per:>11.2f}  {legacy / warm:>11.2f}x")
+    print(f"\n{mismatches} answers graded differently from the legacy path.")
+    return 1 if mismatches else 0
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark answer grading per question type.')
+    parser.add_argument('--questions', type=int, default=90, help='Questions per attempt')
+    parser.add_argument('--runs', type=int, default=200, help='Runs per type (best time is reported)')
+    args = parser.parse_args()
+    sys.exit(run(args.questions, args.runs))
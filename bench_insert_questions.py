@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Benchmark - Question Insert Path
+Compares the old one-execute-per-question insert against the batched
+executemany path in _insert_questions_for_quiz, for quizzes of 10, 100,
+1 000 and 10 000 questions.
+
+Both paths write a whole quiz in one transaction, so they commit (and
+fsync) the same number of times and only per-statement overhead differs.
+Measured result: no meaningful difference. On a WAL file database the
+ratio varies from 0.7x to 1.5x between runs, with synchronous=NORMAL or
+FULL, and sits near 1.0x on average. The executemany change is a
+simplification (each question is serialized once), not a speedup.
+
+Runs against a throwaway database in a temp directory; the real
+quiz_master.db is never touched.
+
+Usage:
+  python bench_insert_questions.py                 # default sizes, 5 runs each
+  python bench_insert_questions.py --runs 10 --sizes 100 1000
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import tempfile
+
+# Point the server module at a scratch database before importing it
+_tmpdir = tempfile.mkdtemp(prefix='quiz-bench-')
+os.environ['QUIZ_DATABASE'] = os.path.join(_tmpdir, 'bench.db')
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import quiz_server  # noqa: E402
+
+
+def make_questions(n):
+    """Build a realistic mix of AI-generated question types."""
+    questions = []
+    for i in range(n):
+        kind = ('choice', 'multiselect', 'truefalse', 'matching', 'ordering')[i % 5]
+        q = {
+            'question': f'Question {i}: which statement about topic {i % 37} is correct?',
+            'type': kind,
+            'explanation': 'Because the underlying concept works this way. ' * 3,
+        }
+        if kind == 'truefalse':
+            q['options'] = ['True', 'False']
+            q['correct'] = [random.randint(0, 1)]
+        elif kind == 'matching':
+            q['pairs'] = [{'left': f'term {j}', 'right': f'definition {j}'} for j in range(4)]
+            q['options'] = [p['right'] for p in q['pairs']]
+            q['correct'] = list(range(4))
+        elif kind == 'ordering':
+            q['options'] = [f'step {j}' for j in range(5)]
+            q['correct'] = list(range(5))
+        else:
+            q['options'] = [f'option {j} for question {i}' for j in range(4)]
+            q['correct'] = [0, 2] if kind == 'multiselect' else [1]
+            q['optionExplanations'] = [f'why option {j} is right or wrong' for j in range(4)]
+        questions.append(q)
+    return questions
+
+
+def legacy_insert(c, quiz_id, questions_list):
+    """The pre-batching implementation: one execute() per question."""
+    for idx, q in enumerate(questions_list):
+        c.execute('''INSERT INTO questions
+            (quiz_id, question_index, question_text, type, options, correct, pairs,
+             code, code_language, image, image_alt, explanation, difficulty, option_explanations)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)''',
+            (quiz_id, idx,
+             q.get('question', ''),
+             q.get('type', 'choice'),
+             json.dumps(q.get('options')) if q.get('options') is not None else None,
+             json.dumps(q.get('correct')) if q.get('correct') is not None else None,
+             json.dumps(q.get('pairs')) if q.get('pairs') is not None else None,
+             q.get('code'),
+             q.get('codeLanguage') or q.get('code_language'),
+             q.get('image'),
+             q.get('imageAlt') or q.get('image_alt'),
+             q.get('explanation'),
+             q.get('difficulty', 0),
+             json.dumps(q.get('optionExplanations')) if q.get('optionExplanations') else None))
+
+
+def time_insert(insert_fn, questions, runs):
+    """Best-of-N wall time for inserting one quiz and committing."""
+    conn = quiz_server._connect()
+    c = conn.cursor()
+    c.execute("INSERT OR IGNORE INTO users (id, username, email, password_hash, salt) "
+              "VALUES (1, 'bench', 'bench@example.com', 'x', 'x')")
+    conn.commit()
+    best = float('inf')
+    for _ in range(runs):
+        c.execute("INSERT INTO quizzes (user_id, title, questions, is_migrated) VALUES (1, 'bench', '[]', 1)")
+        quiz_id = c.lastrowid
+        start = time.perf_counter()
+        insert_fn(c, quiz_id, questions)
+        conn.commit()
+        best = min(best, time.perf_counter() - start)
+        c.execute('DELETE FROM quizzes WHERE id = ?', (quiz_id,))
+        conn.commit()
+    conn.close()
+    return best
+
+
+def run(sizes, runs):
+    print(f"{'questions':>10}  {'per-row rows/s':>15}  {'executemany rows/s':>19}  {'speedup':>8}")
+    for n in sizes:
+        questions = make_questions(n)
+        legacy = time_insert(legacy_insert, questions, runs)
+        batched = time_insert(quiz_server._insert_questions_for_quiz, questions, runs)
+        print(f"{n:>10}  {n / legacy:>15,.0f}  {n / batched:>19,.0f}  {legacy / batched:>7.2f}x")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark question insert throughput.')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10, 100, 1000, 10000],
+                        help='Quiz sizes (question counts) to benchmark')
+    parser.add_argument('--runs', type=int, default=5, help='Runs per size (best time is reported)')
+    args = parser.parse_args()
+    run(args.sizes, args.runs)
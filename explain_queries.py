@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+"""
+Index Check - EXPLAIN QUERY PLAN over every route's SQL
+Statically collects the SQL passed to execute()/executemany() in
+quiz_server.py, groups it by the Flask route (or helper) it lives in, and runs
+EXPLAIN QUERY PLAN for each statement against a database carrying the
+current schema and index set (see DB_INDEXES in quiz_server.py).
+
+Statements built with f-strings or '+=' are reconstructed as far as
+possible: module-level string constants are inlined, other interpolations
+become a single '?', and conditional '+=' fragments are all appended. Any
+statement that still cannot be prepared is listed as skipped.
+
+A table scan that is not in ALLOWED_SCANS fails the check (exit status 1),
+so this can run in CI after every schema or query change.
+
+Usage:
+  python explain_queries.py                      # scratch DB built from init_db()
+  python explain_queries.py --db quiz_master.db  # real DB (opened read-only; uses its statistics)
+  python explain_queries.py --verbose            # print every plan, not just problems
+"""
+
+import os
+import re
+import sys
+import ast
+import sqlite3
+import argparse
+import tempfile
+
+SERVER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'quiz_server.py')
+
+FULL_SCAN_RE = re.compile(r'^SCAN (?:TABLE )?(\w+)(?!.*\bUSING\b)')
+EXPLAINABLE = ('SELECT', 'WITH', 'UPDATE', 'DELETE', 'INSERT', 'REPLACE')
+BINDINGS_RE = re.compile(r'uses (\d+), and there are')
+
+# (function, table or alias) -> why a scan is acceptable there
+ALLOWED_SCANS = {
+    ('get_certifications', 'certifications'): 'a few dozen rows, all returned',
+    ('ensure_indexes', 'sqlite_master'): 'schema table, startup only',
+    ('ensure_domain_stats', 'sqlite_master'): 'schema table, startup only',
+    ('ensure_srs_stats', 'sqlite_master'): 'schema table, startup only',
+    ('rebuild_srs_user_stats', 'srs_user_stats'): 'startup rebuild, one row per user with cards',
+    ('seed_sub_objectives', 'domains'): 'startup only, small table',
+    ('seed_security_plus_questions', 'quizzes'): 'startup only, runs once per process',
+    ('admin_events', 'event_totals'): 'one row per distinct event name',
+}
+
+
+def module_constants(tree):
+    """Top-level NAME = 'string' assignments, for inlining into f-strings."""
+    consts = {}
+    for node in tree.body:
+        if (isinstance(node, ast.Assign) and len(node.targets) == 1
+                and isinstance(node.targets[0], ast.Name)
+                and isinstance(node.value, ast.Constant) and isinstance(node.value.value, str)):
+            consts[node.targets[0].id] = node.value.value
+    return consts
+
+
+def render(node, consts):
+    """Best-effort string value of a SQL expression node, or None.
+
+    consts maps names to known string values (module constants plus the
+    enclosing function's own SQL builders).
+    """
+    if isinstance(node, ast.Constant) and isinstance(node.value, str):
+        return node.value
+    if isinstance(node, ast.JoinedStr):
+        parts = []
+        for value in node.values:
+            if isinstance(value, ast.Constant):
+                parts.append(value.value)
+            elif isinstance(value.value, ast.Name) and consts.get(value.value.id) is not None:
+                parts.append(consts[value.value.id])
+            else:
+                parts.append('?')
+        return ''.join(parts)
+    if isinstance(node, ast.Name):
+        return consts.get(node.id)
+    if isinstance(node, ast.BinOp) and isinstance(node.op, ast.Add):
+        left, right = render(node.left, consts), render(node.right, consts)
+        return left + right if left is not None and right is not None else None
+    return None
+
+
+def route_of(func):
+    for dec in func.decorator_list:
+        if (isinstance(dec, ast.Call) and isinstance(dec.func, ast.Attribute)
+                and dec.func.attr == 'route' and dec.args and isinstance(dec.args[0], ast.Constant)):
+            methods = next((kw.value for kw in dec.keywords if kw.arg == 'methods'), None)
+            verbs = ','.join(m.value for m in methods.elts) if isinstance(methods, ast.List) else 'GET'
+            return f'{verbs} {dec.args[0].value}'
+    return None
+
+
+def collect(path):
+    """Yield (function, route, lineno, sql) for every statically known statement."""
+    tree = ast.parse(open(path).read(), path)
+    consts = module_constants(tree)
+    for top in tree.body:
+        if not isinstance(top, ast.FunctionDef) and not isinstance(top, ast.ClassDef):
+            continue
+        funcs = [top] if isinstance(top, ast.FunctionDef) else [n for n in top.body if isinstance(n, ast.FunctionDef)]
+        for func in funcs:
+            route = route_of(func)
+            # Name -> accumulated string for `sql = '...'; sql += '...'` builders
+            builders = dict(consts)
+            nodes = sorted((n for n in ast.walk(func) if hasattr(n, 'lineno')),
+                           key=lambda n: (n.lineno, n.col_offset))
+            for node in nodes:
+                if isinstance(node, ast.Assign) and len(node.targets) == 1 and isinstance(node.targets[0], ast.Name):
+                    value = render(node.value, builders)
+                    if value is not None:
+                        builders[node.targets[0].id] = value
+                elif isinstance(node, ast.AugAssign) and isinstance(node.target, ast.Name) \
+                        and builders.get(node.target.id) is not None:
+                    value = render(node.value, builders)
+                    builders[node.target.id] = builders[node.target.id] + value if value is not None else None
+                elif (isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute)
+                      and node.func.attr in ('execute', 'executemany') and node.args):
+                    arg = node.args[0]
+                    sql = render(arg, builders)
+                    yield func.name, route, node.lineno, sql
+
+
+def explain(conn, sql):
+    """Return the plan detail lines, binding NULL for every parameter."""
+    n = sql.count('?')
+    for _ in range(2):
+        try:
+            return [row[3] for row in conn.execute('EXPLAIN QUERY PLAN ' + sql, [None] * n)]
+        except sqlite3.ProgrammingError as e:
+            m = BINDINGS_RE.search(str(e))
+            if not m:
+                raise
+            n = int(m.group(1))
+    raise sqlite3.ProgrammingError('could not bind parameters')
+
+
+def scratch_db():
+    """Create a throwaway DB with the server's schema and seed data."""
+    tmpdir = tempfile.mkdtemp(prefix='quiz-explain-')
+    os.environ['QUIZ_DATABASE'] = os.path.join(tmpdir, 'explain.db')
+    sys.path.insert(0, os.path.dirname(SERVER))
+    import quiz_server  # noqa: F401  (import runs init_db and the seeders)
+    return os.environ['QUIZ_DATABASE']
+
+
+def run(db_path=None, verbose=False):
+    db_path = db_path or scratch_db()
+    conn = sqlite3.connect(f'file:{db_path}?mode=ro', uri=True)
+
+    checked, skipped, failures, allowed = 0, [], [], []
+    seen = set()
+    for func, route, lineno, sql in collect(SERVER):
+        where = f"{func}() line {lineno}" + (f" [{route}]" if route else '')
+        if sql is None:
+            skipped.append((where, 'SQL built dynamically'))
+            continue
+        sql = sql.strip()
+        if not sql.upper().startswith(EXPLAINABLE) or (func, sql) in seen:
+            continue
+        seen.add((func, sql))
+        try:
+            plan = explain(conn, sql)
+        except sqlite3.Error as e:
+            skipped.append((where, str(e)))
+            continue
+        checked += 1
+        scans = [m.group(1) for m in (FULL_SCAN_RE.match(p) for p in plan) if m and m.group(1) != 'CONSTANT']
+        bad = [t for t in scans if (func, t) not in ALLOWED_SCANS]
+        if bad or verbose:
+            print(f"{'FULL SCAN' if bad else 'ok':>9}  {where}")
+            print('           ' + ' '.join(sql.split())[:160])
+            for p in plan:
+                print(f'             {p}')
+        if bad:
+            failures.append((where, bad))
+        allowed += [(where, t) for t in scans if (func, t) in ALLOWED_SCANS]
+    conn.close()
+
+    print(f"\nChecked {checked} statements; {len(failures)} with full scans, "
+          f"{len(allowed)} allowed scans, {len(skipped)} skipped.")
+    for where, table in allowed:
+        print(f"  allowed: {table} in {where} ({ALLOWED_SCANS[(where.split('()')[0], table)]})")
+    if verbose:
+        for where, reason in skipped:
+            print(f"  skipped: {where}: {reason}")
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='EXPLAIN QUERY PLAN every SQL statement in quiz_server.py.')
+    parser.add_argument('--db', help='Database to explain against (default: scratch DB from init_db)')
+    parser.add_argument('--verbose', action='store_true', help='Print all plans and skipped statements')
+    args = parser.parse_args()
+    sys.exit(run(db_path=args.db, verbose=args.verbose))
@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+"""
+Phase 1.3 - Migrate Question Blobs
+Finishes moving quizzes off the legacy quizzes.questions JSON blob and into
+the normalized questions table, then (optionally) empties the blobs so the
+database stops carrying every question twice.
+
+Safe to run against the live database while the server is up: work is done
+in small batches, each in its own short write transaction, and every batch
+re-checks is_migrated, so the script can be interrupted and re-run at any
+point and simply resumes where it stopped.
+
+Once it reports no unmigrated quizzes, start the server with
+QUIZ_WRITE_QUESTION_BLOB=0 so saves no longer write the blob either.
+
+Usage:
+  python migrate_question_blobs.py --dry-run         # Preview what would be migrated / reclaimed
+  python migrate_question_blobs.py                   # Migrate remaining quizzes
+  python migrate_question_blobs.py --strip-blobs     # ...and empty the blobs of migrated quizzes
+  python migrate_question_blobs.py --strip-blobs --vacuum   # ...and shrink the file afterwards
+"""
+
+import os
+import time
+import shutil
+import sqlite3
+import json
+import argparse
+
+DATABASE = os.environ.get('QUIZ_DATABASE', '/home/davidhamilton/quiz-master-pro/quiz_master.db')
+
+QUESTION_INSERT_SQL = '''INSERT INTO questions
+    (quiz_id, question_index, question_text, type, options, correct, pairs,
+     code, code_language, image, image_alt, explanation, difficulty, option_explanations)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)'''
+
+def get_db():
+    conn = sqlite3.connect(DATABASE, timeout=30, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+def json_or_none(value):
+    return json.dumps(value) if value is not None else None
+
+def question_row(quiz_id, idx, q):
+    """Same serialization as quiz_server._question_row."""
+    get = q.get
+    return (quiz_id, idx,
+            get('question', ''),
+            get('type', 'choice'),
+            json_or_none(get('options')),
+            json_or_none(get('correct')),
+            json_or_none(get('pairs')),
+            get('code'),
+            get('codeLanguage') or get('code_language'),
+            get('image'),
+            get('imageAlt') or get('image_alt'),
+            get('explanation'),
+            get('difficulty', 0),
+            json_or_none(get('optionExplanations') or None))
+
+def parse_blob(blob):
+    """Return the question list from a blob, or None if it cannot be migrated."""
+    try:
+        questions = json.loads(blob)
+    except (json.JSONDecodeError, TypeError):
+        return None
+    if not isinstance(questions, list) or not all(isinstance(q, dict) for q in questions):
+        return None
+    return questions
+
+def survey(c):
+    """Count what a real run would touch."""
+    c.execute('SELECT id, questions FROM quizzes WHERE is_migrated = 0 OR is_migrated IS NULL')
+    pending, empty, broken, question_total = 0, 0, [], 0
+    for row in c.fetchall():
+        questions = parse_blob(row['questions'])
+        if questions is None:
+            broken.append(row['id'])
+        elif not questions:
+            empty += 1
+        else:
+            pending += 1
+            question_total += len(questions)
+    c.execute("""SELECT COUNT(*) AS cnt, COALESCE(SUM(LENGTH(questions)), 0) AS bytes
+                 FROM quizzes WHERE is_migrated = 1 AND questions != '[]'""")
+    blobs = c.fetchone()
+    return pending, empty, broken, question_total, blobs['cnt'], blobs['bytes']
+
+def migrate_batch(c, batch_size, skip_ids):
+    """Migrate up to batch_size quizzes in one transaction. Returns (migrated, questions, failed_ids)."""
+    c.execute('BEGIN IMMEDIATE')
+    try:
+        placeholders = ','.join('?' * len(skip_ids))
+        exclude = f' AND id NOT IN ({placeholders})' if skip_ids else ''
+        c.execute(f'''SELECT id, questions FROM quizzes
+                      WHERE (is_migrated = 0 OR is_migrated IS NULL){exclude}
+                      ORDER BY id LIMIT ?''', (*skip_ids, batch_size))
+        migrated, question_total, failed = 0, 0, []
+        for row in c.fetchall():
+            questions = parse_blob(row['questions'])
+            if questions is None:
+                failed.append(row['id'])
+                continue
+            # An unmigrated quiz should own no rows; clear strays so questions are never duplicated
+            c.execute('DELETE FROM questions WHERE quiz_id = ?', (row['id'],))
+            c.executemany(QUESTION_INSERT_SQL, [question_row(row['id'], idx, q) for idx, q in enumerate(questions)])
+            c.execute('UPDATE quizzes SET is_migrated = 1 WHERE id = ?', (row['id'],))
+            migrated += 1
+            question_total += len(questions)
+        c.execute('COMMIT')
+    except Exception:
+        c.execute('ROLLBACK')
+        raise
+    return migrated, question_total, failed
+
+def strip_batch(c, batch_size):
+    """Empty the blobs of up to batch_size migrated quizzes. Returns rows changed."""
+    c.execute('BEGIN IMMEDIATE')
+    c.execute('''UPDATE quizzes SET questions = '[]'
+                 WHERE id IN (SELECT id FROM quizzes WHERE is_migrated = 1 AND questions != '[]' LIMIT ?)''',
+              (batch_size,))
+    changed = c.rowcount
+    c.execute('COMMIT')
+    return changed
+
+def run(dry_run=True, batch_size=100, pause_ms=50, strip_blobs=False, vacuum=False):
+    conn = get_db()
+    c = conn.cursor()
+
+    print(f"{'[DRY RUN] ' if dry_run else ''}Surveying {DATABASE}...\n")
+    pending, empty, broken, question_total, blob_count, blob_bytes = survey(c)
+    print(f"  Unmigrated quizzes:        {pending + empty + len(broken)}")
+    print(f"    with questions:          {pending} ({question_total} questions)")
+    print(f"    empty:                   {empty}")
+    print(f"    unparseable (skipped):   {len(broken)}{' ' + str(broken[:20]) if broken else ''}")
+    print(f"  Migrated quizzes still carrying a blob: {blob_count} ({blob_bytes / 1024 / 1024:.1f} MiB)\n")
+
+    if dry_run:
+        conn.close()
+        print("Dry run complete. Run without --dry-run to execute.")
+        return
+
+    if strip_blobs and blob_count + pending + empty:
+        # Stripping is the only irreversible step: keep a copy of the blobs
+        backup_path = DATABASE + '.bak'
+        print(f"Backing up database to {backup_path}...")
+        c.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+        shutil.copy2(DATABASE, backup_path)
+        print("Backup complete.\n")
+
+    total = pending + empty
+    done, questions_done, failed = 0, 0, []
+    start = time.time()
+    while True:
+        migrated, questions, batch_failed = migrate_batch(c, batch_size, failed)
+        failed += batch_failed
+        if not migrated and not batch_failed:
+            break
+        if not migrated:
+            continue
+        done += migrated
+        questions_done += questions
+        rate = done / max(time.time() - start, 1e-6)
+        print(f"  Progress: {done}/{total} quizzes, {questions_done} questions ({rate:.0f} quizzes/s)")
+        time.sleep(pause_ms / 1000)
+    print(f"\nMigrated {done} quizzes ({questions_done} questions).")
+    if failed:
+        print(f"Skipped {len(failed)} quizzes with unparseable blobs: {failed[:20]}")
+
+    if strip_blobs:
+        stripped = 0
+        while True:
+            changed = strip_batch(c, batch_size)
+            if not changed:
+                break
+            stripped += changed
+            print(f"  Stripped blobs: {stripped}")
+            time.sleep(pause_ms / 1000)
+        print(f"\nEmptied {stripped} question blobs.")
+
+    if vacuum:
+        print("Vacuuming (needs free disk roughly the size of the database)...")
+        c.execute('VACUUM')
+        print("Vacuum complete.")
+
+    conn.close()
+    print(f"\nDone. {DATABASE}: {os.path.getsize(DATABASE) / 1024 / 1024:.1f} MiB")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Migrate legacy quiz question blobs to the questions table.')
+    parser.add_argument('--dry-run', action='store_true', help='Preview changes without modifying the database')
+    parser.add_argument('--batch-size', type=int, default=100, help='Quizzes per write transaction')
+    parser.add_argument('--pause-ms', type=int, default=50, help='Sleep between batches to leave room for live writes')
+    parser.add_argument('--strip-blobs', action='store_true',
+                        help="Replace quizzes.questions with '[]' on migrated quizzes (backs up DB first)")
+    parser.add_argument('--vacuum', action='store_true', help='VACUUM afterwards to return freed pages to the OS')
+    args = parser.parse_args()
+    run(dry_run=args.dry_run, batch_size=args.batch_size, pause_ms=args.pause_ms,
+        strip_blobs=args.strip_blobs, vacuum=args.vacuum)
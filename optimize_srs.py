@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+"""
+SRS - Fit Per-User FSRS Weights
+Fits the 17 FSRS weights of each user with enough review history in
+srs_review_log and stores them in srs_user_params. From then on the server
+schedules that user's cards with FSRS and their own weights instead of the
+default scheduler (QUIZ_SRS_SCHEDULER).
+
+The fit minimizes the log loss of FSRS's recall prediction for every review
+after a card's first, replaying all of a user's cards at once as NumPy
+arrays (one row per card, one column per review). Only cards whose whole
+history is in the log are used; cards first reviewed before the log existed
+have no known starting state. Weights are saved only when they predict the
+user's reviews better than the defaults.
+
+Requires NumPy (pip install numpy); the server itself does not. Safe to run
+while the server is up: reads are plain SELECTs and each user's weights are
+written in one short transaction.
+
+Usage:
+  python optimize_srs.py --dry-run             # Fit and report; write nothing
+  python optimize_srs.py                       # Fit every user with enough reviews
+  python optimize_srs.py --user 42 --min-reviews 50 --iterations 500
+"""
+
+import os
+import sys
+import json
+import time
+import sqlite3
+import argparse
+from datetime import datetime
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import srs_scheduler as srs  # noqa: E402
+
+DATABASE = os.environ.get('QUIZ_DATABASE', '/home/davidhamilton/quiz-master-pro/quiz_master.db')
+
+MAX_REVIEWS_PER_CARD = 64   # longer histories are truncated
+FD_STEP = 1e-4              # finite-difference step, as a fraction of each weight's range
+
+def get_db():
+    conn = sqlite3.connect(DATABASE, timeout=30)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+def candidate_users(c, min_reviews, user_id=None):
+    """[(user_id, review_count)] for users with at least min_reviews logged reviews."""
+    sql = 'SELECT user_id, COUNT(*) AS cnt FROM srs_review_log'
+    params = []
+    if user_id is not None:
+        sql += ' WHERE user_id = ?'
+        params.append(user_id)
+    sql += ' GROUP BY user_id HAVING COUNT(*) >= ?'
+    params.append(min_reviews)
+    c.execute(sql, params)
+    return [(row['user_id'], row['cnt']) for row in c.fetchall()]
+
+def load_histories(c, user_id):
+    """The user's complete card histories as (ratings, elapsed, mask) arrays, or None.
+
+    ratings[i, k] is the FSRS rating of card i's k-th review, elapsed[i, k]
+    the days since review k - 1, and mask marks real reviews (rows are padded
+    at the end).
+    """
+    c.execute('''SELECT card_id, quality, reviewed_at, elapsed_days FROM srs_review_log
+                 WHERE user_id = ? ORDER BY card_id, reviewed_at, id''', (user_id,))
+    histories, current, current_card = [], None, None
+    for row in c.fetchall():
+        if row['card_id'] != current_card:
+            current_card = row['card_id']
+            # A card's history is usable only if its first logged review was its first review
+            current = [] if row['elapsed_days'] is None else None
+            if current is not None:
+                histories.append(current)
+        if current is not None and len(current) < MAX_REVIEWS_PER_CARD:
+            current.append((srs.fsrs_rating(row['quality']), row['elapsed_days'] or 0.0))
+    histories = [h for h in histories if len(h) >= 2]
+    if not histories:
+        return None
+    length = max(len(h) for h in histories)
+    ratings = np.ones((len(histories), length), dtype=np.int64)
+    elapsed = np.zeros((len(histories), length))
+    mask = np.zeros((len(histories), length), dtype=bool)
+    for i, h in enumerate(histories):
+        ratings[i, :len(h)] = [r for r, _ in h]
+        elapsed[i, :len(h)] = [e for _, e in h]
+        mask[i, :len(h)] = True
+    return ratings, elapsed, mask
+
+def replay(w, ratings, elapsed, mask):
+    """The model of srs.FSRSScheduler, vectorized over cards.
+
+    Returns (stability, difficulty, recall) arrays shaped like ratings:
+    the memory state after each review and, for every review after the
+    first, the recall probability predicted for it. Padding keeps the last
+    real state.
+    """
+    first = ratings[:, 0]
+    stability = w[first - 1]
+    d0_easy = w[4] - w[5] * (srs.EASY - 3)
+    difficulty = np.clip(w[4] - w[5] * (first - 3), 1, 10)
+    stabilities, difficulties, recalls = [stability], [difficulty], [np.ones_like(stability)]
+    for k in range(1, ratings.shape[1]):
+        m = mask[:, k]
+        g, t = ratings[:, k], elapsed[:, k]
+        r = (1 + srs.FACTOR * t / stability) ** srs.DECAY
+        recalled = g > srs.AGAIN
+        recall = stability * (1 + np.exp(w[8]) * (11 - difficulty) * stability ** -w[9]
+                              * (np.exp(w[10] * (1 - r)) - 1)
+                              * np.where(g == srs.HARD, w[15], 1) * np.where(g == srs.EASY, w[16], 1))
+        forget = np.minimum(w[11] * difficulty ** -w[12] * ((stability + 1) ** w[13] - 1)
+                            * np.exp(w[14] * (1 - r)), stability)
+        new_stability = np.clip(np.where(recalled, recall, forget), 0.01, srs.MAX_INTERVAL)
+        new_difficulty = np.clip(w[7] * d0_easy + (1 - w[7]) * (difficulty - w[6] * (g - 3)), 1, 10)
+        stability = np.where(m, new_stability, stability)
+        difficulty = np.where(m, new_difficulty, difficulty)
+        stabilities.append(stability)
+        difficulties.append(difficulty)
+        recalls.append(r)
+    return np.stack(stabilities, 1), np.stack(difficulties, 1), np.stack(recalls, 1)
+
+def log_loss(w, ratings, elapsed, mask):
+    """Mean log loss of FSRS recall predictions over every review after a card's first."""
+    _, _, r = replay(w, ratings, elapsed, mask)
+    p = np.clip(r[:, 1:], 1e-6, 1 - 1e-6)
+    m = mask[:, 1:]
+    total = -np.where(ratings[:, 1:] > srs.AGAIN, np.log(p), np.log(1 - p))[m].sum()
+    return total / max(int(m.sum()), 1)
+
+def fit(data, iterations, learning_rate):
+    """Adam on finite-difference gradients, in weights scaled to [0, 1] by WEIGHT_BOUNDS."""
+    low = np.array([lo for lo, _ in srs.WEIGHT_BOUNDS])
+    span = np.array([hi - lo for lo, hi in srs.WEIGHT_BOUNDS])
+    u = (np.array(srs.DEFAULT_WEIGHTS) - low) / span
+    loss = lambda u: log_loss(low + span * u, *data)
+    m1, m2 = np.zeros_like(u), np.zeros_like(u)
+    best_u, best = u.copy(), loss(u)
+    for step in range(1, iterations + 1):
+        grad = np.empty_like(u)
+        for j in range(len(u)):
+            e = np.zeros_like(u)
+            e[j] = FD_STEP
+            grad[j] = (loss(np.clip(u + e, 0, 1)) - loss(np.clip(u - e, 0, 1))) / (2 * FD_STEP)
+        m1 = 0.9 * m1 + 0.1 * grad
+        m2 = 0.999 * m2 + 0.001 * grad ** 2
+        u = np.clip(u - learning_rate * (m1 / (1 - 0.9 ** step)) / (np.sqrt(m2 / (1 - 0.999 ** step)) + 1e-8), 0, 1)
+        current = loss(u)
+        if current < best:
+            best_u, best = u.copy(), current
+    return low + span * best_u, best
+
+def save(c, user_id, weights, review_count, loss, baseline):
+    c.execute('BEGIN IMMEDIATE')
+    c.execute('''INSERT INTO srs_user_params
+        (user_id, scheduler, weights, review_count, loss, baseline_loss, fitted_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT(user_id) DO UPDATE SET
+        scheduler = excluded.scheduler, weights = excluded.weights, review_count = excluded.review_count,
+        loss = excluded.loss, baseline_loss = excluded.baseline_loss, fitted_at = excluded.fitted_at''',
+        (user_id, srs.FSRSScheduler.name, json.dumps([round(float(x), 4) for x in weights]),
+         review_count, loss, baseline, datetime.now()))
+    c.execute('COMMIT')
+
+def run(dry_run=True, min_reviews=200, user_id=None, iterations=200, learning_rate=0.02):
+    if np is None:
+        sys.exit('optimize_srs.py needs NumPy: pip install numpy')
+    conn = get_db()
+    conn.isolation_level = None
+    c = conn.cursor()
+
+    users = candidate_users(c, min_reviews, user_id)
+    print(f"{'[DRY RUN] ' if dry_run else ''}{len(users)} users with at least {min_reviews} reviews in {DATABASE}\n")
+    saved = 0
+    for uid, review_count in users:
+        data = load_histories(c, uid)
+        if data is None:
+            print(f"  user {uid}: no complete card histories yet, skipped")
+            continue
+        start = time.time()
+        baseline = log_loss(np.array(srs.DEFAULT_WEIGHTS), *data)
+        weights, loss = fit(data, iterations, learning_rate)
+        improved = loss < baseline
+        print(f"  user {uid}: {data[0].shape[0]} cards, {int(data[2].sum())} reviews, "
+              f"log loss {baseline:.4f} -> {loss:.4f} ({time.time() - start:.1f}s)"
+              f"{'' if improved else ', no better than defaults, not saved'}")
+        if improved and not dry_run:
+            save(c, uid, weights, review_count, loss, baseline)
+            saved += 1
+    conn.close()
+    print(f"\n{'Dry run complete. ' if dry_run else ''}Saved weights for {saved} users.")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Fit per-user FSRS weights from srs_review_log.')
+    parser.add_argument('--dry-run', action='store_true', help='Fit and report without writing srs_user_params')
+    parser.add_argument('--min-reviews', type=int, default=200, help='Skip users with fewer logged reviews')
+    parser.add_argument('--user', type=int, help='Fit one user only')
+    parser.add_argument('--iterations', type=int, default=200, help='Optimizer steps per user')
+    parser.add_argument('--learning-rate', type=float, default=0.02, help='Adam step size (weights scaled to 0-1)')
+    args = parser.parse_args()
+    run(dry_run=args.dry_run, min_reviews=args.min_reviews, user_id=args.user,
+        iterations=args.iterations, learning_rate=args.learning_rate)
@@ -6,12 +6,14 @@ import os
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 
-from flask import Flask, request, jsonify, send_from_directory
+from flask import Flask, request, jsonify, send_from_directory, g, has_app_context, has_request_context
 from flask_cors import CORS
 import sqlite3
 import hashlib
+import hmac
 import secrets
 import json
+import base64
 import os
 import random
 import math
@@ -19,9 +21,16 @@ import re
 import io
 import tempfile
 import threading
+import queue
+import time
+import atexit
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeoutError
 from datetime import datetime, timedelta
 from functools import wraps
 
+import srs_scheduler
+
 app = Flask(__name__, static_folder=os.path.join(BASE_DIR, 'static'))
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16 MB upload limit
 CORS(app)
@@ -36,14 +45,11 @@ def bad_request_handler(e):
 def too_large(e):
     return jsonify({'error': 'File too large. Maximum upload size is 16MB.'}), 413
 
-DATABASE = os.path.join(BASE_DIR, 'quiz_master.db')
+DATABASE = os.environ.get('QUIZ_DATABASE', os.path.join(BASE_DIR, 'quiz_master.db'))
 
 # Admin token for protected admin endpoints (set this to a secret value in production)
 ADMIN_TOKEN = os.environ.get('QUIZ_ADMIN_TOKEN', 'change-me-in-production')
 
-# DB write lock for SQLite thread safety
-_db_write_lock = threading.Lock()
-
 # Rate limiting (Flask-Limiter)
 try:
     from flask_limiter import Limiter
@@ -75,16 +81,900 @@ def serve_static(filename):
 
 # === Database ===
 
-def get_db():
+# Connection pool sizing (override via environment on the web app config page)
+DB_POOL_SIZE = int(os.environ.get('QUIZ_DB_POOL_SIZE', '8'))
+DB_POOL_TIMEOUT = float(os.environ.get('QUIZ_DB_POOL_TIMEOUT', '5'))
+
+def _env_choice(name, default, choices):
+    value = os.environ.get(name, default).upper()
+    if value not in choices:
+        print(f"Warning: {name}={value!r} is not one of {sorted(choices)}, using {default}")
+        return default
+    return value
+
+# SQLite tuning profile. journal_mode is stored in the database file, so init_db()
+# sets it once; the rest are per-connection and applied by _connect().
+# WAL lets readers (/api/quizzes) proceed while a writer holds the lock, and
+# synchronous=NORMAL is durable under WAL except for power loss on the last commit.
+DB_PRAGMAS = {
+    'journal_mode': _env_choice('QUIZ_DB_JOURNAL_MODE', 'WAL', {'WAL', 'DELETE', 'TRUNCATE', 'PERSIST'}),
+    'synchronous': _env_choice('QUIZ_DB_SYNCHRONOUS', 'NORMAL', {'OFF', 'NORMAL', 'FULL', 'EXTRA'}),
+    'cache_size': int(os.environ.get('QUIZ_DB_CACHE_SIZE', '-16000')),  # negative = KiB (16 MB)
+    'mmap_size': int(os.environ.get('QUIZ_DB_MMAP_SIZE', str(64 * 1024 * 1024))),
+    'temp_store': _env_choice('QUIZ_DB_TEMP_STORE', 'MEMORY', {'DEFAULT', 'FILE', 'MEMORY'}),
+    'busy_timeout': int(os.environ.get('QUIZ_DB_BUSY_TIMEOUT', '5000')),  # ms
+}
+_CONNECTION_PRAGMAS = ('synchronous', 'cache_size', 'mmap_size', 'temp_store', 'busy_timeout')
+
+def _connect():
     conn = sqlite3.connect(DATABASE, check_same_thread=False)
     conn.row_factory = sqlite3.Row
     conn.execute('PRAGMA foreign_keys = ON')
+    for name in _CONNECTION_PRAGMAS:
+        conn.execute(f'PRAGMA {name} = {DB_PRAGMAS[name]}')
     return conn
 
+def _read_pragmas(conn):
+    """Report the PRAGMA values actually in effect on a connection."""
+    report = {}
+    for name in ('journal_mode',) + _CONNECTION_PRAGMAS + ('foreign_keys',):
+        row = conn.execute(f'PRAGMA {name}').fetchone()
+        report[name] = row[0] if row else None
+    return report
+
+class _PooledConnection:
+    """Proxy handed out by get_db(). close() hands the connection back to the pool.
+
+    Anything not overridden here (cursor, commit, execute, ...) goes straight
+    to the underlying sqlite3 connection, so existing call sites are unchanged.
+    """
+    __slots__ = ('_conn', '_pool', '_overflow', '_refs', '_bound')
+
+    def __init__(self, conn, pool, overflow=False):
+        self._conn = conn
+        self._pool = pool
+        self._overflow = overflow
+        self._refs = 0
+        self._bound = False
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    def cursor(self):
+        return _sql_profiler.wrap(self._conn.cursor())
+
+    def execute(self, sql, params=()):
+        return self.cursor().execute(sql, params)
+
+    def close(self):
+        self._refs -= 1
+        if self._refs > 0:
+            return  # still in use by an outer caller in this request
+        self._refs = 0
+        # Uncommitted work is discarded, same as closing a real connection
+        if self._conn.in_transaction:
+            self._conn.rollback()
+        if not self._bound:
+            self._pool.checkin(self)
+
+class ConnectionPool:
+    """Fixed-size LIFO pool of SQLite connections shared by all request threads.
+
+    Most recently used connections are handed out first so their page cache
+    stays warm. When every connection is checked out, callers wait up to
+    `timeout` seconds and then fall back to a one-off overflow connection
+    rather than failing the request.
+    """
+
+    def __init__(self, size, timeout):
+        self.size = max(1, size)
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._reset()
+        self._stats = {'checkouts': 0, 'reused': 0, 'created': 0, 'waits': 0,
+                       'overflow': 0, 'discarded': 0}
+
+    def _reset(self):
+        self._idle = queue.LifoQueue()
+        self._open = 0
+        self._pid = os.getpid()
+
+    def _bump(self, key):
+        with self._lock:
+            self._stats[key] += 1
+
+    def _check_fork(self):
+        # SQLite connections must not cross a fork; forked WSGI workers start fresh
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._reset()
+
+    def _new(self):
+        self._bump('created')
+        return _PooledConnection(_connect(), self)
+
+    def _healthy(self, pooled):
+        try:
+            pooled._conn.execute('SELECT 1')
+            return True
+        except sqlite3.Error:
+            return False
+
+    def prewarm(self):
+        """Open connections up to the pool size so the first requests don't pay for it."""
+        self._check_fork()
+        while True:
+            with self._lock:
+                if self._open >= self.size:
+                    return
+                self._open += 1
+            self._idle.put(self._new())
+
+    def checkout(self):
+        self._check_fork()
+        self._bump('checkouts')
+        pooled = None
+        try:
+            pooled = self._idle.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                can_open = self._open < self.size
+                if can_open:
+                    self._open += 1
+            if can_open:
+                return self._new()
+            self._bump('waits')
+            try:
+                pooled = self._idle.get(timeout=self.timeout)
+            except queue.Empty:
+                self._bump('overflow')
+                return _PooledConnection(_connect(), self, overflow=True)
+
+        if not self._healthy(pooled):
+            self._bump('discarded')
+            try:
+                pooled._conn.close()
+            except sqlite3.Error:
+                pass
+            return self._new()
+        self._bump('reused')
+        return pooled
+
+    def checkin(self, pooled):
+        if pooled._conn.in_transaction:
+            pooled._conn.rollback()
+        if pooled._overflow:
+            pooled._conn.close()
+            return
+        self._idle.put(pooled)
+
+    def stats(self):
+        with self._lock:
+            s = dict(self._stats)
+            s['size'] = self.size
+            s['open'] = self._open
+        s['idle'] = self._idle.qsize()
+        s['reuse_ratio'] = round(s['reused'] / s['checkouts'], 3) if s['checkouts'] else 0
+        return s
+
+_db_pool = ConnectionPool(DB_POOL_SIZE, DB_POOL_TIMEOUT)
+
+def get_db():
+    """Return a pooled connection.
+
+    Within a request the same connection is shared by token_required and the
+    view (callers still pair every get_db() with close()), and it goes back to
+    the pool when the app context tears down.
+    """
+    if has_app_context():
+        pooled = g.get('_db_conn')
+        if pooled is None:
+            pooled = _db_pool.checkout()
+            pooled._bound = True
+            g._db_conn = pooled
+    else:
+        pooled = _db_pool.checkout()
+    pooled._refs += 1
+    return pooled
+
+@app.teardown_appcontext
+def _release_db(exc):
+    pooled = g.pop('_db_conn', None)
+    if pooled is not None:
+        pooled._bound = False
+        pooled._refs = 0
+        _db_pool.checkin(pooled)
+
+# === Single Writer ===
+
+# Max jobs group-committed in one transaction, optional wait for more jobs to
+# join a batch (0 = only take what is already queued), and how long a request
+# waits for its job before giving up.
+DB_WRITE_BATCH = int(os.environ.get('QUIZ_DB_WRITE_BATCH', '64'))
+DB_WRITE_WINDOW = float(os.environ.get('QUIZ_DB_WRITE_WINDOW_MS', '0')) / 1000
+DB_WRITE_TIMEOUT = float(os.environ.get('QUIZ_DB_WRITE_TIMEOUT', '30'))
+
+class DBWriter:
+    """One background thread that owns the only writing connection.
+
+    Request threads submit jobs: callables that take a cursor (plus any extra
+    args) and return a value. The writer takes every job that is queued,
+    runs them in one transaction with a SAVEPOINT per job so a failing job
+    only rolls back its own work, commits once, and then resolves each job's
+    future. Throughput grows with batch size instead of being one fsync per
+    request, and writers never race each other for the SQLite lock.
+
+    Jobs must not commit or roll back themselves.
+    """
+    _STOP = object()
+
+    def __init__(self, max_batch, window):
+        self.max_batch = max(1, max_batch)
+        self.window = window
+        self._lock = threading.Lock()
+        self._pid = None
+        self._jobs = None
+        self._thread = None
+        self._stats = {'jobs': 0, 'failed': 0, 'batches': 0, 'largest_batch': 0}
+
+    def _ensure_started(self):
+        if self._pid == os.getpid() and self._thread.is_alive():
+            return
+        with self._lock:
+            # Threads don't survive a fork, so each WSGI worker starts its own
+            if self._pid != os.getpid() or not self._thread.is_alive():
+                self._jobs = queue.Queue()
+                self._pid = os.getpid()
+                self._thread = threading.Thread(target=self._run, name='db-writer', daemon=True)
+                self._thread.start()
+
+    def submit(self, fn, *args):
+        """Queue fn(cursor, *args) and return a Future for its result."""
+        self._ensure_started()
+        if threading.current_thread() is self._thread:
+            raise RuntimeError('DBWriter jobs cannot submit further jobs')
+        fut = Future()
+        self._jobs.put((fn, args, fut, _sql_profiler.current_route()))
+        return fut
+
+    def run(self, fn, *args):
+        """Submit a job and wait for it to be committed; re-raises job errors."""
+        start = time.perf_counter()
+        try:
+            return self.submit(fn, *args).result(timeout=DB_WRITE_TIMEOUT)
+        finally:
+            # Time spent waiting on the writer is SQL time for the calling route
+            if _sql_profiler.enabled and has_request_context():
+                g._sql_ms = g.get('_sql_ms', 0.0) + (time.perf_counter() - start) * 1000
+
+    def execute(self, sql, params=()):
+        """Run a single statement through the writer and return its rowcount."""
+        return self.run(lambda c: c.execute(sql, params).rowcount)
+
+    def stop(self, timeout=5):
+        """Flush queued jobs and stop the thread (registered with atexit)."""
+        if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+            self._jobs.put(self._STOP)
+            self._thread.join(timeout)
+
+    def _next_batch(self):
+        batch = [self._jobs.get()]
+        deadline = time.monotonic() + self.window
+        while len(batch) < self.max_batch and batch[-1] is not self._STOP:
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining > 0:
+                    batch.append(self._jobs.get(timeout=remaining))
+                else:
+                    batch.append(self._jobs.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        conn = _connect()
+        conn.isolation_level = None  # explicit BEGIN/SAVEPOINT/COMMIT below
+        while True:
+            batch = self._next_batch()
+            stop = batch[-1] is self._STOP
+            jobs = [job for job in batch if job is not self._STOP]
+            if jobs:
+                self._commit_batch(conn, jobs)
+            if stop:
+                break
+        conn.close()
+
+    def _commit_batch(self, conn, jobs):
+        c = conn.cursor()
+        job_cursor = _sql_profiler.wrap(c)
+        outcomes = []
+        try:
+            c.execute('BEGIN IMMEDIATE')
+            for fn, args, fut, route in jobs:
+                _sql_profiler.set_route(route)
+                c.execute('SAVEPOINT job')
+                try:
+                    result = fn(job_cursor, *args)
+                except Exception as e:
+                    c.execute('ROLLBACK TO job')
+                    c.execute('RELEASE job')
+                    outcomes.append((fut, None, e))
+                else:
+                    c.execute('RELEASE job')
+                    outcomes.append((fut, result, None))
+            c.execute('COMMIT')
+        except sqlite3.Error as e:
+            # Nothing in the batch was committed, so every job failed
+            if conn.in_transaction:
+                conn.execute('ROLLBACK')
+            outcomes = [(fut, None, e) for _, _, fut, _ in jobs]
+        finally:
+            _sql_profiler.set_route(None)
+
+        failed = sum(1 for _, _, exc in outcomes if exc is not None)
+        with self._lock:
+            self._stats['jobs'] += len(jobs)
+            self._stats['failed'] += failed
+            self._stats['batches'] += 1
+            self._stats['largest_batch'] = max(self._stats['largest_batch'], len(jobs))
+        for fut, result, exc in outcomes:
+            if exc is not None:
+                fut.set_exception(exc)
+            else:
+                fut.set_result(result)
+
+    def stats(self):
+        with self._lock:
+            s = dict(self._stats)
+        s['queued'] = self._jobs.qsize() if self._jobs is not None else 0
+        s['avg_batch'] = round(s['jobs'] / s['batches'], 2) if s['batches'] else 0
+        return s
+
+_db_writer = DBWriter(DB_WRITE_BATCH, DB_WRITE_WINDOW)
+atexit.register(_db_writer.stop)
+
+# === SQL Profiling ===
+
+# Opt-in: QUIZ_SQL_PROFILE=1 records every statement; QUIZ_SQL_EXPLAIN=1 also
+# runs EXPLAIN QUERY PLAN once per SELECT shape and logs full table scans.
+SQL_PROFILE = os.environ.get('QUIZ_SQL_PROFILE', '0') == '1'
+SQL_EXPLAIN = os.environ.get('QUIZ_SQL_EXPLAIN', '0') == '1'
+SQL_PROFILE_MAX_STATEMENTS = 2000
+
+_SQL_STRING_RE = re.compile(r"'(?:[^']|'')*'")
+_SQL_NUMBER_RE = re.compile(r'\b\d+(?:\.\d+)?\b')
+_SQL_IN_LIST_RE = re.compile(r'\bIN\s*\(\s*\?(?:\s*,\s*\?)+\s*\)', re.IGNORECASE)
+_SQL_FULL_SCAN_RE = re.compile(r'^SCAN (?:TABLE )?(\w+)(?!.*\bUSING\b)')
+
+class _ProfiledCursor:
+    """Cursor proxy that times execute()/fetch*() and reports to the profiler."""
+    __slots__ = ('_cursor', '_profiler', '_key')
+
+    def __init__(self, cursor, profiler):
+        self._cursor = cursor
+        self._profiler = profiler
+        self._key = None
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __iter__(self):
+        for row in self._cursor:
+            self._profiler.add_rows(self._key, 1, 0)
+            yield row
+
+    def execute(self, sql, params=()):
+        start = time.perf_counter()
+        self._cursor.execute(sql, params)
+        self._key = self._profiler.record(sql, time.perf_counter() - start)
+        self._profiler.maybe_explain(self._key, self._cursor.connection, sql, params)
+        return self
+
+    def executemany(self, sql, seq_of_params):
+        start = time.perf_counter()
+        self._cursor.executemany(sql, seq_of_params)
+        self._key = self._profiler.record(sql, time.perf_counter() - start)
+        return self
+
+    def fetchone(self):
+        start = time.perf_counter()
+        row = self._cursor.fetchone()
+        self._profiler.add_rows(self._key, 1 if row is not None else 0, time.perf_counter() - start)
+        return row
+
+    def fetchmany(self, size=None):
+        start = time.perf_counter()
+        rows = self._cursor.fetchmany(size) if size is not None else self._cursor.fetchmany()
+        self._profiler.add_rows(self._key, len(rows), time.perf_counter() - start)
+        return rows
+
+    def fetchall(self):
+        start = time.perf_counter()
+        rows = self._cursor.fetchall()
+        self._profiler.add_rows(self._key, len(rows), time.perf_counter() - start)
+        return rows
+
+class SQLProfiler:
+    """Aggregates per-statement and per-route SQL timings.
+
+    Statements are grouped by normalized text (literals and IN-lists
+    collapsed to placeholders). Fetch time counts toward the statement,
+    since SQLite does most of a SELECT's work while rows are stepped.
+    Per-route request time is split into SQL and non-SQL time so slow
+    endpoints can be attributed to queries or to Python; waiting on the
+    DBWriter counts as SQL time.
+    """
+    def __init__(self, enabled, explain):
+        self.enabled = enabled
+        self.explain = explain
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._normalized = {}
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._statements = {}
+            self._routes = {}
+            self._explained = set()
+
+    def wrap(self, cursor):
+        return _ProfiledCursor(cursor, self) if self.enabled else cursor
+
+    def set_route(self, route):
+        self._local.route = route
+
+    def current_route(self):
+        route = getattr(self._local, 'route', None)
+        if route:
+            return route
+        if has_request_context():
+            return request.endpoint or request.path
+        return threading.current_thread().name
+
+    def normalize(self, sql):
+        norm = self._normalized.get(sql)
+        if norm is None:
+            norm = ' '.join(sql.split())
+            norm = _SQL_STRING_RE.sub('?', norm)
+            norm = _SQL_NUMBER_RE.sub('?', norm)
+            norm = _SQL_IN_LIST_RE.sub('IN (?...)', norm)
+            if len(self._normalized) < SQL_PROFILE_MAX_STATEMENTS * 4:
+                self._normalized[sql] = norm
+        return norm
+
+    def record(self, sql, elapsed):
+        key = self.normalize(sql)
+        route = self.current_route()
+        ms = elapsed * 1000
+        with self._lock:
+            st = self._statements.get(key)
+            if st is None:
+                if len(self._statements) >= SQL_PROFILE_MAX_STATEMENTS:
+                    key = '<other>'
+                    st = self._statements.get(key)
+                if st is None:
+                    st = self._statements[key] = {'count': 0, 'total_ms': 0.0, 'max_ms': 0.0,
+                                                  'rows': 0, 'routes': {}, 'full_scan': None}
+            st['count'] += 1
+            st['total_ms'] += ms
+            st['max_ms'] = max(st['max_ms'], ms)
+            st['routes'][route] = st['routes'].get(route, 0) + 1
+        if has_request_context():
+            g._sql_ms = g.get('_sql_ms', 0.0) + ms
+            g._sql_count = g.get('_sql_count', 0) + 1
+        return key
+
+    def add_rows(self, key, rows, elapsed):
+        if key is None:
+            return
+        ms = elapsed * 1000
+        with self._lock:
+            st = self._statements.get(key)
+            if st is not None:
+                st['rows'] += rows
+                st['total_ms'] += ms
+        if ms and has_request_context():
+            g._sql_ms = g.get('_sql_ms', 0.0) + ms
+
+    def maybe_explain(self, key, conn, sql, params):
+        """Log EXPLAIN QUERY PLAN the first time a SELECT shape is seen, if it scans a table."""
+        if not self.explain or key in self._explained:
+            return
+        with self._lock:
+            if key in self._explained:
+                return
+            self._explained.add(key)
+        if not sql.lstrip().upper().startswith(('SELECT', 'WITH')):
+            return
+        try:
+            plan = [row[3] for row in conn.execute('EXPLAIN QUERY PLAN ' + sql, params).fetchall()]
+        except sqlite3.Error:
+            return
+        scans = [m.group(1) for m in (_SQL_FULL_SCAN_RE.match(p) for p in plan) if m]
+        with self._lock:
+            st = self._statements.get(key)
+            if st is not None:
+                st['full_scan'] = scans or False
+                st['plan'] = plan
+        if scans:
+            app.logger.warning(f"[SQL] full scan of {', '.join(scans)} in {self.current_route()}: {key}\n  "
+                               + '\n  '.join(plan))
+
+    def record_request(self, route, elapsed_ms, sql_ms, sql_count):
+        with self._lock:
+            r = self._routes.setdefault(route, {'requests': 0, 'total_ms': 0.0, 'sql_ms': 0.0, 'statements': 0})
+            r['requests'] += 1
+            r['total_ms'] += elapsed_ms
+            r['sql_ms'] += sql_ms
+            r['statements'] += sql_count
+
+    def report(self, limit=20):
+        with self._lock:
+            statements = [dict(st, sql=key, routes=dict(st['routes'])) for key, st in self._statements.items()]
+            routes = {name: dict(r) for name, r in self._routes.items()}
+        for st in statements:
+            st['avg_ms'] = round(st['total_ms'] / st['count'], 3) if st['count'] else 0
+            st['total_ms'] = round(st['total_ms'], 3)
+            st['max_ms'] = round(st['max_ms'], 3)
+        for r in routes.values():
+            r['python_ms'] = round(r['total_ms'] - r['sql_ms'], 3)
+            r['avg_ms'] = round(r['total_ms'] / r['requests'], 3) if r['requests'] else 0
+            r['total_ms'] = round(r['total_ms'], 3)
+            r['sql_ms'] = round(r['sql_ms'], 3)
+        return {
+            'enabled': self.enabled,
+            'explain': self.explain,
+            'statements_tracked': len(statements),
+            'slowest': sorted(statements, key=lambda st: st['avg_ms'], reverse=True)[:limit],
+            'most_frequent': sorted(statements, key=lambda st: st['count'], reverse=True)[:limit],
+            'full_scans': [st for st in statements if st['full_scan']],
+            'routes': sorted(({'route': name, **r} for name, r in routes.items()),
+                             key=lambda r: r['total_ms'], reverse=True),
+        }
+
+_sql_profiler = SQLProfiler(SQL_PROFILE, SQL_EXPLAIN)
+
+@app.before_request
+def _sql_profile_start():
+    if _sql_profiler.enabled:
+        g._req_started = time.perf_counter()
+
+@app.teardown_request
+def _sql_profile_finish(exc):
+    if _sql_profiler.enabled and '_req_started' in g:
+        elapsed_ms = (time.perf_counter() - g._req_started) * 1000
+        _sql_profiler.record_request(request.endpoint or request.path, elapsed_ms,
+                                     g.get('_sql_ms', 0.0), g.get('_sql_count', 0))
+
+# === Index Management ===
+# The full secondary-index set, declared in one place. init_db() creates what
+# is missing and drops what is listed as redundant; explain_queries.py checks
+# every route's SQL against the result. UNIQUE constraints already give
+# sessions(token), quiz_progress / question_performance / bookmarks /
+# objective_confidence (user_id, ...) an automatic index, so none are declared.
+
+DB_INDEXES = (
+    # (name, table, columns, partial-index WHERE or None)
+    ('idx_sessions_user_expires', 'sessions', 'user_id, expires_at', None),            # login prunes own sessions
+    ('idx_sessions_expires', 'sessions', 'expires_at', None),                          # cleanup-sessions
+    ('idx_token_revocations_expires', 'token_revocations', 'expires_at', None),
+    ('idx_users_email_token', 'users', 'email_token', 'email_token IS NOT NULL'),      # verify-email
+    ('idx_domains_cert_parent', 'domains', 'certification_id, parent_domain_id, sort_order', None),
+    ('idx_quizzes_user_modified', 'quizzes', 'user_id, last_modified, id', None),      # library paging, get_stats
+    ('idx_quizzes_public_modified', 'quizzes', 'is_public, last_modified, id', None),  # library paging, community
+    ('idx_questions_quiz_index', 'questions', 'quiz_id, question_index', None),
+    ('idx_question_domains_domain', 'question_domains', 'domain_id, question_id', None),  # covering for domain -> questions
+    ('idx_attempts_user_created', 'attempts', 'user_id, created_at', None),             # recent attempts
+    ('idx_attempts_quiz', 'attempts', 'quiz_id, percentage', None),                     # best score per quiz, cascades
+    ('idx_qp_user_miss_ratio', 'question_performance',
+     'user_id, CAST(times_incorrect AS REAL) / times_seen', 'times_incorrect > 0'),     # weak questions
+    ('idx_qp_question', 'question_performance', 'question_id', None),                  # domain-stats triggers, cascades
+    ('idx_sim_user_cert', 'exam_simulations', 'user_id, certification_id', None),
+    ('idx_ss_user', 'study_sessions', 'user_id, started_at', None),
+    ('idx_srs_user_due', 'srs_cards', 'user_id, next_review_at', "status != 'graduated'"),  # due queue
+    ('idx_srs_log_user_card', 'srs_review_log', 'user_id, card_id, reviewed_at', None),  # optimizer, cascades
+    ('idx_study_res_cert', 'study_resources', 'certification_id', None),
+    ('idx_ai_usage_user_created', 'ai_usage', 'user_id, created_at', None),
+    ('idx_events_user', 'events', 'user_id', None),                                    # ON DELETE SET NULL
+    ('idx_events_created', 'events', 'created_at', None),                              # retention sweep
+)
+
+# Indexes earlier releases created that the set above (or a UNIQUE
+# constraint) makes redundant; each only costs write amplification.
+REDUNDANT_INDEXES = (
+    'idx_sessions_token',             # = UNIQUE(token)
+    'idx_quizzes_user',               # prefix of idx_quizzes_user_modified
+    'idx_progress_user_quiz',         # = UNIQUE(user_id, quiz_id)
+    'idx_questions_quiz',             # prefix of idx_questions_quiz_index
+    'idx_questions_quiz_id',          # duplicate of idx_questions_quiz
+    'idx_qd_domain',                  # prefix of idx_question_domains_domain
+    'idx_qp_user',                    # prefix of UNIQUE(user_id, question_id)
+    'idx_question_performance_user',  # = UNIQUE(user_id, question_id)
+    'idx_bookmarks_user',             # prefix of UNIQUE(user_id, question_id)
+    'idx_obj_conf_user',              # prefix of UNIQUE(user_id, domain_id)
+    'idx_srs_user_next',              # every next_review_at query excludes graduated cards (idx_srs_user_due)
+)
+
+def _index_sql(name, table, columns, where):
+    sql = f'CREATE INDEX IF NOT EXISTS {name} ON {table}({columns})'
+    return f'{sql} WHERE {where}' if where else sql
+
+def ensure_indexes(c):
+    """Bring the database's secondary indexes in line with DB_INDEXES.
+
+    An existing index whose definition differs from its declaration (e.g.
+    idx_question_domains_domain gaining a covering column) is rebuilt.
+    Returns (created, dropped) name lists.
+    """
+    c.execute("SELECT name, sql FROM sqlite_master WHERE type = 'index' AND sql IS NOT NULL")
+    existing = {row['name']: row['sql'] for row in c.fetchall()}
+    created, dropped = [], []
+    for name in REDUNDANT_INDEXES:
+        if name in existing:
+            c.execute(f'DROP INDEX IF EXISTS {name}')
+            dropped.append(name)
+    for name, table, columns, where in DB_INDEXES:
+        sql = _index_sql(name, table, columns, where)
+        current = existing.get(name)
+        if current is not None and current.replace(' IF NOT EXISTS', '') == sql.replace(' IF NOT EXISTS', ''):
+            continue
+        if current is not None:
+            c.execute(f'DROP INDEX {name}')
+        c.execute(sql)
+        created.append(name)
+    if created or dropped:
+        c.execute('PRAGMA analysis_limit = 1000')  # approximate stats; keeps startup fast on big tables
+        c.execute('ANALYZE')
+        print(f"[DB] indexes created: {created or '-'}; dropped: {dropped or '-'}", flush=True)
+    return created, dropped
+
+# === Domain Stats ===
+# user_domain_stats holds each user's question_performance totals per domain,
+# so the performance, readiness and session-plan endpoints read one row per
+# domain instead of aggregating the user's whole answer history. Triggers
+# keep it exact on every write path: attempts, simulations, SRS reviews, and
+# the FK cascades that delete performance rows or domain tags. A question
+# tagged with a domain later brings its existing history along.
+# last_seen_at only moves forward; removing history doesn't roll it back.
+
+_DOMAIN_STATS_ADD = '''
+    ON CONFLICT (user_id, domain_id) DO UPDATE SET
+        times_seen = times_seen + excluded.times_seen,
+        times_correct = times_correct + excluded.times_correct,
+        times_incorrect = times_incorrect + excluded.times_incorrect,
+        unique_questions = unique_questions + excluded.unique_questions,
+        last_seen_at = CASE WHEN excluded.last_seen_at IS NULL OR last_seen_at >= excluded.last_seen_at
+                            THEN last_seen_at ELSE excluded.last_seen_at END;'''
+
+DOMAIN_STATS_TRIGGERS = (
+    ('trg_qp_insert_domain_stats', f'''CREATE TRIGGER trg_qp_insert_domain_stats
+    AFTER INSERT ON question_performance
+BEGIN
+    INSERT INTO user_domain_stats
+        (user_id, domain_id, times_seen, times_correct, times_incorrect, unique_questions, last_seen_at)
+    SELECT new.user_id, qd.domain_id, new.times_seen, new.times_correct, new.times_incorrect, 1, new.last_seen_at
+    FROM question_domains qd WHERE qd.question_id = new.question_id{_DOMAIN_STATS_ADD}
+END'''),
+    ('trg_qp_update_domain_stats', f'''CREATE TRIGGER trg_qp_update_domain_stats
+    AFTER UPDATE OF times_seen, times_correct, times_incorrect, last_seen_at ON question_performance
+BEGIN
+    INSERT INTO user_domain_stats
+        (user_id, domain_id, times_seen, times_correct, times_incorrect, unique_questions, last_seen_at)
+    SELECT new.user_id, qd.domain_id, new.times_seen - old.times_seen, new.times_correct - old.times_correct,
+           new.times_incorrect - old.times_incorrect, 0, new.last_seen_at
+    FROM question_domains qd WHERE qd.question_id = new.question_id{_DOMAIN_STATS_ADD}
+END'''),
+    ('trg_qp_delete_domain_stats', '''CREATE TRIGGER trg_qp_delete_domain_stats
+    AFTER DELETE ON question_performance
+BEGIN
+    UPDATE user_domain_stats SET
+        times_seen = times_seen - old.times_seen,
+        times_correct = times_correct - old.times_correct,
+        times_incorrect = times_incorrect - old.times_incorrect,
+        unique_questions = unique_questions - 1
+    WHERE user_id = old.user_id
+      AND domain_id IN (SELECT domain_id FROM question_domains WHERE question_id = old.question_id);
+END'''),
+    ('trg_qd_insert_domain_stats', f'''CREATE TRIGGER trg_qd_insert_domain_stats
+    AFTER INSERT ON question_domains
+BEGIN
+    INSERT INTO user_domain_stats
+        (user_id, domain_id, times_seen, times_correct, times_incorrect, unique_questions, last_seen_at)
+    SELECT qp.user_id, new.domain_id, qp.times_seen, qp.times_correct, qp.times_incorrect, 1, qp.last_seen_at
+    FROM question_performance qp WHERE qp.question_id = new.question_id{_DOMAIN_STATS_ADD}
+END'''),
+    ('trg_qd_delete_domain_stats', '''CREATE TRIGGER trg_qd_delete_domain_stats
+    AFTER DELETE ON question_domains
+BEGIN
+    UPDATE user_domain_stats SET
+        times_seen = times_seen - (SELECT qp.times_seen FROM question_performance qp
+                                   WHERE qp.user_id = user_domain_stats.user_id AND qp.question_id = old.question_id),
+        times_correct = times_correct - (SELECT qp.times_correct FROM question_performance qp
+                                         WHERE qp.user_id = user_domain_stats.user_id AND qp.question_id = old.question_id),
+        times_incorrect = times_incorrect - (SELECT qp.times_incorrect FROM question_performance qp
+                                             WHERE qp.user_id = user_domain_stats.user_id AND qp.question_id = old.question_id),
+        unique_questions = unique_questions - 1
+    WHERE domain_id = old.domain_id
+      AND user_id IN (SELECT user_id FROM question_performance WHERE question_id = old.question_id);
+END'''),
+)
+
+def rebuild_user_domain_stats(c):
+    """Recompute user_domain_stats from question_performance. Returns the row count."""
+    c.execute('DELETE FROM user_domain_stats')
+    c.execute('''INSERT INTO user_domain_stats
+        (user_id, domain_id, times_seen, times_correct, times_incorrect, unique_questions, last_seen_at)
+        SELECT qp.user_id, qd.domain_id, SUM(qp.times_seen), SUM(qp.times_correct),
+               SUM(qp.times_incorrect), COUNT(*), MAX(qp.last_seen_at)
+        FROM question_performance qp
+        JOIN question_domains qd ON qd.question_id = qp.question_id
+        GROUP BY qp.user_id, qd.domain_id''')
+    return c.rowcount
+
+def ensure_domain_stats(c):
+    """Install the DOMAIN_STATS_TRIGGERS; rebuild the table whenever one was missing or changed."""
+    c.execute("SELECT name, sql FROM sqlite_master WHERE type = 'trigger'")
+    existing = {row['name']: row['sql'] for row in c.fetchall()}
+    if all(existing.get(name) == sql for name, sql in DOMAIN_STATS_TRIGGERS):
+        return
+    for name, sql in DOMAIN_STATS_TRIGGERS:
+        c.execute(f'DROP TRIGGER IF EXISTS {name}')
+        c.execute(sql)
+    rows = rebuild_user_domain_stats(c)
+    print(f"[DB] user_domain_stats rebuilt ({rows} rows)", flush=True)
+
+# === SRS Summary ===
+# srs_user_stats holds each user's card counts per status and their review
+# streak, so the SRS stats endpoint and the session plan read one row instead
+# of counting cards and walking review dates. Triggers on srs_cards keep the
+# counts exact however cards are added, rescheduled or deleted; the streak is
+# advanced by _apply_srs_reviews. Cards become due as time passes, so the due
+# count is still read from idx_srs_user_due.
+
+SRS_STATS_TRIGGERS = (
+    ('trg_srs_insert_stats', '''CREATE TRIGGER trg_srs_insert_stats
+    AFTER INSERT ON srs_cards
+BEGIN
+    INSERT INTO srs_user_stats (user_id) VALUES (new.user_id) ON CONFLICT (user_id) DO NOTHING;
+    UPDATE srs_user_stats SET
+        total_cards = total_cards + 1,
+        new_cards = new_cards + (new.status = 'new'),
+        learning_cards = learning_cards + (new.status = 'learning'),
+        review_cards = review_cards + (new.status = 'review'),
+        graduated_cards = graduated_cards + (new.status = 'graduated')
+    WHERE user_id = new.user_id;
+END'''),
+    ('trg_srs_status_stats', '''CREATE TRIGGER trg_srs_status_stats
+    AFTER UPDATE OF status ON srs_cards WHEN old.status IS NOT new.status
+BEGIN
+    UPDATE srs_user_stats SET
+        new_cards = new_cards - (old.status = 'new') + (new.status = 'new'),
+        learning_cards = learning_cards - (old.status = 'learning') + (new.status = 'learning'),
+        review_cards = review_cards - (old.status = 'review') + (new.status = 'review'),
+        graduated_cards = graduated_cards - (old.status = 'graduated') + (new.status = 'graduated')
+    WHERE user_id = new.user_id;
+END'''),
+    ('trg_srs_delete_stats', '''CREATE TRIGGER trg_srs_delete_stats
+    AFTER DELETE ON srs_cards
+BEGIN
+    UPDATE srs_user_stats SET
+        total_cards = total_cards - 1,
+        new_cards = new_cards - (old.status = 'new'),
+        learning_cards = learning_cards - (old.status = 'learning'),
+        review_cards = review_cards - (old.status = 'review'),
+        graduated_cards = graduated_cards - (old.status = 'graduated')
+    WHERE user_id = old.user_id;
+END'''),
+)
+
+# Every day the user reviewed on: the log, plus each card's last review for
+# history from before srs_review_log existed
+_SRS_REVIEW_DAYS_SQL = '''SELECT user_id, DATE(reviewed_at) AS day FROM srs_review_log WHERE user_id = ?
+    UNION SELECT user_id, DATE(last_reviewed_at) FROM srs_cards WHERE user_id = ? AND last_reviewed_at IS NOT NULL
+    ORDER BY day DESC'''
+
+def _streak_from_days(days):
+    """(streak_days, last_review_day) from review days (date strings), newest first."""
+    if not days:
+        return 0, None
+    streak, expected = 0, datetime.strptime(days[0], '%Y-%m-%d').date()
+    for day in days:
+        if datetime.strptime(day, '%Y-%m-%d').date() != expected:
+            break
+        streak += 1
+        expected -= timedelta(days=1)
+    return streak, days[0]
+
+def _recompute_srs_streak(c, user_id):
+    c.execute(_SRS_REVIEW_DAYS_SQL, (user_id, user_id))
+    return _streak_from_days([row['day'] for row in c.fetchall() if row['day']])
+
+def _advance_srs_streak(c, user_id, review_days):
+    """Count review_days (dates) into the user's streak.
+
+    Days after the last review day extend or restart the streak in place; an
+    older day (a late offline sync) can fill a gap, so the streak is then
+    recomputed from the review log.
+    """
+    c.execute('SELECT streak_days, last_review_day FROM srs_user_stats WHERE user_id = ?', (user_id,))
+    row = c.fetchone()
+    if row is None:
+        return
+    streak = row['streak_days']
+    last = datetime.strptime(row['last_review_day'], '%Y-%m-%d').date() if row['last_review_day'] else None
+    days = sorted(set(review_days))
+    if last is not None and days[0] < last:
+        streak, last_day = _recompute_srs_streak(c, user_id)
+    else:
+        for day in days:
+            if last is not None and day == last:
+                continue
+            streak = streak + 1 if last is not None and day == last + timedelta(days=1) else 1
+            last = day
+        last_day = last.isoformat()
+    c.execute('UPDATE srs_user_stats SET streak_days = ?, last_review_day = ? WHERE user_id = ?',
+              (streak, last_day, user_id))
+
+def rebuild_srs_user_stats(c):
+    """Recompute srs_user_stats from srs_cards and the review history. Returns the row count."""
+    c.execute('DELETE FROM srs_user_stats')
+    c.execute('''INSERT INTO srs_user_stats
+        (user_id, total_cards, new_cards, learning_cards, review_cards, graduated_cards)
+        SELECT user_id, COUNT(*), SUM(status = 'new'), SUM(status = 'learning'),
+               SUM(status = 'review'), SUM(status = 'graduated')
+        FROM srs_cards GROUP BY user_id''')
+    rows = c.rowcount
+    c.execute('SELECT user_id FROM srs_user_stats')
+    for user_id in [row['user_id'] for row in c.fetchall()]:
+        streak, last_day = _recompute_srs_streak(c, user_id)
+        c.execute('UPDATE srs_user_stats SET streak_days = ?, last_review_day = ? WHERE user_id = ?',
+                  (streak, last_day, user_id))
+    return rows
+
+def ensure_srs_stats(c):
+    """Install the SRS_STATS_TRIGGERS; rebuild the table whenever one was missing or changed."""
+    c.execute("SELECT name, sql FROM sqlite_master WHERE type = 'trigger'")
+    existing = {row['name']: row['sql'] for row in c.fetchall()}
+    if all(existing.get(name) == sql for name, sql in SRS_STATS_TRIGGERS):
+        return
+    for name, sql in SRS_STATS_TRIGGERS:
+        c.execute(f'DROP TRIGGER IF EXISTS {name}')
+        c.execute(sql)
+    rows = rebuild_srs_user_stats(c)
+    print(f"[DB] srs_user_stats rebuilt ({rows} rows)", flush=True)
+
+def _srs_summary(c, user_id):
+    """Card counts, cards due now and the current streak, from srs_user_stats."""
+    c.execute('''SELECT s.*, (SELECT COUNT(*) FROM srs_cards
+            WHERE user_id = s.user_id AND next_review_at <= datetime('now') AND status != 'graduated') AS due_today
+        FROM srs_user_stats s WHERE s.user_id = ?''', (user_id,))
+    row = c.fetchone()
+    if row is None:
+        return {'total_cards': 0, 'due_today': 0, 'new_cards': 0, 'learning': 0, 'review': 0,
+                'graduated': 0, 'streak': 0}
+    # The streak runs up to today: it lapses on the first day without a review
+    today = datetime.now().date().isoformat()
+    return {
+        'total_cards': row['total_cards'],
+        'due_today': row['due_today'],
+        'new_cards': row['new_cards'],
+        'learning': row['learning_cards'],
+        'review': row['review_cards'],
+        'graduated': row['graduated_cards'],
+        'streak': row['streak_days'] if row['last_review_day'] == today else 0
+    }
+
 def init_db():
     conn = get_db()
     c = conn.cursor()
-    
+
+    # Must run outside a transaction; persists for every later connection
+    mode = conn.execute(f"PRAGMA journal_mode = {DB_PRAGMAS['journal_mode']}").fetchone()[0]
+    if mode.upper() != DB_PRAGMAS['journal_mode']:
+        print(f"Warning: SQLite journal_mode is {mode!r}, wanted {DB_PRAGMAS['journal_mode']}")
+
     c.execute('''CREATE TABLE IF NOT EXISTS users (
         id INTEGER PRIMARY KEY AUTOINCREMENT,
         username TEXT UNIQUE NOT NULL,
@@ -115,6 +1005,17 @@ def init_db():
         expires_at TIMESTAMP NOT NULL,
         FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
     )''')
+
+    # Revoked signed access tokens (jti set) or whole users (jti NULL: every
+    # token issued before revoked_at). Times are epoch seconds; rows are
+    # useless once expires_at passes and cleanup-sessions prunes them.
+    c.execute('''CREATE TABLE IF NOT EXISTS token_revocations (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        jti TEXT,
+        user_id INTEGER,
+        revoked_at REAL NOT NULL,
+        expires_at REAL NOT NULL
+    )''')
     
     c.execute('''CREATE TABLE IF NOT EXISTS quizzes (
         id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -185,9 +1086,6 @@ def init_db():
         FOREIGN KEY (quiz_id) REFERENCES quizzes(id) ON DELETE CASCADE
     )''')
     
-    c.execute('CREATE INDEX IF NOT EXISTS idx_sessions_token ON sessions(token)')
-    c.execute('CREATE INDEX IF NOT EXISTS idx_quizzes_user ON quizzes(user_id)')
-    c.execute('CREATE INDEX IF NOT EXISTS idx_progress_user_quiz ON quiz_progress(user_id, quiz_id)')
 
     # === Phase 1: Normalized question storage & certification support ===
 
@@ -266,10 +1164,20 @@ def init_db():
         FOREIGN KEY (question_id) REFERENCES questions(id) ON DELETE CASCADE
     )''')
 
-    c.execute('CREATE INDEX IF NOT EXISTS idx_questions_quiz ON questions(quiz_id)')
-    c.execute('CREATE INDEX IF NOT EXISTS idx_questions_quiz_index ON questions(quiz_id, question_index)')
-    c.execute('CREATE INDEX IF NOT EXISTS idx_qd_domain ON question_domains(domain_id)')
-    c.execute('CREATE INDEX IF NOT EXISTS idx_qp_user ON question_performance(user_id)')
+    # Per-user, per-domain totals of question_performance (see Domain Stats)
+    c.execute('''CREATE TABLE IF NOT EXISTS user_domain_stats (
+        user_id INTEGER NOT NULL,
+        domain_id INTEGER NOT NULL,
+        times_seen INTEGER NOT NULL DEFAULT 0,
+        times_correct INTEGER NOT NULL DEFAULT 0,
+        times_incorrect INTEGER NOT NULL DEFAULT 0,
+        unique_questions INTEGER NOT NULL DEFAULT 0,
+        last_seen_at TIMESTAMP,
+        PRIMARY KEY (user_id, domain_id),
+        FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE,
+        FOREIGN KEY (domain_id) REFERENCES domains(id) ON DELETE CASCADE
+    ) WITHOUT ROWID''')
+
 
     # === Phase 2: Certification tracking & exam simulation ===
 
@@ -303,7 +1211,6 @@ def init_db():
         FOREIGN KEY (certification_id) REFERENCES certifications(id) ON DELETE CASCADE
     )''')
 
-    c.execute('CREATE INDEX IF NOT EXISTS idx_sim_user_cert ON exam_simulations(user_id, certification_id)')
 
     # Study sessions for analytics
     c.execute('''CREATE TABLE IF NOT EXISTS study_sessions (
@@ -320,7 +1227,6 @@ def init_db():
         FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE,
         FOREIGN KEY (quiz_id) REFERENCES quizzes(id) ON DELETE SET NULL
     )''')
-    c.execute('CREATE INDEX IF NOT EXISTS idx_ss_user ON study_sessions(user_id, started_at)')
 
     # Spaced Repetition System (SRS)
     c.execute('''CREATE TABLE IF NOT EXISTS srs_cards (
@@ -339,7 +1245,46 @@ def init_db():
         FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE,
         FOREIGN KEY (question_id) REFERENCES questions(id) ON DELETE CASCADE
     )''')
-    c.execute('CREATE INDEX IF NOT EXISTS idx_srs_user_next ON srs_cards(user_id, next_review_at)')
+
+    # One row per SRS review, kept after the card is gone: the history optimize_srs.py fits from
+    c.execute('''CREATE TABLE IF NOT EXISTS srs_review_log (
+        id INTEGER PRIMARY KEY,
+        user_id INTEGER NOT NULL,
+        card_id INTEGER NOT NULL,
+        question_id INTEGER NOT NULL,
+        quality INTEGER NOT NULL,
+        reviewed_at TIMESTAMP NOT NULL,
+        elapsed_days REAL,
+        interval_days INTEGER NOT NULL,
+        scheduler TEXT NOT NULL,
+        FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+    )''')
+
+    # Per-user SRS card counts and review streak (see SRS Summary)
+    c.execute('''CREATE TABLE IF NOT EXISTS srs_user_stats (
+        user_id INTEGER PRIMARY KEY,
+        total_cards INTEGER NOT NULL DEFAULT 0,
+        new_cards INTEGER NOT NULL DEFAULT 0,
+        learning_cards INTEGER NOT NULL DEFAULT 0,
+        review_cards INTEGER NOT NULL DEFAULT 0,
+        graduated_cards INTEGER NOT NULL DEFAULT 0,
+        streak_days INTEGER NOT NULL DEFAULT 0,
+        last_review_day DATE,
+        FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+    )''')
+
+    # Per-user scheduler choice and fitted FSRS weights (written by optimize_srs.py)
+    c.execute('''CREATE TABLE IF NOT EXISTS srs_user_params (
+        user_id INTEGER PRIMARY KEY,
+        scheduler TEXT NOT NULL,
+        weights TEXT,
+        retention REAL,
+        review_count INTEGER,
+        loss REAL,
+        baseline_loss REAL,
+        fitted_at TIMESTAMP,
+        FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+    )''')
 
     # Bookmarks
     c.execute('''CREATE TABLE IF NOT EXISTS bookmarks (
@@ -352,7 +1297,6 @@ def init_db():
         FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE,
         FOREIGN KEY (question_id) REFERENCES questions(id) ON DELETE CASCADE
     )''')
-    c.execute('CREATE INDEX IF NOT EXISTS idx_bookmarks_user ON bookmarks(user_id)')
 
     # Objective confidence self-assessment
     c.execute('''CREATE TABLE IF NOT EXISTS objective_confidence (
@@ -365,7 +1309,6 @@ def init_db():
         FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE,
         FOREIGN KEY (domain_id) REFERENCES domains(id) ON DELETE CASCADE
     )''')
-    c.execute('CREATE INDEX IF NOT EXISTS idx_obj_conf_user ON objective_confidence(user_id)')
 
     # Study resources linked to certifications
     c.execute('''CREATE TABLE IF NOT EXISTS study_resources (
@@ -382,7 +1325,6 @@ def init_db():
         FOREIGN KEY (certification_id) REFERENCES certifications(id) ON DELETE CASCADE,
         FOREIGN KEY (domain_id) REFERENCES domains(id) ON DELETE SET NULL
     )''')
-    c.execute('CREATE INDEX IF NOT EXISTS idx_study_res_cert ON study_resources(certification_id)')
 
     # AI quiz generation usage tracking & rate limiting
     c.execute('''CREATE TABLE IF NOT EXISTS ai_usage (
@@ -395,7 +1337,6 @@ def init_db():
         created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
         FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
     )''')
-    c.execute('CREATE INDEX IF NOT EXISTS idx_ai_usage_user_created ON ai_usage(user_id, created_at)')
 
     # Phase 7.4 - Usage analytics event log
     c.execute('''CREATE TABLE IF NOT EXISTS events (
@@ -406,16 +1347,24 @@ def init_db():
         created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
         FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE SET NULL
     )''')
-    c.execute('CREATE INDEX IF NOT EXISTS idx_events_user ON events(user_id)')
-    c.execute('CREATE INDEX IF NOT EXISTS idx_events_created ON events(created_at)')
-
-    # Phase 7.2 - Additional performance indexes
-    c.execute('CREATE INDEX IF NOT EXISTS idx_questions_quiz_id ON questions(quiz_id)')
-    c.execute('CREATE INDEX IF NOT EXISTS idx_question_performance_user ON question_performance(user_id, question_id)')
-    c.execute('CREATE INDEX IF NOT EXISTS idx_question_domains_domain ON question_domains(domain_id)')
 
-    # Enable WAL mode for better concurrent read performance
-    conn.execute('PRAGMA journal_mode=WAL')
+    # Event rollups, maintained by _write_events (see Event Logging).
+    # user_id 0 stands for events whose user was deleted.
+    c.execute('''CREATE TABLE IF NOT EXISTS event_user_daily_counts (
+        day TEXT NOT NULL,
+        user_id INTEGER NOT NULL,
+        event TEXT NOT NULL,
+        count INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (day, user_id, event)
+    ) WITHOUT ROWID''')
+    c.execute('''CREATE TABLE IF NOT EXISTS event_totals (
+        event TEXT PRIMARY KEY,
+        count INTEGER NOT NULL DEFAULT 0
+    ) WITHOUT ROWID''')
+    c.execute('''CREATE TABLE IF NOT EXISTS event_rollup_state (
+        name TEXT PRIMARY KEY,
+        last_event_id INTEGER NOT NULL DEFAULT 0
+    )''')
 
     # Add new columns to quizzes table (safe to run multiple times)
     # NOTE: certification_id column intentionally removed — quizzes and certifications are independent systems
@@ -427,65 +1376,202 @@ def init_db():
         c.execute('ALTER TABLE questions ADD COLUMN option_explanations TEXT')
     except sqlite3.OperationalError:
         pass  # Column already exists
+    for col in ('stability', 'difficulty'):  # FSRS memory state
+        try:
+            c.execute(f'ALTER TABLE srs_cards ADD COLUMN {col} REAL')
+        except sqlite3.OperationalError:
+            pass  # Column already exists
+
+    # Indexes last: some cover columns added by the ALTERs above
+    ensure_indexes(c)
+    ensure_domain_stats(c)
+    ensure_srs_stats(c)
+
+    # Backfill the rollups from events logged before they existed (no-op once caught up)
+    rolled_up_to = _rollup_events(c)
+    if rolled_up_to:
+        print(f"[DB] event rollups caught up to event id {rolled_up_to}", flush=True)
 
     conn.commit()
     conn.close()
 
 # === Question Normalization Helpers ===
 
+_QUESTION_INSERT_SQL = '''INSERT INTO questions
+    (quiz_id, question_index, question_text, type, options, correct, pairs,
+     code, code_language, image, image_alt, explanation, difficulty, option_explanations)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)'''
+
+# Quizzes are read from the normalized questions table once is_migrated = 1.
+# Set QUIZ_WRITE_QUESTION_BLOB=0 (after running migrate_question_blobs.py) to
+# stop duplicating every save into the quizzes.questions JSON column.
+WRITE_QUESTION_BLOB = os.environ.get('QUIZ_WRITE_QUESTION_BLOB', '1') != '0'
+
+def _question_blob(questions_list):
+    """Value for quizzes.questions on a migrated quiz: full JSON, or '[]' when blob writes are off."""
+    return json.dumps(questions_list) if WRITE_QUESTION_BLOB else '[]'
+
+def _json_or_none(value):
+    return json.dumps(value) if value is not None else None
+
+def _question_row(quiz_id, idx, q):
+    """Build the questions-table parameter tuple for one frontend question dict."""
+    get = q.get
+    return (quiz_id, idx,
+            get('question', ''),
+            get('type', 'choice'),
+            _json_or_none(get('options')),
+            _json_or_none(get('correct')),
+            _json_or_none(get('pairs')),
+            get('code'),
+            get('codeLanguage') or get('code_language'),
+            get('image'),
+            get('imageAlt') or get('image_alt'),
+            get('explanation'),
+            get('difficulty', 0),
+            _json_or_none(get('optionExplanations') or None))
+
 def _insert_questions_for_quiz(c, quiz_id, questions_list):
-    """Insert parsed question objects into the normalized questions table."""
+    """Insert parsed question objects into the normalized questions table.
+
+    Rows are serialized once through _question_row and written with a single
+    executemany inside the caller's transaction. This is for simplicity, not
+    speed: bench_insert_questions.py finds no measurable difference from the
+    old per-row execute() loop (run-to-run noise), since both commit once
+    per quiz.
+    """
+    c.executemany(_QUESTION_INSERT_SQL,
+                  [_question_row(quiz_id, idx, q) for idx, q in enumerate(questions_list)])
+
+_QUESTION_CONTENT_COLUMNS = ('question_text', 'type', 'options', 'correct', 'pairs', 'code',
+                             'code_language', 'image', 'image_alt', 'explanation', 'difficulty',
+                             'option_explanations')
+
+def _sync_questions_for_quiz(c, quiz_id, questions_list):
+    """Apply an edited question list to the normalized table as a diff.
+
+    Incoming questions are matched to stored rows by id (visual editor),
+    then by identical content (text editor round-trips drop ids; this also
+    revives a previously removed question), then by position when the stem
+    or the type and options are unchanged, so an edited question keeps its
+    row. Only changed rows are written; unmatched rows are
+    soft-deleted with is_active = 0 so performance and SRS history that
+    reference their ids stay intact.
+    """
+    c.execute(f'''SELECT id, question_index, is_active, {", ".join(_QUESTION_CONTENT_COLUMNS)}
+                  FROM questions WHERE quiz_id = ?''', (quiz_id,))
+    stored = {}
+    by_content = {}
+    by_index = {}
+    for row in c.fetchall():
+        content = tuple(row[col] for col in _QUESTION_CONTENT_COLUMNS)
+        stored[row['id']] = (row, content)
+        by_content.setdefault(content, []).append(row['id'])
+        if row['is_active']:
+            by_index.setdefault(row['question_index'], row['id'])
+    for ids in by_content.values():
+        ids.sort(key=lambda qid: (not stored[qid][0]['is_active'], stored[qid][0]['question_index']))
+
+    incoming = [_question_row(quiz_id, idx, q)[2:] for idx, q in enumerate(questions_list)]
+    matched = [None] * len(incoming)
+    claimed = set()
+
+    def claim(idx, qid):
+        matched[idx] = qid
+        claimed.add(qid)
+
     for idx, q in enumerate(questions_list):
-        c.execute('''INSERT INTO questions
-            (quiz_id, question_index, question_text, type, options, correct, pairs,
-             code, code_language, image, image_alt, explanation, difficulty, option_explanations)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)''',
-            (quiz_id, idx,
-             q.get('question', ''),
-             q.get('type', 'choice'),
-             json.dumps(q.get('options')) if q.get('options') is not None else None,
-             json.dumps(q.get('correct')) if q.get('correct') is not None else None,
-             json.dumps(q.get('pairs')) if q.get('pairs') is not None else None,
-             q.get('code'),
-             q.get('codeLanguage') or q.get('code_language'),
-             q.get('image'),
-             q.get('imageAlt') or q.get('image_alt'),
-             q.get('explanation'),
-             q.get('difficulty', 0),
-             json.dumps(q.get('optionExplanations')) if q.get('optionExplanations') else None))
+        qid = q.get('id') if isinstance(q, dict) else None
+        if qid in stored and qid not in claimed:
+            claim(idx, qid)
+    for idx, content in enumerate(incoming):
+        if matched[idx] is None:
+            qid = next((i for i in by_content.get(content, ()) if i not in claimed), None)
+            if qid is not None:
+                claim(idx, qid)
+    for idx, content in enumerate(incoming):
+        if matched[idx] is None:
+            qid = by_index.get(idx)
+            if qid is None or qid in claimed:
+                continue
+            old = stored[qid][1]
+            # Same slot and same stem, or same type and options: an edit, not a new question
+            if content[0] == old[0] or content[1:3] == old[1:3]:
+                claim(idx, qid)
+
+    now = datetime.now()
+    inserts, updates = [], []
+    for idx, content in enumerate(incoming):
+        qid = matched[idx]
+        if qid is None:
+            inserts.append((quiz_id, idx) + content)
+            continue
+        row, old = stored[qid]
+        if old != content or row['question_index'] != idx or not row['is_active']:
+            updates.append((idx,) + content + (now, qid))
+    removed = [(now, qid) for qid, (row, _) in stored.items() if row['is_active'] and qid not in claimed]
+
+    if removed:
+        c.executemany('UPDATE questions SET is_active = 0, updated_at = ? WHERE id = ?', removed)
+    if updates:
+        c.executemany(f'''UPDATE questions SET question_index = ?,
+                          {", ".join(col + " = ?" for col in _QUESTION_CONTENT_COLUMNS)},
+                          is_active = 1, updated_at = ? WHERE id = ?''', updates)
+    if inserts:
+        c.executemany(_QUESTION_INSERT_SQL, inserts)
+    return {'inserted': len(inserts), 'updated': len(updates), 'removed': len(removed),
+            'unchanged': len(incoming) - len(inserts) - len(updates)}
+
+def _question_from_row(row):
+    """Convert a questions-table row to the frontend question dict."""
+    q = {
+        'id': row['id'],
+        'question': row['question_text'],
+        'type': row['type'],
+    }
+    if row['options'] is not None:
+        q['options'] = json.loads(row['options'])
+    if row['correct'] is not None:
+        q['correct'] = json.loads(row['correct'])
+    if row['pairs'] is not None:
+        q['pairs'] = json.loads(row['pairs'])
+    if row['code']:
+        q['code'] = row['code']
+    if row['code_language']:
+        q['codeLanguage'] = row['code_language']
+    if row['image']:
+        q['image'] = row['image']
+    if row['image_alt']:
+        q['imageAlt'] = row['image_alt']
+    if row['explanation']:
+        q['explanation'] = row['explanation']
+    if row['option_explanations']:
+        q['optionExplanations'] = json.loads(row['option_explanations'])
+    return q
 
 def _read_questions_for_quiz(c, quiz_id):
     """Read questions from normalized table and return as list of dicts matching frontend format."""
     c.execute('SELECT * FROM questions WHERE quiz_id = ? AND is_active = 1 ORDER BY question_index', (quiz_id,))
-    rows = c.fetchall()
-    questions = []
-    for row in rows:
-        q = {
-            'id': row['id'],
-            'question': row['question_text'],
-            'type': row['type'],
-        }
-        if row['options'] is not None:
-            q['options'] = json.loads(row['options'])
-        if row['correct'] is not None:
-            q['correct'] = json.loads(row['correct'])
-        if row['pairs'] is not None:
-            q['pairs'] = json.loads(row['pairs'])
-        if row['code']:
-            q['code'] = row['code']
-        if row['code_language']:
-            q['codeLanguage'] = row['code_language']
-        if row['image']:
-            q['image'] = row['image']
-        if row['image_alt']:
-            q['imageAlt'] = row['image_alt']
-        if row['explanation']:
-            q['explanation'] = row['explanation']
-        if row['option_explanations']:
-            q['optionExplanations'] = json.loads(row['option_explanations'])
-        questions.append(q)
-    return questions
+    return [_question_from_row(row) for row in c.fetchall()]
+
+_QUESTION_READ_CHUNK = 500  # stays well under SQLite's bound-parameter limit
 
+def _read_questions_for_quizzes(c, quiz_ids):
+    """Read questions for many quizzes in one pass; returns {quiz_id: [question, ...]}.
+
+    Replaces a per-quiz _read_questions_for_quiz loop: one query per chunk of
+    ids, rows grouped in memory in question_index order.
+    """
+    grouped = {quiz_id: [] for quiz_id in quiz_ids}
+    ids = list(grouped)
+    for start in range(0, len(ids), _QUESTION_READ_CHUNK):
+        chunk = ids[start:start + _QUESTION_READ_CHUNK]
+        c.execute(f'''SELECT * FROM questions
+                      WHERE quiz_id IN ({",".join("?" * len(chunk))}) AND is_active = 1
+                      ORDER BY quiz_id, question_index''', chunk)
+        for row in c.fetchall():
+            grouped[row['quiz_id']].append(_question_from_row(row))
+    return grouped
 
 def _migrate_quiz(c, quiz_id, questions_json_str):
     """Migrate a single quiz from JSON blob to normalized questions table."""
@@ -493,100 +1579,258 @@ def _migrate_quiz(c, quiz_id, questions_json_str):
         questions_list = json.loads(questions_json_str)
     except (json.JSONDecodeError, TypeError):
         return False
-    if not questions_list:
+    if not isinstance(questions_list, list):
         return False
+    # An empty quiz migrates to zero rows; leaving it unmigrated would keep it on the blob path forever
     _insert_questions_for_quiz(c, quiz_id, questions_list)
-    c.execute('UPDATE quizzes SET is_migrated = 1 WHERE id = ?', (quiz_id,))
+    if WRITE_QUESTION_BLOB:
+        c.execute('UPDATE quizzes SET is_migrated = 1 WHERE id = ?', (quiz_id,))
+    else:
+        c.execute("UPDATE quizzes SET is_migrated = 1, questions = '[]' WHERE id = ?", (quiz_id,))
     return True
 
+# === Answer Grading ===
+# Each question is compiled once into a small grader holding its answer key
+# in ready-to-compare form, so grading doesn't re-parse JSON or rebuild sets.
+# GradingEngine keeps them in an LRU keyed by question id, each entry tagged
+# with the content it was compiled from (type, correct, pairs):
+#   - graders(rows) is for callers that already read the rows (attempts,
+#     simulations); an edited question no longer matches its entry and is
+#     recompiled.
+#   - graders_for_ids(c, ids, user_id) is for POST /api/grade, which only
+#     has ids: it re-reads the rows on every call, joined to their quiz, so
+#     a question is graded (and its key returned) only while it is active
+#     and in a quiz the user owns or that is public. Only the compiling is
+#     cached, so edits from any worker are seen at once.
+#
+# Grading rules (unchanged from the quiz player's):
+#   truefalse  correct [0] means True, [1] means False; the answer is a bool
+#   choice     one index, or a list of indices compared as a set
+#   matching   correct once every pair has been matched
+#   ordering   correct when the submitted items are back in original order
+# Anything else, including a question whose answer key can't be parsed,
+# grades as incorrect.
+GRADER_CACHE_SIZE = int(os.environ.get('QUIZ_GRADER_CACHE_SIZE', 20000))
+GRADE_MAX_ANSWERS = 500
+
+_GRADE_NEVER, _GRADE_TRUEFALSE, _GRADE_CHOICE, _GRADE_CHOICE_RAW, _GRADE_MATCHING, _GRADE_ORDERING = range(6)
+
+class CompiledQuestion:
+    __slots__ = ('kind', 'expected', 'correct_set', 'answer_key')
+
+    def __init__(self, kind, expected=None, correct_set=None, answer_key=None):
+        self.kind = kind
+        self.expected = expected
+        self.correct_set = correct_set
+        self.answer_key = answer_key  # parsed `correct`, returned to the client after grading
+
+    @classmethod
+    def from_row(cls, row):
+        """Compile a questions row (needs type, correct and pairs)."""
+        q_type = row['type']
+        try:
+            correct = json.loads(row['correct']) if row['correct'] else []
+        except (ValueError, TypeError):
+            return cls(_GRADE_NEVER)
+        try:
+            if q_type == 'truefalse':
+                if isinstance(correct, list) and correct:
+                    return cls(_GRADE_TRUEFALSE, correct[0] == 0, answer_key=correct)  # 0 means True is correct
+            elif q_type == 'choice':
+                if isinstance(correct, list) and correct:
+                    try:
+                        correct_set = frozenset(correct)
+                    except TypeError:
+                        correct_set = None
+                    return cls(_GRADE_CHOICE, correct[0], correct_set, correct)
+                return cls(_GRADE_CHOICE_RAW, correct, answer_key=correct)
+            elif q_type == 'matching':
+                return cls(_GRADE_MATCHING, len(json.loads(row['pairs'])) if row['pairs'] else 0, answer_key=correct)
+            elif q_type == 'ordering':
+                return cls(_GRADE_ORDERING, answer_key=correct)
+        except (ValueError, TypeError):
+            pass
+        return cls(_GRADE_NEVER, answer_key=correct)
+
+    def grade(self, answer):
+        if answer is None:
+            return False
+        kind = self.kind
+        if kind == _GRADE_CHOICE:
+            if isinstance(answer, list):
+                try:
+                    return self.correct_set is not None and set(answer) == self.correct_set
+                except TypeError:
+                    return False
+            return answer == self.expected
+        if kind == _GRADE_TRUEFALSE:
+            return bool(answer) == self.expected
+        if kind == _GRADE_CHOICE_RAW:
+            return answer == self.expected
+        if kind == _GRADE_MATCHING:
+            return isinstance(answer, dict) and len(answer) == self.expected
+        if kind == _GRADE_ORDERING:
+            if not isinstance(answer, list):
+                return False
+            for i, item in enumerate(answer):
+                if (item.get('origIndex', i) if isinstance(item, dict) else item) != i:
+                    return False
+            return True
+        return False
+
+class _GraderEntry:
+    __slots__ = ('version', 'grader', 'quiz_id')
+
+    def __init__(self, version, grader, quiz_id):
+        self.version = version
+        self.grader = grader
+        self.quiz_id = quiz_id
+
+class GradingEngine:
+    """LRU of CompiledQuestion by question id, tagged with the content it was compiled from."""
+
+    def __init__(self, max_size):
+        self.max_size = max(1, max_size)
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._stats = {'hits': 0, 'compiled': 0, 'loaded': 0, 'evictions': 0, 'invalidations': 0}
+
+    @staticmethod
+    def _version(row):
+        return (row['type'], row['correct'], row['pairs'])
+
+    def _store(self, rows):
+        """Compile rows and cache them; caller holds no lock. Returns the graders."""
+        compiled = [CompiledQuestion.from_row(row) for row in rows]
+        with self._lock:
+            for row, grader in zip(rows, compiled):
+                self._entries[row['id']] = _GraderEntry(self._version(row), grader, row['quiz_id'])
+                self._entries.move_to_end(row['id'])
+            self._stats['compiled'] += len(compiled)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self._stats['evictions'] += 1
+        return compiled
+
+    def graders(self, rows):
+        """Graders for questions rows (id, quiz_id, type, correct, pairs), compiling only what changed."""
+        found = [None] * len(rows)
+        with self._lock:
+            for i, row in enumerate(rows):
+                entry = self._entries.get(row['id'])
+                if entry is not None and entry.version == self._version(row):
+                    self._entries.move_to_end(row['id'])
+                    found[i] = entry.grader
+            self._stats['hits'] += sum(1 for grader in found if grader is not None)
+        missing = [i for i, grader in enumerate(found) if grader is None]
+        if missing:
+            for i, grader in zip(missing, self._store([rows[i] for i in missing])):
+                found[i] = grader
+        return found
+
+    def graders_for_ids(self, c, question_ids, user_id):
+        """{question_id: grader} for the ids that are active and in an own or public quiz."""
+        found = {}
+        for start in range(0, len(question_ids), _QUESTION_READ_CHUNK):
+            chunk = question_ids[start:start + _QUESTION_READ_CHUNK]
+            c.execute(f'''SELECT q.id, q.quiz_id, q.type, q.correct, q.pairs
+                          FROM questions q JOIN quizzes qz ON qz.id = q.quiz_id
+                          WHERE q.id IN ({",".join("?" * len(chunk))}) AND q.is_active = 1
+                          AND (qz.user_id = ? OR qz.is_public = 1)''', (*chunk, user_id))
+            rows = c.fetchall()
+            with self._lock:
+                self._stats['loaded'] += len(rows)
+            found.update(zip((row['id'] for row in rows), self.graders(rows)))
+        return found
+
+    def grade_many(self, rows, answers):
+        """Grade answers[i] against rows[i]; returns a list of bools."""
+        return [grader.grade(answer) for grader, answer in zip(self.graders(rows), answers)]
+
+    def invalidate_quiz(self, quiz_id):
+        """Forget every cached question of a quiz (call after editing or deleting it)."""
+        with self._lock:
+            stale = [qid for qid, entry in self._entries.items() if entry.quiz_id == quiz_id]
+            for qid in stale:
+                del self._entries[qid]
+            self._stats['invalidations'] += len(stale)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats, size=len(self._entries))
+
+_grader = GradingEngine(GRADER_CACHE_SIZE)
+
+# One row per answered question; executemany() sends the whole attempt at once
+_QUESTION_PERFORMANCE_UPSERT_SQL = '''INSERT INTO question_performance
+    (user_id, question_id, times_seen, times_correct, times_incorrect,
+     last_seen_at, last_correct_at, average_time_ms)
+    VALUES (?, ?, 1, ?, ?, ?, ?, ?)
+    ON CONFLICT(user_id, question_id) DO UPDATE SET
+    times_seen = times_seen + 1,
+    times_correct = times_correct + excluded.times_correct,
+    times_incorrect = times_incorrect + excluded.times_incorrect,
+    last_seen_at = excluded.last_seen_at,
+    last_correct_at = CASE WHEN excluded.times_correct = 1 THEN excluded.last_seen_at ELSE last_correct_at END,
+    average_time_ms = CASE
+        WHEN excluded.average_time_ms IS NOT NULL AND average_time_ms IS NOT NULL
+        THEN (average_time_ms * (times_seen - 1) + excluded.average_time_ms) / times_seen
+        WHEN excluded.average_time_ms IS NOT NULL THEN excluded.average_time_ms
+        ELSE average_time_ms END,
+    updated_at = ?'''
+
+def _grade_answers(question_rows, answers, times, key):
+    """Grade answers in memory; returns [(question_id, is_correct, time_ms)].
+
+    answers / times map key(question row) -> the user's answer / time in ms;
+    questions with no answer are skipped.
+    """
+    answered = [(qrow, key(qrow)) for qrow in question_rows]
+    answered = [(qrow, k) for qrow, k in answered if k in answers]
+    rows = [qrow for qrow, _ in answered]
+    verdicts = _grader.grade_many(rows, [answers[k] for _, k in answered])
+    return [(qrow['id'], is_correct, times.get(k) if times else None)
+            for (qrow, k), is_correct in zip(answered, verdicts)]
+
+def _record_question_results(c, user_id, results):
+    """Upsert question_performance for every (question_id, is_correct, time_ms) in one executemany."""
+    if not results:
+        return
+    now = datetime.now()
+    c.executemany(_QUESTION_PERFORMANCE_UPSERT_SQL,
+                  [(user_id, question_id, 1 if is_correct else 0, 0 if is_correct else 1,
+                    now, now if is_correct else None, time_ms, now)
+                   for question_id, is_correct, time_ms in results])
+
 def _update_question_performance(c, user_id, quiz_id, answers_data, question_times=None):
     """Update question_performance table after an attempt.
     answers_data: dict mapping question_index (str) -> user's answer
     question_times: optional dict mapping question_index (str) -> time_ms
     """
-    # Get question IDs for this quiz
-    c.execute('SELECT id, question_index, correct, type, pairs FROM questions WHERE quiz_id = ? ORDER BY question_index', (quiz_id,))
-    question_rows = c.fetchall()
-    if not question_rows:
-        return
-
-    for qrow in question_rows:
-        q_idx = str(qrow['question_index'])
-        if q_idx not in answers_data:
+    c.execute('SELECT id, quiz_id, question_index, correct, type, pairs FROM questions WHERE quiz_id = ? AND is_active = 1 ORDER BY question_index', (quiz_id,))
+    results = _grade_answers(c.fetchall(), answers_data, question_times,
+                             key=lambda qrow: str(qrow['question_index']))
+    _record_question_results(c, user_id, results)
+
+def _update_question_performance_by_id(c, user_id, answers_data, question_times=None):
+    """Same as _update_question_performance, for answers keyed by question id (str) across quizzes."""
+    question_ids = []
+    for q_id_str in answers_data:
+        try:
+            question_ids.append(int(q_id_str))
+        except (TypeError, ValueError):
             continue
-
-        user_answer = answers_data[q_idx]
-        correct_data = json.loads(qrow['correct']) if qrow['correct'] else []
-        q_type = qrow['type']
-
-        # Determine if answer is correct
-        is_correct = _check_answer_correct(user_answer, correct_data, q_type, qrow)
-
-        time_ms = question_times.get(q_idx) if question_times else None
-        now = datetime.now()
-
-        c.execute('''INSERT INTO question_performance
-            (user_id, question_id, times_seen, times_correct, times_incorrect,
-             last_seen_at, last_correct_at, average_time_ms)
-            VALUES (?, ?, 1, ?, ?, ?, ?, ?)
-            ON CONFLICT(user_id, question_id) DO UPDATE SET
-            times_seen = times_seen + 1,
-            times_correct = times_correct + ?,
-            times_incorrect = times_incorrect + ?,
-            last_seen_at = ?,
-            last_correct_at = CASE WHEN ? = 1 THEN ? ELSE last_correct_at END,
-            average_time_ms = CASE
-                WHEN ? IS NOT NULL AND average_time_ms IS NOT NULL
-                THEN (average_time_ms * (times_seen - 1) + ?) / times_seen
-                WHEN ? IS NOT NULL THEN ?
-                ELSE average_time_ms END,
-            updated_at = ?''',
-            (user_id, qrow['id'],
-             1 if is_correct else 0,
-             0 if is_correct else 1,
-             now,
-             now if is_correct else None,
-             time_ms,
-             # ON CONFLICT params
-             1 if is_correct else 0,
-             0 if is_correct else 1,
-             now,
-             1 if is_correct else 0, now,
-             time_ms, time_ms,
-             time_ms, time_ms,
-             now))
-
-def _check_answer_correct(user_answer, correct_data, q_type, qrow):
-    """Check if a user's answer is correct for a given question."""
-    if user_answer is None:
-        return False
-    if q_type == 'truefalse':
-        # correct_data is [0] for True, [1] for False (0 = True index, 1 = False index)
-        # user_answer is a Python bool (True/False) sent from the frontend
-        if isinstance(correct_data, list) and len(correct_data) > 0:
-            correct_bool = correct_data[0] == 0  # 0 means True is correct
-            user_bool = bool(user_answer)
-            return user_bool == correct_bool
-        return False
-    if q_type == 'choice':
-        if isinstance(correct_data, list) and len(correct_data) > 0:
-            if isinstance(user_answer, list):
-                return set(user_answer) == set(correct_data)
-            return user_answer == correct_data[0]
-        return user_answer == correct_data
-    elif q_type == 'matching':
-        # Matching is correct if all pairs are matched
-        if isinstance(user_answer, dict):
-            pairs = json.loads(qrow['pairs']) if qrow['pairs'] else []
-            return len(user_answer) == len(pairs)
-        return False
-    elif q_type == 'ordering':
-        if isinstance(user_answer, list):
-            expected = list(range(len(user_answer)))
-            actual = [item.get('origIndex', i) if isinstance(item, dict) else item for i, item in enumerate(user_answer)]
-            return actual == expected
-        return False
-    return False
+    question_rows = []
+    for start in range(0, len(question_ids), _QUESTION_READ_CHUNK):
+        chunk = question_ids[start:start + _QUESTION_READ_CHUNK]
+        c.execute(f'SELECT id, quiz_id, correct, type, pairs FROM questions WHERE id IN ({",".join("?" * len(chunk))})', chunk)
+        question_rows.extend(c.fetchall())
+    results = _grade_answers(question_rows, answers_data, question_times, key=lambda qrow: str(qrow['id']))
+    _record_question_results(c, user_id, results)
 
 # === Auth Helpers ===
 
@@ -616,34 +1860,456 @@ def hash_password(password, salt=None):
         h = hashlib.pbkdf2_hmac('sha256', password.encode(), salt.encode(), 100000).hex()
         return h, salt
 
-def verify_password(password, stored_hash, salt):
-    """
-    Verify password against stored hash.
-    Supports bcrypt, PBKDF2, and legacy SHA256 (for existing users).
-    """
+PASSWORD_SCHEME = 'bcrypt' if BCRYPT_AVAILABLE else 'pbkdf2'
+
+def _verify_password_scheme(password, stored_hash, salt):
+    """Return the scheme ('bcrypt', 'sha256' or 'pbkdf2') the password matched under, or None."""
     # Check for bcrypt first
-    if salt == 'bcrypt' and BCRYPT_AVAILABLE:
+    if salt == 'bcrypt':
+        if not BCRYPT_AVAILABLE:
+            return None
         try:
-            return bcrypt.checkpw(password.encode(), stored_hash.encode())
-        except:
-            return False
+            return 'bcrypt' if bcrypt.checkpw(password.encode(), stored_hash.encode()) else None
+        except (ValueError, TypeError):
+            return None
     
     # Try legacy SHA256 first (for existing users)
     # This was the original method: sha256(password + salt)
     legacy_hash = hashlib.sha256((password + salt).encode()).hexdigest()
     if secrets.compare_digest(legacy_hash, stored_hash):
-        return True
+        return 'sha256'
     
     # Try PBKDF2 (for users created after the upgrade)
     if len(stored_hash) == 64 and len(salt) == 64:
         try:
             pbkdf2_hash = hashlib.pbkdf2_hmac('sha256', password.encode(), salt.encode(), 100000).hex()
             if secrets.compare_digest(pbkdf2_hash, stored_hash):
-                return True
-        except:
+                return 'pbkdf2'
+        except (ValueError, TypeError):
             pass
     
-    return False
+    return None
+
+def verify_password(password, stored_hash, salt):
+    """
+    Verify password against stored hash.
+    Supports bcrypt, PBKDF2, and legacy SHA256 (for existing users).
+    """
+    return _verify_password_scheme(password, stored_hash, salt) is not None
+
+# === Password Hashing Pool ===
+# bcrypt and PBKDF2 both release the GIL, so a small thread pool caps how
+# many CPU-heavy hashes run at once; a login burst then queues here instead
+# of starving every other request. Once the pool and its queue are full,
+# callers get HashPoolBusy straight away and the route answers 503.
+HASH_WORKERS = int(os.environ.get('QUIZ_HASH_WORKERS', max(2, (os.cpu_count() or 2) // 2)))
+HASH_QUEUE_MAX = int(os.environ.get('QUIZ_HASH_QUEUE', HASH_WORKERS * 4))
+HASH_TIMEOUT = float(os.environ.get('QUIZ_HASH_TIMEOUT', 10))
+
+class HashPoolBusy(Exception):
+    """The hashing pool is saturated; retry later."""
+
+class PasswordHashPool:
+    def __init__(self, workers, max_queued, timeout):
+        self.workers = workers
+        self.max_queued = max_queued
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='pwhash')
+        self._slots = threading.BoundedSemaphore(workers + max_queued)
+        self._lock = threading.Lock()
+        self._active = 0
+        self._pending = 0
+        self._counts = {'completed': 0, 'rejected': 0, 'timeouts': 0, 'wait_ms': 0.0, 'run_ms': 0.0}
+
+    def run(self, fn, *args):
+        """Run fn(*args) on the pool and return its result, or raise HashPoolBusy."""
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self._counts['rejected'] += 1
+            raise HashPoolBusy()
+        with self._lock:
+            self._pending += 1
+        queued_at = time.perf_counter()
+        try:
+            fut = self._executor.submit(self._call, fn, args, queued_at)
+        except Exception:
+            with self._lock:
+                self._pending -= 1
+            self._slots.release()
+            raise
+        try:
+            return fut.result(timeout=self.timeout)
+        except FutureTimeoutError:
+            with self._lock:
+                self._counts['timeouts'] += 1
+            raise HashPoolBusy()
+
+    def _call(self, fn, args, queued_at):
+        started = time.perf_counter()
+        with self._lock:
+            self._pending -= 1
+            self._active += 1
+        try:
+            return fn(*args)
+        finally:
+            finished = time.perf_counter()
+            with self._lock:
+                self._active -= 1
+                self._counts['completed'] += 1
+                self._counts['wait_ms'] += (started - queued_at) * 1000
+                self._counts['run_ms'] += (finished - started) * 1000
+            self._slots.release()
+
+    def stats(self):
+        with self._lock:
+            counts = dict(self._counts)
+            active, pending = self._active, self._pending
+        done = counts.pop('completed')
+        wait_ms, run_ms = counts.pop('wait_ms'), counts.pop('run_ms')
+        return {'workers': self.workers, 'max_queued': self.max_queued, 'active': active,
+                'queue_depth': pending, 'completed': done, **counts,
+                'avg_wait_ms': round(wait_ms / done, 1) if done else None,
+                'avg_hash_ms': round(run_ms / done, 1) if done else None}
+
+_hash_pool = PasswordHashPool(HASH_WORKERS, HASH_QUEUE_MAX, HASH_TIMEOUT)
+
+def _hash_pool_busy_response():
+    resp = jsonify({'error': 'Server is busy. Please try again in a moment.', 'retry_after': 1})
+    resp.headers['Retry-After'] = '1'
+    return resp, 503
+
+# === Session Cache ===
+# token -> (user_id, username, expires_at) so token_required can skip the
+# sessions JOIN users lookup on nearly every request. Entries are re-checked
+# against the DB once they are SESSION_CACHE_TTL seconds old, which also
+# bounds how long another worker's revocation can go unseen when each worker
+# keeps its own local store. Point QUIZ_SESSION_CACHE_URL at Redis to share
+# one store (and its invalidations) across workers.
+SESSION_CACHE_SIZE = int(os.environ.get('QUIZ_SESSION_CACHE_SIZE', 10000))
+SESSION_CACHE_TTL = float(os.environ.get('QUIZ_SESSION_CACHE_TTL', 60))
+SESSION_CACHE_URL = os.environ.get('QUIZ_SESSION_CACHE_URL', '')
+
+class LocalSessionStore:
+    """Per-process LRU of session entries (user_id, username, expires_ts, cached_ts)."""
+    name = 'local'
+
+    def __init__(self, size):
+        self.size = size
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._by_user = {}
+        self._lock = threading.Lock()
+
+    def get(self, token):
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is not None:
+                self._entries.move_to_end(token)
+            return entry
+
+    def set(self, token, entry):
+        with self._lock:
+            self._entries[token] = entry
+            self._entries.move_to_end(token)
+            self._by_user.setdefault(entry[0], set()).add(token)
+            while len(self._entries) > self.size:
+                old_token, old_entry = self._entries.popitem(last=False)
+                self._unlink(old_entry[0], old_token)
+                self.evictions += 1
+
+    def delete(self, token):
+        with self._lock:
+            entry = self._entries.pop(token, None)
+            if entry is not None:
+                self._unlink(entry[0], token)
+            return entry is not None
+
+    def delete_user(self, user_id):
+        with self._lock:
+            tokens = self._by_user.pop(user_id, ())
+            for token in tokens:
+                self._entries.pop(token, None)
+            return len(tokens)
+
+    def purge_expired(self, now):
+        with self._lock:
+            expired = [t for t, e in self._entries.items() if e[2] <= now]
+            for token in expired:
+                self._unlink(self._entries.pop(token)[0], token)
+            return len(expired)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._by_user.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _unlink(self, user_id, token):
+        tokens = self._by_user.get(user_id)
+        if tokens is not None:
+            tokens.discard(token)
+            if not tokens:
+                del self._by_user[user_id]
+
+class RedisSessionStore:
+    """Shared store for multi-worker deployments; keys expire on their own."""
+    name = 'redis'
+    _PREFIX = 'quiz:session:'
+
+    def __init__(self, url, ttl):
+        import redis
+        self.ttl = ttl
+        self.evictions = 0  # Redis evicts by its own maxmemory policy
+        self._r = redis.Redis.from_url(url)
+        self._r.ping()
+
+    def _key(self, token):
+        return self._PREFIX + token
+
+    def _user_key(self, user_id):
+        return f'{self._PREFIX}user:{user_id}'
+
+    def get(self, token):
+        raw = self._r.get(self._key(token))
+        return tuple(json.loads(raw)) if raw else None
+
+    def set(self, token, entry):
+        ttl = max(1, int(min(self.ttl, entry[2] - time.time())))
+        pipe = self._r.pipeline()
+        pipe.set(self._key(token), json.dumps(entry), ex=ttl)
+        pipe.sadd(self._user_key(entry[0]), token)
+        pipe.expire(self._user_key(entry[0]), int(self.ttl) + 1)
+        pipe.execute()
+
+    def delete(self, token):
+        entry = self.get(token)
+        pipe = self._r.pipeline()
+        pipe.delete(self._key(token))
+        if entry is not None:
+            pipe.srem(self._user_key(entry[0]), token)
+        return bool(pipe.execute()[0])
+
+    def delete_user(self, user_id):
+        tokens = [t.decode() for t in self._r.smembers(self._user_key(user_id))]
+        if tokens:
+            self._r.delete(*(self._key(t) for t in tokens))
+        self._r.delete(self._user_key(user_id))
+        return len(tokens)
+
+    def purge_expired(self, now):
+        return 0  # handled by key TTLs
+
+    def clear(self):
+        keys = list(self._r.scan_iter(self._PREFIX + '*'))
+        if keys:
+            self._r.delete(*keys)
+
+    def __len__(self):
+        return sum(1 for k in self._r.scan_iter(self._PREFIX + '*') if b':user:' not in k)
+
+class SessionCache:
+    """TTL check, invalidation and hit-rate accounting over a session store."""
+
+    def __init__(self, store, ttl):
+        self.store = store
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._counts = {'hits': 0, 'misses': 0, 'stale': 0, 'expired': 0, 'invalidations': 0}
+
+    def _count(self, key, n=1):
+        with self._lock:
+            self._counts[key] += n
+
+    def get(self, token):
+        """Return (user_id, username) for a live cached session, else None."""
+        entry = self.store.get(token)
+        if entry is None:
+            self._count('misses')
+            return None
+        now = time.time()
+        if entry[2] <= now:
+            self.store.delete(token)
+            self._count('expired')
+            self._count('misses')
+            return None
+        if now - entry[3] > self.ttl:
+            self._count('stale')
+            self._count('misses')
+            return None
+        self._count('hits')
+        return entry[0], entry[1]
+
+    def put(self, token, user_id, username, expires_at):
+        if isinstance(expires_at, str):
+            expires_at = datetime.fromisoformat(expires_at)
+        self.store.set(token, (user_id, username, expires_at.timestamp(), time.time()))
+
+    def invalidate(self, token):
+        if self.store.delete(token):
+            self._count('invalidations')
+
+    def invalidate_user(self, user_id):
+        self._count('invalidations', self.store.delete_user(user_id))
+
+    def purge_expired(self):
+        self._count('invalidations', self.store.purge_expired(time.time()))
+
+    def stats(self):
+        with self._lock:
+            counts = dict(self._counts)
+        lookups = counts['hits'] + counts['misses']
+        counts.update(backend=self.store.name, size=len(self.store), ttl=self.ttl,
+                      evictions=self.store.evictions,
+                      hit_rate=round(counts['hits'] / lookups, 3) if lookups else None)
+        return counts
+
+def _make_session_store():
+    if SESSION_CACHE_URL:
+        try:
+            return RedisSessionStore(SESSION_CACHE_URL, SESSION_CACHE_TTL)
+        except Exception as e:
+            print(f"Warning: session cache backend unavailable ({e}). Using per-process cache.")
+    return LocalSessionStore(SESSION_CACHE_SIZE)
+
+_session_cache = SessionCache(_make_session_store(), SESSION_CACHE_TTL)
+
+# === Signed Access Tokens ===
+# Optional stateless mode (QUIZ_AUTH_TOKENS=signed). login/register hand out
+# a short-lived HMAC-signed access token plus the usual sessions-table token,
+# which now only serves as the refresh token for POST /api/auth/refresh.
+# Verifying an access token is pure CPU; the only DB read is the periodic
+# reload of the revocation list, so any number of workers can share one
+# QUIZ_TOKEN_SECRET without touching SQLite per request.
+AUTH_TOKEN_MODE = os.environ.get('QUIZ_AUTH_TOKENS', 'session')
+TOKEN_SECRET = os.environ.get('QUIZ_TOKEN_SECRET', '')
+ACCESS_TOKEN_TTL = int(os.environ.get('QUIZ_ACCESS_TOKEN_TTL', 900))          # seconds
+REVOCATION_REFRESH = float(os.environ.get('QUIZ_REVOCATION_REFRESH', 15))    # seconds
+SESSION_TTL = timedelta(days=int(os.environ.get('QUIZ_SESSION_DAYS', 7)))
+
+def _b64url(data):
+    return base64.urlsafe_b64encode(data).rstrip(b'=').decode()
+
+def _b64url_decode(text):
+    return base64.urlsafe_b64decode(text + '=' * (-len(text) % 4))
+
+class TokenSigner:
+    """Issue and verify 'v1.<payload>.<hmac-sha256>' access tokens."""
+    PREFIX = 'v1.'
+
+    def __init__(self, secret, ttl):
+        self._key = secret.encode()
+        self.ttl = ttl
+
+    @classmethod
+    def looks_signed(cls, token):
+        return token.startswith(cls.PREFIX)
+
+    def _sign(self, body):
+        return _b64url(hmac.new(self._key, (self.PREFIX + body).encode(), hashlib.sha256).digest())
+
+    def issue(self, user_id, username, session_id):
+        now = time.time()
+        claims = {'uid': user_id, 'usr': username, 'sid': session_id,
+                  'iat': now, 'exp': now + self.ttl, 'jti': secrets.token_urlsafe(12)}
+        body = _b64url(json.dumps(claims, separators=(',', ':')).encode())
+        return f'{self.PREFIX}{body}.{self._sign(body)}'
+
+    def verify(self, token):
+        """Return the claims of a valid, unexpired token, else None."""
+        try:
+            body, sig = token[len(self.PREFIX):].split('.')
+        except ValueError:
+            return None
+        if not hmac.compare_digest(sig, self._sign(body)):
+            return None
+        try:
+            claims = json.loads(_b64url_decode(body))
+        except ValueError:
+            return None
+        if claims.get('exp', 0) <= time.time():
+            return None
+        return claims
+
+class RevocationList:
+    """Per-process copy of token_revocations, reloaded incrementally every few seconds."""
+
+    def __init__(self, interval):
+        self.interval = interval
+        self._jtis = {}         # jti -> expires_at
+        self._user_cutoff = {}  # user_id -> (revoked_at, expires_at)
+        self._last_id = 0
+        self._loaded_at = 0.0
+        self._lock = threading.Lock()
+
+    def refresh(self, force=False):
+        now = time.time()
+        if not force and now - self._loaded_at < self.interval:
+            return
+        with self._lock:
+            if not force and now - self._loaded_at < self.interval:
+                return
+            self._loaded_at = now
+            conn = get_db()
+            try:
+                rows = conn.execute('''SELECT id, jti, user_id, revoked_at, expires_at FROM token_revocations
+                                       WHERE id > ? AND expires_at > ? ORDER BY id''',
+                                    (self._last_id, now)).fetchall()
+            finally:
+                conn.close()
+            for row in rows:
+                self._add(row['jti'], row['user_id'], row['revoked_at'], row['expires_at'])
+                self._last_id = row['id']
+            self._jtis = {j: exp for j, exp in self._jtis.items() if exp > now}
+            self._user_cutoff = {u: v for u, v in self._user_cutoff.items() if v[1] > now}
+
+    def _add(self, jti, user_id, revoked_at, expires_at):
+        if jti:
+            self._jtis[jti] = expires_at
+        elif user_id is not None and revoked_at > self._user_cutoff.get(user_id, (0, 0))[0]:
+            self._user_cutoff[user_id] = (revoked_at, expires_at)
+
+    def is_revoked(self, claims):
+        self.refresh()
+        if claims['jti'] in self._jtis:
+            return True
+        cutoff = self._user_cutoff.get(claims['uid'])
+        return cutoff is not None and claims['iat'] <= cutoff[0]
+
+    def revoke_token(self, claims):
+        self._record(claims['jti'], claims['uid'], time.time(), claims['exp'])
+
+    def revoke_user(self, user_id):
+        now = time.time()
+        # Any access token still alive was issued at most one TTL ago
+        self._record(None, user_id, now, now + ACCESS_TOKEN_TTL)
+
+    def _record(self, jti, user_id, revoked_at, expires_at):
+        _db_writer.execute('''INSERT INTO token_revocations (jti, user_id, revoked_at, expires_at)
+                              VALUES (?, ?, ?, ?)''', (jti, user_id, revoked_at, expires_at))
+        with self._lock:
+            self._add(jti, user_id, revoked_at, expires_at)
+
+    def stats(self):
+        return {'tokens': len(self._jtis), 'users': len(self._user_cutoff),
+                'age_s': round(time.time() - self._loaded_at, 1) if self._loaded_at else None}
+
+_token_signer = None
+if AUTH_TOKEN_MODE == 'signed':
+    if not TOKEN_SECRET:
+        TOKEN_SECRET = secrets.token_hex(32)
+        print("Warning: QUIZ_TOKEN_SECRET not set. Signed tokens will not survive a restart "
+              "or verify on other workers.")
+    _token_signer = TokenSigner(TOKEN_SECRET, ACCESS_TOKEN_TTL)
+_revocations = RevocationList(REVOCATION_REFRESH)
+
+def _auth_tokens(user_id, username, session_token, session_id):
+    """Token fields for a login/register response in the configured auth mode."""
+    if _token_signer is None:
+        return {'token': session_token}
+    return {'token': _token_signer.issue(user_id, username, session_id),
+            'refresh_token': session_token, 'expires_in': ACCESS_TOKEN_TTL}
 
 def token_required(f):
     @wraps(f)
@@ -654,20 +2320,34 @@ def token_required(f):
         if not token:
             return jsonify({'error': 'Token missing'}), 401
         
-        conn = get_db()
-        c = conn.cursor()
-        c.execute('''SELECT s.user_id, u.username, u.email FROM sessions s
-            JOIN users u ON s.user_id = u.id
-            WHERE s.token = ? AND s.expires_at > ? AND u.is_active = 1''',
-            (token, datetime.now()))
-        session = c.fetchone()
-        conn.close()
-        
-        if not session:
-            return jsonify({'error': 'Invalid token'}), 401
-        
-        request.user_id = session['user_id']
-        request.username = session['username']
+        if _token_signer is not None and TokenSigner.looks_signed(token):
+            claims = _token_signer.verify(token)
+            if claims is None or _revocations.is_revoked(claims):
+                return jsonify({'error': 'Invalid token'}), 401
+            request.user_id, request.username = claims['uid'], claims['usr']
+            request.session_token = None
+            request.token_claims = claims
+            return f(*args, **kwargs)
+
+        cached = _session_cache.get(token)
+        if cached is None:
+            conn = get_db()
+            c = conn.cursor()
+            c.execute('''SELECT s.user_id, s.expires_at, u.username FROM sessions s
+                JOIN users u ON s.user_id = u.id
+                WHERE s.token = ? AND s.expires_at > ? AND u.is_active = 1''',
+                (token, datetime.now()))
+            session = c.fetchone()
+            conn.close()
+
+            if not session:
+                return jsonify({'error': 'Invalid token'}), 401
+            _session_cache.put(token, session['user_id'], session['username'], session['expires_at'])
+            cached = session['user_id'], session['username']
+
+        request.user_id, request.username = cached
+        request.session_token = token
+        request.token_claims = None
         return f(*args, **kwargs)
     return decorated
 
@@ -696,7 +2376,10 @@ def register():
     if not email:
         return jsonify({'error': 'Email address is required'}), 400
 
-    h, salt = hash_password(password)
+    try:
+        h, salt = _hash_pool.run(hash_password, password)
+    except HashPoolBusy:
+        return _hash_pool_busy_response()
     conn = get_db()
     c = conn.cursor()
 
@@ -712,12 +2395,13 @@ def register():
 
         token = secrets.token_hex(32)
         c.execute('INSERT INTO sessions (user_id, token, expires_at) VALUES (?, ?, ?)',
-            (user_id, token, datetime.now() + timedelta(days=7)))
+            (user_id, token, datetime.now() + SESSION_TTL))
+        session_id = c.lastrowid
 
         conn.commit()
         print(f"[DEV] Email verify token for {username}: {verify_token}")
         return jsonify({
-            'token': token,
+            **_auth_tokens(user_id, username, token, session_id),
             'user': {'id': user_id, 'username': username, 'email_verified': False}
         }), 201
     except sqlite3.IntegrityError:
@@ -732,31 +2416,54 @@ def login():
     username = data.get('username', '').strip()
     password = data.get('password', '')
     
-    conn = get_db()
-    c = conn.cursor()
-    c.execute(
-        '''SELECT id, username, password_hash, salt, is_active,
-                  COALESCE(email_verified, 0) as email_verified
-           FROM users WHERE username = ?''', (username,))
-    user = c.fetchone()
+    # Read the user on a connection that goes back to the pool before hashing,
+    # so logins waiting on the hash pool don't hold database connections
+    pooled = _db_pool.checkout()
+    try:
+        user = pooled.execute(
+            '''SELECT id, username, password_hash, salt, is_active,
+                      COALESCE(email_verified, 0) as email_verified
+               FROM users WHERE username = ?''', (username,)).fetchone()
+    finally:
+        _db_pool.checkin(pooled)
 
-    if not user or not user['is_active'] or not verify_password(password, user['password_hash'], user['salt']):
-        conn.close()
+    if not user or not user['is_active']:
+        return jsonify({'error': 'Invalid credentials'}), 401
+    try:
+        scheme = _hash_pool.run(_verify_password_scheme, password, user['password_hash'], user['salt'])
+    except HashPoolBusy:
+        return _hash_pool_busy_response()
+    if scheme is None:
         return jsonify({'error': 'Invalid credentials'}), 401
 
+    # Rehash-on-login: move legacy SHA-256 / PBKDF2 users onto the current scheme
+    # while we hold the plaintext; skipped (and retried next login) if the pool is busy
+    rehashed = None
+    if scheme != PASSWORD_SCHEME:
+        try:
+            rehashed = _hash_pool.run(hash_password, password)
+        except HashPoolBusy:
+            pass
+
+    conn = get_db()
+    c = conn.cursor()
+    if rehashed:
+        c.execute('UPDATE users SET password_hash = ?, salt = ? WHERE id = ?', (*rehashed, user['id']))
+
     # Prune expired sessions for this user
     c.execute('DELETE FROM sessions WHERE user_id = ? AND expires_at < ?',
               (user['id'], datetime.now()))
 
     token = secrets.token_hex(32)
     c.execute('INSERT INTO sessions (user_id, token, expires_at) VALUES (?, ?, ?)',
-        (user['id'], token, datetime.now() + timedelta(days=7)))
+        (user['id'], token, datetime.now() + SESSION_TTL))
+    session_id = c.lastrowid
     c.execute('UPDATE users SET last_login = ? WHERE id = ?', (datetime.now(), user['id']))
     conn.commit()
     conn.close()
 
     return jsonify({
-        'token': token,
+        **_auth_tokens(user['id'], user['username'], token, session_id),
         'user': {
             'id': user['id'],
             'username': user['username'],
@@ -764,6 +2471,41 @@ def login():
         }
     })
 
+@app.route('/api/auth/logout', methods=['POST'])
+@token_required
+def logout():
+    """Revoke the caller's session token (or signed access token and its refresh session)."""
+    claims = request.token_claims
+    if claims is not None:
+        _revocations.revoke_token(claims)
+        _db_writer.execute('DELETE FROM sessions WHERE id = ? AND user_id = ?', (claims['sid'], claims['uid']))
+    else:
+        _db_writer.execute('DELETE FROM sessions WHERE token = ?', (request.session_token,))
+        _session_cache.invalidate(request.session_token)
+    return jsonify({'message': 'Logged out'})
+
+@app.route('/api/auth/refresh', methods=['POST'])
+@rate_limit("30 per minute")
+def refresh_access_token():
+    """Exchange a refresh token (a sessions-table token) for a new signed access token."""
+    if _token_signer is None:
+        return jsonify({'error': 'Signed tokens are not enabled'}), 404
+    refresh_token = (request.get_json(silent=True) or {}).get('refresh_token', '')
+    if not refresh_token:
+        return jsonify({'error': 'Refresh token missing'}), 400
+    conn = get_db()
+    c = conn.cursor()
+    c.execute('''SELECT s.id, s.user_id, u.username FROM sessions s
+        JOIN users u ON s.user_id = u.id
+        WHERE s.token = ? AND s.expires_at > ? AND u.is_active = 1''',
+        (refresh_token, datetime.now()))
+    session = c.fetchone()
+    conn.close()
+    if not session:
+        return jsonify({'error': 'Invalid refresh token'}), 401
+    return jsonify({'token': _token_signer.issue(session['user_id'], session['username'], session['id']),
+                    'expires_in': ACCESS_TOKEN_TTL})
+
 @app.route('/api/auth/resend-verification', methods=['POST'])
 @token_required
 def resend_verification():
@@ -773,18 +2515,15 @@ def resend_verification():
     # Check if already verified
     c.execute('SELECT COALESCE(email_verified, 0) FROM users WHERE id = ?', (request.user_id,))
     row = c.fetchone()
+    conn.close()
     if row and row[0]:
-        conn.close()
         return jsonify({'message': 'Email already verified'}), 200
 
     verify_token = secrets.token_urlsafe(32)
     verify_expires = datetime.now() + timedelta(hours=24)
-    with _db_write_lock:
-        c.execute(
-            'UPDATE users SET email_token = ?, email_token_expires = ? WHERE id = ?',
-            (verify_token, verify_expires, request.user_id))
-        conn.commit()
-    conn.close()
+    _db_writer.execute(
+        'UPDATE users SET email_token = ?, email_token_expires = ? WHERE id = ?',
+        (verify_token, verify_expires, request.user_id))
     print(f"[DEV] Email verify token for user {request.user_id}: {verify_token}")
     return jsonify({'message': 'Verification token generated (dev: check server log)'})
 
@@ -803,27 +2542,128 @@ def verify_email():
            WHERE email_token = ? AND email_token_expires > ?''',
         (token, datetime.now()))
     row = c.fetchone()
+    conn.close()
     if not row:
-        conn.close()
         return jsonify({'error': 'Invalid or expired token'}), 400
 
-    with _db_write_lock:
-        c.execute(
-            'UPDATE users SET email_verified = 1, email_token = NULL, email_token_expires = NULL WHERE id = ?',
-            (row['id'],))
-        conn.commit()
-    conn.close()
+    _db_writer.execute(
+        'UPDATE users SET email_verified = 1, email_token = NULL, email_token_expires = NULL WHERE id = ?',
+        (row['id'],))
     return jsonify({'message': 'Email verified successfully'})
 
 
 # === Quiz Routes ===
 
+_QUIZ_QUESTION_COUNT_SQL = '''CASE WHEN is_migrated = 1
+        THEN (SELECT COUNT(*) FROM questions WHERE quiz_id = quizzes.id AND is_active = 1)
+        WHEN json_valid(questions) THEN json_array_length(questions)
+        ELSE 0
+    END'''
+
+QUIZ_PAGE_FIELDS = ('id', 'user_id', 'title', 'description', 'color', 'is_public',
+                    'created_at', 'last_modified', 'is_owned', 'question_count', 'questions')
+QUIZ_PAGE_DEFAULT_FIELDS = QUIZ_PAGE_FIELDS[:-1]
+QUIZ_PAGE_MAX_LIMIT = 100
+
+def _encode_quiz_cursor(row):
+    key = [row['is_owned'], row['last_modified'], row['id']]
+    return base64.urlsafe_b64encode(json.dumps(key).encode()).decode().rstrip('=')
+
+def _decode_quiz_cursor(cursor):
+    """Return (is_owned, last_modified, id) or raise ValueError."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        is_owned, last_modified, quiz_id = json.loads(raw)
+    except Exception:
+        raise ValueError('Invalid cursor')
+    if is_owned not in (0, 1) or not isinstance(quiz_id, int):
+        raise ValueError('Invalid cursor')
+    return is_owned, last_modified, quiz_id
+
+def _list_quizzes_page(c, user_id, cursor, limit, fields):
+    """One keyset page of the library, ordered by (is_owned, last_modified, id) descending.
+
+    Owned and public quizzes are read as two index-ordered range scans
+    (idx_quizzes_user_modified, idx_quizzes_public_modified) rather than
+    one OR query, so the cost of a page does not depend on how many quizzes
+    precede it. Returns (quizzes, next_cursor).
+    """
+    columns = f'''id, user_id, title, description, color, is_public, created_at, last_modified,
+                   is_migrated, {_QUIZ_QUESTION_COUNT_SQL} AS question_count'''
+    if 'questions' in fields:
+        columns += ', CASE WHEN is_migrated = 1 THEN NULL ELSE questions END AS questions_blob'
+
+    rows = []
+    want = limit + 1  # one extra row tells us whether another page exists
+    if cursor is None or cursor[0] == 1:
+        sql = f'SELECT {columns}, 1 AS is_owned FROM quizzes WHERE user_id = ?'
+        params = [user_id]
+        if cursor is not None:
+            sql += ' AND (last_modified, id) < (?, ?)'
+            params += [cursor[1], cursor[2]]
+        c.execute(sql + ' ORDER BY last_modified DESC, id DESC LIMIT ?', params + [want])
+        rows.extend(c.fetchall())
+    if len(rows) < want:
+        sql = f'SELECT {columns}, 0 AS is_owned FROM quizzes WHERE is_public = 1 AND user_id != ?'
+        params = [user_id]
+        if cursor is not None and cursor[0] == 0:
+            sql += ' AND (last_modified, id) < (?, ?)'
+            params += [cursor[1], cursor[2]]
+        c.execute(sql + ' ORDER BY last_modified DESC, id DESC LIMIT ?', params + [want - len(rows)])
+        rows.extend(c.fetchall())
+
+    next_cursor = _encode_quiz_cursor(rows[limit - 1]) if len(rows) > limit else None
+    rows = rows[:limit]
+
+    if 'questions' in fields:
+        migrated = _read_questions_for_quizzes(c, [r['id'] for r in rows if r['is_migrated']])
+    quizzes = []
+    for row in rows:
+        q = {f: row[f] for f in fields if f != 'questions'}
+        if 'questions' in fields:
+            q['questions'] = migrated[row['id']] if row['is_migrated'] else json.loads(row['questions_blob'])
+        quizzes.append(q)
+    return quizzes, next_cursor
+
 @app.route('/api/quizzes', methods=['GET'])
 @token_required
 def get_quizzes():
+    # ?limit= / ?cursor= switch to keyset paging; ?fields= picks the returned columns
+    if 'limit' in request.args or 'cursor' in request.args:
+        limit = max(1, min(request.args.get('limit', 50, type=int), QUIZ_PAGE_MAX_LIMIT))
+        fields = [f for f in (request.args.get('fields') or '').split(',') if f] or list(QUIZ_PAGE_DEFAULT_FIELDS)
+        unknown = [f for f in fields if f not in QUIZ_PAGE_FIELDS]
+        if unknown:
+            return jsonify({'error': f"Unknown fields: {', '.join(unknown)}"}), 400
+        cursor = None
+        if request.args.get('cursor'):
+            try:
+                cursor = _decode_quiz_cursor(request.args['cursor'])
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 400
+        conn = get_db()
+        quizzes, next_cursor = _list_quizzes_page(conn.cursor(), request.user_id, cursor, limit, fields)
+        conn.close()
+        return jsonify({'quizzes': quizzes, 'next_cursor': next_cursor})
+
     conn = get_db()
     c = conn.cursor()
+    # ?summary=1 skips question bodies; clients fetch them per quiz via GET /api/quizzes/<id>
+    summary = request.args.get('summary', '').lower() in ('1', 'true', 'yes')
     # Return owned quizzes + all public quizzes, owned ones first
+    if summary:
+        c.execute(f'''
+            SELECT id, user_id, title, description, color, is_public, created_at, last_modified,
+                   (user_id = ?) as is_owned,
+                   {_QUIZ_QUESTION_COUNT_SQL} AS question_count
+            FROM quizzes
+            WHERE user_id = ? OR is_public = 1
+            ORDER BY is_owned DESC, last_modified DESC
+        ''', (request.user_id, request.user_id))
+        quizzes = [dict(r) for r in c.fetchall()]
+        conn.close()
+        return jsonify({'quizzes': quizzes})
+
     c.execute('''
         SELECT *, (user_id = ?) as is_owned
         FROM quizzes
@@ -831,10 +2671,11 @@ def get_quizzes():
         ORDER BY is_owned DESC, last_modified DESC
     ''', (request.user_id, request.user_id))
     quizzes = [dict(r) for r in c.fetchall()]
+    # Dual-path: migrated quizzes come from the normalized table in one batched read
+    migrated = _read_questions_for_quizzes(c, [q['id'] for q in quizzes if q.get('is_migrated')])
     for q in quizzes:
-        # Dual-path: read from normalized table if migrated
         if q.get('is_migrated'):
-            q['questions'] = _read_questions_for_quiz(c, q['id'])
+            q['questions'] = migrated[q['id']]
         else:
             q['questions'] = json.loads(q['questions'])
     conn.close()
@@ -849,16 +2690,18 @@ def create_quiz():
         return jsonify({'error': 'Title required'}), 400
 
     questions_list = data.get('questions', [])
-    conn = get_db()
-    c = conn.cursor()
-    # Dual-write: JSON blob + normalized questions table
-    c.execute('INSERT INTO quizzes (user_id, title, description, questions, color, is_migrated) VALUES (?, ?, ?, ?, ?, 1)',
-        (request.user_id, title, data.get('description', ''), json.dumps(questions_list),
-         data.get('color', '#6366f1')))
-    quiz_id = c.lastrowid
-    _insert_questions_for_quiz(c, quiz_id, questions_list)
-    conn.commit()
-    conn.close()
+    user_id = request.user_id
+
+    def write(c):
+        # Dual-write: JSON blob + normalized questions table
+        c.execute('INSERT INTO quizzes (user_id, title, description, questions, color, is_migrated) VALUES (?, ?, ?, ?, ?, 1)',
+            (user_id, title, data.get('description', ''), _question_blob(questions_list),
+             data.get('color', '#6366f1')))
+        quiz_id = c.lastrowid
+        _insert_questions_for_quiz(c, quiz_id, questions_list)
+        return quiz_id
+
+    quiz_id = _db_writer.run(write)
     return jsonify({'message': 'Created', 'quiz_id': quiz_id}), 201
 
 
@@ -1029,13 +2872,8 @@ def _check_ai_rate_limit(user_id):
 
 def _log_ai_usage(user_id, input_tokens, output_tokens, question_count, model):
     """Record an AI generation in the usage table."""
-    conn = get_db()
-    c = conn.cursor()
-    with _db_write_lock:
-        c.execute('INSERT INTO ai_usage (user_id, input_tokens, output_tokens, question_count, model) VALUES (?, ?, ?, ?, ?)',
-                  (user_id, input_tokens, output_tokens, question_count, model))
-        conn.commit()
-    conn.close()
+    _db_writer.execute('INSERT INTO ai_usage (user_id, input_tokens, output_tokens, question_count, model) VALUES (?, ?, ?, ?, ?)',
+                       (user_id, input_tokens, output_tokens, question_count, model))
 
 def _build_ai_system_prompt():
     """Return the system prompt for quiz generation. Cached across requests."""
@@ -1480,39 +3318,38 @@ def get_quiz(id):
 def update_quiz(id):
     data = request.get_json()
     questions_list = data.get('questions', [])
-    conn = get_db()
-    c = conn.cursor()
-    # Dual-write: update JSON blob AND normalized questions
-    c.execute('UPDATE quizzes SET title=?, description=?, questions=?, color=?, is_public=?, is_migrated=1, last_modified=? WHERE id=? AND user_id=?',
-        (data.get('title'), data.get('description', ''), json.dumps(questions_list),
-         data.get('color', '#6366f1'),
-         1 if data.get('is_public') else 0,
-         datetime.now(), id, request.user_id))
-    # Replace normalized questions: delete old, insert new
-    c.execute('DELETE FROM questions WHERE quiz_id = ?', (id,))
-    _insert_questions_for_quiz(c, id, questions_list)
-    conn.commit()
-    conn.close()
-    return jsonify({'message': 'Updated'})
+    user_id = request.user_id
+
+    def write(c):
+        # Dual-write: update JSON blob AND normalized questions
+        c.execute('UPDATE quizzes SET title=?, description=?, questions=?, color=?, is_public=?, is_migrated=1, last_modified=? WHERE id=? AND user_id=?',
+            (data.get('title'), data.get('description', ''), _question_blob(questions_list),
+             data.get('color', '#6366f1'),
+             1 if data.get('is_public') else 0,
+             datetime.now(), id, user_id))
+        if c.rowcount == 0:
+            return None  # not this user's quiz; leave its questions alone
+        # Diff against the stored rows so question ids (and their history) survive edits
+        return _sync_questions_for_quiz(c, id, questions_list)
+
+    changes = _db_writer.run(write)
+    if changes is None:
+        return jsonify({'error': 'Not found or not authorized'}), 404
+    _grader.invalidate_quiz(id)
+    return jsonify({'message': 'Updated', 'changes': changes})
 
 @app.route('/api/quizzes/<int:id>/settings', methods=['PATCH'])
 @token_required
 def update_quiz_settings(id):
     """Lightweight update: is_public only."""
     data = request.get_json() or {}
-    conn = get_db()
-    c = conn.cursor()
-    with _db_write_lock:
-        c.execute('''UPDATE quizzes
-                     SET is_public=?, last_modified=?
-                     WHERE id=? AND user_id=?''',
-                  (1 if data.get('is_public') else 0,
-                   datetime.now(), id, request.user_id))
-        if c.rowcount == 0:
-            conn.close()
-            return jsonify({'error': 'Not found or not authorized'}), 404
-        conn.commit()
-    conn.close()
+    updated = _db_writer.execute('''UPDATE quizzes
+                                    SET is_public=?, last_modified=?
+                                    WHERE id=? AND user_id=?''',
+                                 (1 if data.get('is_public') else 0,
+                                  datetime.now(), id, request.user_id))
+    if updated == 0:
+        return jsonify({'error': 'Not found or not authorized'}), 404
     return jsonify({'message': 'Settings updated'})
 
 @app.route('/api/quizzes/<int:id>', methods=['DELETE'])
@@ -1523,33 +3360,75 @@ def delete_quiz(id):
     c.execute('DELETE FROM quizzes WHERE id = ? AND user_id = ?', (id, request.user_id))
     conn.commit()
     conn.close()
+    _grader.invalidate_quiz(id)
     return jsonify({'message': 'Deleted'})
 
 @app.route('/api/quizzes/<int:id>/attempts', methods=['POST'])
 @token_required
 def record_attempt(id):
     data = request.get_json()
-    conn = get_db()
-    c = conn.cursor()
-    c.execute('''INSERT INTO attempts (quiz_id, user_id, score, total, percentage, answers, study_mode, timed, max_streak, time_taken)
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)''',
-        (id, request.user_id, data.get('score', 0), data.get('total', 0), data.get('percentage', 0),
-         json.dumps(data.get('answers', {})), data.get('study_mode', False), data.get('timed', False),
-         data.get('max_streak', 0), data.get('time_taken')))
+    user_id = request.user_id
 
-    # Update per-question performance tracking
-    try:
-        answers_data = data.get('answers', {})
-        question_times = data.get('question_times', {})
-        if isinstance(answers_data, dict):
-            _update_question_performance(c, request.user_id, id, answers_data, question_times or None)
-    except Exception as e:
-        print(f"Warning: question_performance update failed: {e}")
+    def write(c):
+        c.execute('''INSERT INTO attempts (quiz_id, user_id, score, total, percentage, answers, study_mode, timed, max_streak, time_taken)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)''',
+            (id, user_id, data.get('score', 0), data.get('total', 0), data.get('percentage', 0),
+             json.dumps(data.get('answers', {})), data.get('study_mode', False), data.get('timed', False),
+             data.get('max_streak', 0), data.get('time_taken')))
 
-    conn.commit()
-    conn.close()
+        # Update per-question performance tracking
+        try:
+            answers_data = data.get('answers', {})
+            question_times = data.get('question_times', {})
+            if isinstance(answers_data, dict):
+                _update_question_performance(c, user_id, id, answers_data, question_times or None)
+        except Exception as e:
+            print(f"Warning: question_performance update failed: {e}")
+
+    _db_writer.run(write)
     return jsonify({'message': 'Recorded'}), 201
 
+@app.route('/api/grade', methods=['POST'])
+@token_required
+def grade_answers():
+    """Grade a batch of answers: {"answers": {"<question_id>": answer, ...}}.
+
+    Answers use the question's original (unshuffled) option indices. Each
+    result carries the verdict and the answer key, so clients can be sent
+    questions without `correct`. Only active questions in the user's own or
+    public quizzes are graded; other ids are listed as missing. Nothing is
+    recorded; attempts and simulations are still saved through their own
+    endpoints.
+    """
+    data = request.get_json(silent=True) or {}
+    answers = data.get('answers')
+    if not isinstance(answers, dict) or not answers:
+        return jsonify({'error': 'answers must be a non-empty object keyed by question id'}), 400
+    if len(answers) > GRADE_MAX_ANSWERS:
+        return jsonify({'error': f'At most {GRADE_MAX_ANSWERS} answers per request'}), 400
+    by_id = {}
+    for key, answer in answers.items():
+        try:
+            by_id[int(key)] = answer
+        except ValueError:
+            return jsonify({'error': f'Invalid question id: {key!r}'}), 400
+
+    conn = get_db()
+    graders = _grader.graders_for_ids(conn.cursor(), list(by_id), request.user_id)
+    conn.close()
+
+    results = {}
+    for qid, answer in by_id.items():
+        grader = graders.get(qid)
+        if grader is not None:
+            results[str(qid)] = {'is_correct': grader.grade(answer), 'correct': grader.answer_key}
+    return jsonify({
+        'results': results,
+        'score': sum(1 for r in results.values() if r['is_correct']),
+        'total': len(results),
+        'missing': [str(qid) for qid in by_id if qid not in graders],
+    })
+
 # === Profile & Stats (Synced to Database) ===
 
 @app.route('/api/profile', methods=['GET'])
@@ -1674,6 +3553,210 @@ def get_stats():
     })
 
 # === Quiz Progress Sync ===
+# The quiz player saves after every click. PATCH sends only what changed
+# (answers / flags / option shuffles keyed by question index, plus any
+# scalar fields); PUT still replaces the whole state. Neither writes
+# immediately: deltas are merged per (user, quiz) in ProgressBuffer and
+# applied to the stored row by one writer job every PROGRESS_FLUSH_MS, so a
+# burst of answers becomes a single upsert of the latest state. Deltas are
+# applied to the row inside the write transaction, so workers that each
+# buffer part of a session don't overwrite each other. GET overlays this
+# process's pending delta; another worker's becomes visible within one window.
+PROGRESS_FLUSH_MS = int(os.environ.get('QUIZ_PROGRESS_FLUSH_MS', 2000))
+PROGRESS_MAX_INDEX = 10000  # answers/flagged/option_shuffles keys must be below this
+
+PROGRESS_FIELDS = ('question_index', 'study_mode', 'randomize_options', 'quiz_streak',
+                   'max_quiz_streak', 'timer_enabled', 'time_remaining')
+PROGRESS_DEFAULTS = {'question_index': 0, 'answers': [], 'flagged': [], 'study_mode': True,
+                     'randomize_options': False, 'option_shuffles': {}, 'quiz_streak': 0,
+                     'max_quiz_streak': 0, 'timer_enabled': False, 'time_remaining': None}
+
+_PROGRESS_UPSERT_SQL = '''INSERT INTO quiz_progress
+    (user_id, quiz_id, question_index, answers, flagged, study_mode,
+     randomize_options, option_shuffles, quiz_streak, max_quiz_streak,
+     timer_enabled, time_remaining, updated_at)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT(user_id, quiz_id) DO UPDATE SET
+    question_index=excluded.question_index, answers=excluded.answers,
+    flagged=excluded.flagged, study_mode=excluded.study_mode,
+    randomize_options=excluded.randomize_options, option_shuffles=excluded.option_shuffles,
+    quiz_streak=excluded.quiz_streak, max_quiz_streak=excluded.max_quiz_streak,
+    timer_enabled=excluded.timer_enabled, time_remaining=excluded.time_remaining,
+    updated_at=excluded.updated_at'''
+
+def _progress_state(row):
+    """Decode a quiz_progress row (or None) into a state dict."""
+    if row is None:
+        return json.loads(json.dumps(PROGRESS_DEFAULTS))
+    state = dict(row)
+    state['answers'] = json.loads(state['answers'] or '[]')
+    state['flagged'] = json.loads(state['flagged'] or '[]')
+    state['option_shuffles'] = json.loads(state['option_shuffles'] or '{}')
+    return state
+
+def _progress_delta(replace=None):
+    return {'replace': replace, 'fields': {}, 'answers': {}, 'flagged': {}, 'option_shuffles': {}}
+
+def _merge_progress_delta(older, newer):
+    """Combine two deltas so that applying the result equals applying both in order."""
+    if newer['replace'] is not None:
+        return newer
+    merged = _progress_delta(older['replace'])
+    for part in ('fields', 'answers', 'flagged', 'option_shuffles'):
+        merged[part] = {**older[part], **newer[part]}
+    return merged
+
+def _apply_progress_delta(state, delta):
+    """Return state with delta applied (state is modified in place unless replaced)."""
+    if delta['replace'] is not None:
+        state = {**state, **json.loads(json.dumps(delta['replace']))}
+    state.update(delta['fields'])
+    answers = state['answers']
+    for idx, value in delta['answers'].items():
+        if idx >= len(answers):
+            answers.extend([None] * (idx + 1 - len(answers)))
+        answers[idx] = value
+    if delta['flagged']:
+        flagged = set(state['flagged'])
+        flagged.update(idx for idx, on in delta['flagged'].items() if on)
+        flagged.difference_update(idx for idx, on in delta['flagged'].items() if not on)
+        state['flagged'] = sorted(flagged)
+    for key, value in delta['option_shuffles'].items():
+        if value is None:
+            state['option_shuffles'].pop(key, None)
+        else:
+            state['option_shuffles'][key] = value
+    return state
+
+def _progress_index(key):
+    try:
+        idx = int(key)
+    except (TypeError, ValueError):
+        idx = -1
+    if not 0 <= idx < PROGRESS_MAX_INDEX:
+        raise ValueError(f'Invalid question index: {key!r}')
+    return idx
+
+def _parse_progress_patch(data):
+    """Build a delta from a PATCH body; raises ValueError on bad input."""
+    delta = _progress_delta()
+    delta['fields'] = {field: data[field] for field in PROGRESS_FIELDS if field in data}
+    for part in ('answers', 'flagged', 'option_shuffles'):
+        value = data.get(part)
+        if value is None:
+            continue
+        if not isinstance(value, dict):
+            raise ValueError(f'{part} must be an object keyed by question index')
+        for key, item in value.items():
+            idx = _progress_index(key)
+            if part == 'answers':
+                delta['answers'][idx] = item
+            elif part == 'flagged':
+                delta['flagged'][idx] = bool(item)
+            else:
+                delta['option_shuffles'][str(idx)] = item
+    return delta
+
+def _write_progress(c, items):
+    """Writer job: apply ((user_id, quiz_id), delta) pairs to the stored rows."""
+    written = 0
+    now = datetime.now()
+    for (user_id, quiz_id), delta in items:
+        c.execute('SELECT * FROM quiz_progress WHERE user_id = ? AND quiz_id = ?', (user_id, quiz_id))
+        state = _apply_progress_delta(_progress_state(c.fetchone()), delta)
+        try:
+            c.execute(_PROGRESS_UPSERT_SQL,
+                      (user_id, quiz_id, state['question_index'], json.dumps(state['answers']),
+                       json.dumps(state['flagged']), state['study_mode'], state['randomize_options'],
+                       json.dumps(state['option_shuffles']), state['quiz_streak'],
+                       state['max_quiz_streak'], state['timer_enabled'], state['time_remaining'], now))
+        except sqlite3.IntegrityError:
+            continue  # quiz deleted since the save was accepted
+        written += 1
+    return written
+
+class ProgressBuffer:
+    def __init__(self, interval):
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._pid = None
+        self._thread = None
+        self._stopping = threading.Event()
+        self._stats = {'deltas': 0, 'coalesced': 0, 'written': 0, 'failed': 0, 'flushes': 0}
+
+    def _ensure_started(self):
+        if self._pid == os.getpid() and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._pid != os.getpid() or not self._thread.is_alive():
+                if self._pid != os.getpid():
+                    self._pending = {}  # inherited across fork: the parent flushes its own copy
+                self._pid = os.getpid()
+                self._stopping.clear()
+                self._thread = threading.Thread(target=self._run, name='progress-buffer', daemon=True)
+                self._thread.start()
+
+    def add(self, key, delta):
+        self._ensure_started()
+        with self._lock:
+            self._stats['deltas'] += 1
+            if key in self._pending:
+                self._stats['coalesced'] += 1
+                delta = _merge_progress_delta(self._pending[key], delta)
+            self._pending[key] = delta
+
+    def pending(self, key):
+        with self._lock:
+            return self._pending.get(key)
+
+    def discard(self, key):
+        """Drop a pending delta. A flush already handed to the writer stays queued ahead of later jobs."""
+        with self._lock:
+            self._pending.pop(key, None)
+
+    def flush(self, user_id=None):
+        """Write pending deltas (all, or one user's) and wait for the commit."""
+        with self._lock:
+            items = [(key, delta) for key, delta in self._pending.items()
+                     if user_id is None or key[0] == user_id]
+            if not items:
+                return
+            for key, _ in items:
+                del self._pending[key]
+            # Submitted under the lock so a discard()+DELETE can't overtake it in the writer queue
+            fut = _db_writer.submit(_write_progress, items)
+        try:
+            written = fut.result(timeout=DB_WRITE_TIMEOUT)
+        except Exception as e:
+            app.logger.warning(f"[PROGRESS] flush of {len(items)} saves failed, will retry: {e}")
+            with self._lock:
+                self._stats['failed'] += len(items)
+                for key, delta in items:
+                    newer = self._pending.get(key)
+                    self._pending[key] = _merge_progress_delta(delta, newer) if newer else delta
+        else:
+            with self._lock:
+                self._stats['written'] += written
+                self._stats['flushes'] += 1
+
+    def stop(self, timeout=5):
+        """Flush and stop the flusher thread (registered with atexit)."""
+        if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+            self._stopping.set()
+            self._thread.join(timeout)
+
+    def _run(self):
+        while not self._stopping.wait(self.interval / 1000):
+            self.flush()
+        self.flush()
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats, pending=len(self._pending))
+
+_progress_buffer = ProgressBuffer(PROGRESS_FLUSH_MS)
+atexit.register(_progress_buffer.stop)  # runs before _db_writer.stop (atexit is LIFO)
 
 @app.route('/api/progress/<int:quiz_id>', methods=['GET'])
 @token_required
@@ -1686,67 +3769,63 @@ def get_quiz_progress(quiz_id):
     row = c.fetchone()
     conn.close()
     
-    if not row:
+    delta = _progress_buffer.pending((request.user_id, quiz_id))
+    if not row and delta is None:
         return jsonify({'progress': None})
     
-    progress = dict(row)
-    progress['answers'] = json.loads(progress['answers'] or '[]')
-    progress['flagged'] = json.loads(progress['flagged'] or '[]')
-    progress['option_shuffles'] = json.loads(progress['option_shuffles'] or '{}')
+    progress = _progress_state(row)
+    if delta is not None:
+        progress = _apply_progress_delta(progress, delta)
+        if not row:
+            progress.update(user_id=request.user_id, quiz_id=quiz_id, updated_at=str(datetime.now()))
     
     return jsonify({'progress': progress})
 
 @app.route('/api/progress/<int:quiz_id>', methods=['PUT'])
 @token_required
 def save_quiz_progress(quiz_id):
-    data = request.get_json()
-    conn = get_db()
-    c = conn.cursor()
-    
-    c.execute('''INSERT INTO quiz_progress 
-                 (user_id, quiz_id, question_index, answers, flagged, study_mode, 
-                  randomize_options, option_shuffles, quiz_streak, max_quiz_streak,
-                  timer_enabled, time_remaining, updated_at)
-                 VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                 ON CONFLICT(user_id, quiz_id) DO UPDATE SET
-                 question_index=excluded.question_index, answers=excluded.answers,
-                 flagged=excluded.flagged, study_mode=excluded.study_mode,
-                 randomize_options=excluded.randomize_options, option_shuffles=excluded.option_shuffles,
-                 quiz_streak=excluded.quiz_streak, max_quiz_streak=excluded.max_quiz_streak,
-                 timer_enabled=excluded.timer_enabled, time_remaining=excluded.time_remaining,
-                 updated_at=excluded.updated_at''',
-        (request.user_id, quiz_id,
-         data.get('question_index', 0),
-         json.dumps(data.get('answers', [])),
-         json.dumps(data.get('flagged', [])),
-         data.get('study_mode', True),
-         data.get('randomize_options', False),
-         json.dumps(data.get('option_shuffles', {})),
-         data.get('quiz_streak', 0),
-         data.get('max_quiz_streak', 0),
-         data.get('timer_enabled', False),
-         data.get('time_remaining'),
-         datetime.now()))
-    
-    conn.commit()
-    conn.close()
+    """Replace the whole saved state for this quiz."""
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({'error': 'JSON object required'}), 400
+    state = {field: data.get(field, default) for field, default in PROGRESS_DEFAULTS.items()}
+    if not isinstance(state['answers'], list) or not isinstance(state['flagged'], list) \
+            or not isinstance(state['option_shuffles'], dict):
+        return jsonify({'error': 'answers and flagged must be arrays, option_shuffles an object'}), 400
+    _progress_buffer.add((request.user_id, quiz_id), _progress_delta(replace=state))
+    return jsonify({'message': 'Progress saved'})
+
+@app.route('/api/progress/<int:quiz_id>', methods=['PATCH'])
+@token_required
+def patch_quiz_progress(quiz_id):
+    """Apply a partial update, e.g. {"answers": {"7": 2}, "flagged": {"3": true}, "question_index": 8}.
+
+    answers / option_shuffles entries set one question (null clears it);
+    flagged entries set or clear one flag.
+    """
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({'error': 'JSON object required'}), 400
+    try:
+        delta = _parse_progress_patch(data)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    _progress_buffer.add((request.user_id, quiz_id), delta)
     return jsonify({'message': 'Progress saved'})
 
 @app.route('/api/progress/<int:quiz_id>', methods=['DELETE'])
 @token_required
 def clear_quiz_progress(quiz_id):
-    conn = get_db()
-    c = conn.cursor()
-    c.execute('DELETE FROM quiz_progress WHERE user_id = ? AND quiz_id = ?',
-              (request.user_id, quiz_id))
-    conn.commit()
-    conn.close()
+    _progress_buffer.discard((request.user_id, quiz_id))
+    _db_writer.execute('DELETE FROM quiz_progress WHERE user_id = ? AND quiz_id = ?',
+                       (request.user_id, quiz_id))
     return jsonify({'message': 'Progress cleared'})
 
 @app.route('/api/progress', methods=['GET'])
 @token_required
 def get_all_progress():
     """Get all in-progress quizzes for the library display."""
+    _progress_buffer.flush(request.user_id)
     conn = get_db()
     c = conn.cursor()
     
@@ -1918,24 +3997,25 @@ def get_cert_performance(cert_id):
     c.execute('SELECT * FROM domains WHERE certification_id = ? AND parent_domain_id IS NULL ORDER BY sort_order', (cert_id,))
     domains = [dict(r) for r in c.fetchall()]
 
+    # Per-domain totals are maintained on write in user_domain_stats
+    c.execute('''SELECT s.domain_id, s.times_seen, s.times_correct, s.times_incorrect,
+            s.last_seen_at, s.unique_questions
+        FROM user_domain_stats s
+        JOIN domains d ON d.id = s.domain_id
+        WHERE s.user_id = ? AND d.certification_id = ? AND d.parent_domain_id IS NULL''',
+        (request.user_id, cert_id))
+    stats_by_domain = {row['domain_id']: row for row in c.fetchall()}
+
     for domain in domains:
-        c.execute('''SELECT
-                COALESCE(SUM(qp.times_seen), 0) as total_seen,
-                COALESCE(SUM(qp.times_correct), 0) as total_correct,
-                COALESCE(SUM(qp.times_incorrect), 0) as total_incorrect,
-                MAX(qp.last_seen_at) as last_studied,
-                COUNT(DISTINCT qp.question_id) as unique_questions
-            FROM question_performance qp
-            JOIN question_domains qd ON qp.question_id = qd.question_id
-            WHERE qp.user_id = ? AND qd.domain_id = ?''',
-            (request.user_id, domain['id']))
-        stats = dict(c.fetchone())
-        domain['total_seen'] = stats['total_seen']
-        domain['total_correct'] = stats['total_correct']
-        domain['total_incorrect'] = stats['total_incorrect']
-        domain['accuracy'] = round(stats['total_correct'] / stats['total_seen'] * 100, 1) if stats['total_seen'] > 0 else 0
-        domain['last_studied'] = stats['last_studied']
-        domain['unique_questions'] = stats['unique_questions']
+        stats = stats_by_domain.get(domain['id'])
+        seen = stats['times_seen'] if stats else 0
+        correct = stats['times_correct'] if stats else 0
+        domain['total_seen'] = seen
+        domain['total_correct'] = correct
+        domain['total_incorrect'] = stats['times_incorrect'] if stats else 0
+        domain['accuracy'] = round(correct / seen * 100, 1) if seen > 0 else 0
+        domain['last_studied'] = stats['last_seen_at'] if stats and stats['unique_questions'] else None
+        domain['unique_questions'] = stats['unique_questions'] if stats else 0
 
     conn.close()
     return jsonify({'domains': domains})
@@ -1975,7 +4055,7 @@ def get_weak_questions():
         FROM question_performance qp
         JOIN questions q ON qp.question_id = q.id
         JOIN quizzes qz ON q.quiz_id = qz.id
-        WHERE qp.user_id = ? AND qp.times_seen >= 2 AND qp.times_incorrect > 0'''
+        WHERE qp.user_id = ? AND q.is_active = 1 AND qp.times_seen >= 2 AND qp.times_incorrect > 0'''
     params = [request.user_id]
 
     if cert_id:
@@ -2021,6 +4101,8 @@ def start_exam_simulation(cert_id):
     total_questions = cert.get('total_questions') or 60
     data = request.get_json() or {}
     requested_count = data.get('question_count') or total_questions
+    # Clients that grade through POST /api/grade can leave the answer keys out
+    include_answers = not data.get('omit_answers')
 
     import random
     selected_questions = []
@@ -2055,7 +4137,7 @@ def start_exam_simulation(cert_id):
         }
         if row.get('options'):
             q['options'] = json.loads(row['options'])
-        if row.get('correct'):
+        if include_answers and row.get('correct'):
             q['correct'] = json.loads(row['correct'])
         if row.get('pairs'):
             q['pairs'] = json.loads(row['pairs'])
@@ -2089,52 +4171,27 @@ def start_exam_simulation(cert_id):
 def record_exam_simulation():
     """Record a completed exam simulation."""
     data = request.get_json()
-    conn = get_db()
-    c = conn.cursor()
-    c.execute('''INSERT INTO exam_simulations
-        (user_id, certification_id, score, total, percentage, passed, time_taken, time_limit, domain_scores, answers)
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)''',
-        (request.user_id, data['certification_id'], data['score'], data['total'],
-         data['percentage'], data['passed'], data.get('time_taken'),
-         data.get('time_limit'), json.dumps(data.get('domain_scores', {})),
-         json.dumps(data.get('answers', []))))
-
-    # Also update question_performance for each answered question
-    try:
-        answers_data = data.get('answers_detail', {})
-        question_times = data.get('question_times', {})
-        if isinstance(answers_data, dict):
-            # For simulations, we need to map by question_id not index
-            for q_id_str, user_answer in answers_data.items():
-                q_id = int(q_id_str)
-                c.execute('SELECT correct, type, pairs FROM questions WHERE id = ?', (q_id,))
-                qrow = c.fetchone()
-                if not qrow:
-                    continue
-                correct_data = json.loads(qrow['correct']) if qrow['correct'] else []
-                is_correct = _check_answer_correct(user_answer, correct_data, qrow['type'], qrow)
-                time_ms = question_times.get(q_id_str)
-                now = datetime.now()
-                c.execute('''INSERT INTO question_performance
-                    (user_id, question_id, times_seen, times_correct, times_incorrect, last_seen_at, last_correct_at, average_time_ms)
-                    VALUES (?, ?, 1, ?, ?, ?, ?, ?)
-                    ON CONFLICT(user_id, question_id) DO UPDATE SET
-                    times_seen = times_seen + 1,
-                    times_correct = times_correct + ?,
-                    times_incorrect = times_incorrect + ?,
-                    last_seen_at = ?,
-                    last_correct_at = CASE WHEN ? = 1 THEN ? ELSE last_correct_at END,
-                    updated_at = ?''',
-                    (request.user_id, q_id,
-                     1 if is_correct else 0, 0 if is_correct else 1,
-                     now, now if is_correct else None, time_ms,
-                     1 if is_correct else 0, 0 if is_correct else 1,
-                     now, 1 if is_correct else 0, now, now))
-    except Exception as e:
-        print(f"Warning: sim question_performance update failed: {e}")
+    user_id = request.user_id
+
+    def write(c):
+        c.execute('''INSERT INTO exam_simulations
+            (user_id, certification_id, score, total, percentage, passed, time_taken, time_limit, domain_scores, answers)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)''',
+            (user_id, data['certification_id'], data['score'], data['total'],
+             data['percentage'], data['passed'], data.get('time_taken'),
+             data.get('time_limit'), json.dumps(data.get('domain_scores', {})),
+             json.dumps(data.get('answers', []))))
+
+        # Also update question_performance for each answered question (keyed by question id)
+        try:
+            answers_data = data.get('answers_detail', {})
+            question_times = data.get('question_times', {})
+            if isinstance(answers_data, dict):
+                _update_question_performance_by_id(c, user_id, answers_data, question_times or None)
+        except Exception as e:
+            print(f"Warning: sim question_performance update failed: {e}")
 
-    conn.commit()
-    conn.close()
+    _db_writer.run(write)
     return jsonify({'message': 'Simulation recorded'}), 201
 
 # === Study Sessions ===
@@ -2775,204 +4832,406 @@ def preview_study_guide():
 
 # === Spaced Repetition System (SRS) Routes ===
 
+SRS_CARD_CACHE_SIZE = int(os.environ.get('QUIZ_SRS_CARD_CACHE_SIZE', 5000))
+SRS_DUE_MAX_LIMIT = 200
+
+_SRS_CARD_COLUMNS = ('question_text', 'type', 'options', 'correct', 'pairs', 'code',
+                     'code_language', 'image', 'image_alt', 'explanation', 'quiz_id')
+_SRS_JSON_COLUMNS = ('options', 'correct', 'pairs')
+
+class DecodedCardCache:
+    """LRU of decoded question fields for SRS cards by question id.
+
+    Entries are tagged with questions.updated_at, which every edit bumps, so
+    a changed question is re-read and re-decoded on its next appearance. The
+    fields don't depend on who reviews the card, so users share entries.
+    """
+
+    def __init__(self, max_size):
+        self.max_size = max(1, max_size)
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._stats = {'hits': 0, 'decoded': 0, 'evictions': 0}
+
+    def get_many(self, c, versions):
+        """{question_id: fields} for versions = {question_id: updated_at}; reads only what changed."""
+        found, missing = {}, []
+        with self._lock:
+            for qid, version in versions.items():
+                entry = self._entries.get(qid)
+                if entry is not None and entry[0] == version:
+                    self._entries.move_to_end(qid)
+                    found[qid] = entry[1]
+                else:
+                    missing.append(qid)
+            self._stats['hits'] += len(found)
+        for start in range(0, len(missing), _QUESTION_READ_CHUNK):
+            chunk = missing[start:start + _QUESTION_READ_CHUNK]
+            c.execute(f'''SELECT id, updated_at, {", ".join(_SRS_CARD_COLUMNS)} FROM questions
+                          WHERE id IN ({",".join("?" * len(chunk))})''', chunk)
+            decoded = []
+            for row in c.fetchall():
+                fields = {col: row[col] for col in _SRS_CARD_COLUMNS}
+                for col in _SRS_JSON_COLUMNS:
+                    if fields[col]:
+                        fields[col] = json.loads(fields[col])
+                decoded.append((row['id'], row['updated_at'], fields))
+                found[row['id']] = fields
+            with self._lock:
+                for qid, version, fields in decoded:
+                    self._entries[qid] = (version, fields)
+                    self._entries.move_to_end(qid)
+                self._stats['decoded'] += len(decoded)
+                while len(self._entries) > self.max_size:
+                    self._entries.popitem(last=False)
+                    self._stats['evictions'] += 1
+        return found
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats, size=len(self._entries))
+
+_card_cache = DecodedCardCache(SRS_CARD_CACHE_SIZE)
+
+_SRS_DUE_SQL = '''SELECT sc.*, q.updated_at AS question_version
+    FROM srs_cards sc
+    JOIN questions q ON sc.question_id = q.id
+    WHERE sc.user_id = ? AND sc.next_review_at <= datetime('now') AND q.is_active = 1
+    AND sc.status != 'graduated' '''
+
 @app.route('/api/srs/due', methods=['GET'])
 @token_required
 def get_due_cards():
-    """Get SRS cards due for review."""
-    limit = request.args.get('limit', 20, type=int)
+    """Get SRS cards due for review, plus the ids of the next page.
+
+    Query: limit (default 20), ids (comma-separated card ids: fetch exactly
+    these, e.g. a previous response's next_card_ids). The next page's
+    questions are decoded into the card cache before responding, so asking
+    for next_card_ids is a cache hit rather than another decode.
+    """
+    limit = max(1, min(request.args.get('limit', 20, type=int), SRS_DUE_MAX_LIMIT))
+    ids_arg = request.args.get('ids')
     conn = get_db()
     c = conn.cursor()
-    c.execute('''SELECT sc.*, q.question_text, q.type, q.options, q.correct, q.pairs,
-        q.code, q.code_language, q.image, q.image_alt, q.explanation, q.quiz_id
-        FROM srs_cards sc
-        JOIN questions q ON sc.question_id = q.id
-        WHERE sc.user_id = ? AND sc.next_review_at <= datetime('now')
-        AND sc.status != 'graduated'
-        ORDER BY sc.next_review_at ASC LIMIT ?''',
-        (request.user_id, limit))
-    rows = c.fetchall()
+    if ids_arg is not None:
+        try:
+            card_ids = [int(i) for i in ids_arg.split(',') if i.strip()][:SRS_DUE_MAX_LIMIT]
+        except ValueError:
+            conn.close()
+            return jsonify({'error': 'ids must be comma-separated integers'}), 400
+        order = {card_id: i for i, card_id in enumerate(card_ids)}
+        c.execute(f'''SELECT sc.*, q.updated_at AS question_version
+            FROM srs_cards sc
+            JOIN questions q ON sc.question_id = q.id
+            WHERE sc.user_id = ? AND sc.id IN ({",".join("?" * len(card_ids))}) AND q.is_active = 1''',
+            (request.user_id, *card_ids))
+        rows = sorted(c.fetchall(), key=lambda row: order[row['id']])
+        if rows:
+            # Continue the due queue after the last requested card
+            last = max(rows, key=lambda row: (row['next_review_at'], row['id']))
+            c.execute(_SRS_DUE_SQL + ''' AND (sc.next_review_at > ? OR (sc.next_review_at = ? AND sc.id > ?))
+                ORDER BY sc.next_review_at ASC, sc.id ASC LIMIT ?''',
+                (request.user_id, last['next_review_at'], last['next_review_at'], last['id'], limit))
+            upcoming = [row for row in c.fetchall() if row['id'] not in order]
+        else:
+            upcoming = []
+    else:
+        c.execute(_SRS_DUE_SQL + ''' ORDER BY sc.next_review_at ASC, sc.id ASC LIMIT ?''',
+                  (request.user_id, limit * 2))
+        rows = c.fetchall()
+        rows, upcoming = rows[:limit], rows[limit:]
+
+    fields = _card_cache.get_many(c, {row['question_id']: row['question_version'] for row in rows + upcoming})
+    conn.close()
     cards = []
     for row in rows:
         card = dict(row)
-        # Parse JSON fields
-        if card.get('options'):
-            card['options'] = json.loads(card['options'])
-        if card.get('correct'):
-            card['correct'] = json.loads(card['correct'])
-        if card.get('pairs'):
-            card['pairs'] = json.loads(card['pairs'])
+        del card['question_version']
+        card.update(fields.get(row['question_id'], {}))
         cards.append(card)
-    conn.close()
-    return jsonify({'cards': cards})
+    return jsonify({'cards': cards, 'next_card_ids': [row['id'] for row in upcoming]})
+
+SRS_WEAK_DECK_LIMIT = 500
+
+def _srs_deck_sources(data, user_id):
+    """[(select_sql, params)] choosing the question ids to add, or an error string.
+
+    The body names exactly one source: questionIds; quizId (an own or public
+    quiz); certificationId + domainId (the domain and its sub-domains); or
+    weak: true (the user's most-missed questions, optionally within
+    certificationId, up to limit).
+    """
+    sources = [key for key in ('questionIds', 'quizId', 'domainId', 'weak') if data.get(key)]
+    if not sources:
+        if data.get('certificationId'):
+            return 'certificationId needs domainId or weak: true'
+        return 'No question IDs provided'
+    if len(sources) > 1:
+        return 'Provide only one of questionIds, quizId, domainId or weak'
+    for key in ('quizId', 'certificationId', 'domainId'):
+        if data.get(key) is not None and type(data[key]) is not int:
+            return f'{key} must be an integer'
+    source = sources[0]
+    if source == 'questionIds':
+        question_ids = data['questionIds']
+        if not isinstance(question_ids, list):
+            return 'questionIds must be a list'
+        if any(type(qid) is not int for qid in question_ids):
+            return 'questionIds must be integers'
+        return [(f'''SELECT q.id FROM questions q JOIN quizzes qz ON qz.id = q.quiz_id
+                     WHERE q.id IN ({",".join("?" * len(chunk))}) AND q.is_active = 1
+                     AND (qz.user_id = ? OR qz.is_public = 1)''', [*chunk, user_id])
+                for chunk in (question_ids[i:i + _QUESTION_READ_CHUNK]
+                              for i in range(0, len(question_ids), _QUESTION_READ_CHUNK))]
+    if source == 'quizId':
+        return [('''SELECT q.id FROM questions q JOIN quizzes qz ON qz.id = q.quiz_id
+                    WHERE q.quiz_id = ? AND q.is_active = 1 AND (qz.user_id = ? OR qz.is_public = 1)''',
+                 [data['quizId'], user_id])]
+    if source == 'domainId':
+        if not data.get('certificationId'):
+            return 'certificationId is required with domainId'
+        return [('''SELECT DISTINCT qd.question_id AS id FROM domains d
+                    JOIN question_domains qd ON qd.domain_id = d.id
+                    JOIN questions q ON q.id = qd.question_id
+                    WHERE d.certification_id = ? AND (d.id = ? OR d.parent_domain_id = ?) AND q.is_active = 1''',
+                 [data['certificationId'], data['domainId'], data['domainId']])]
+    limit = data.get('limit', 50)
+    if type(limit) is not int or not 0 < limit <= SRS_WEAK_DECK_LIMIT:
+        return f'limit must be an integer 1-{SRS_WEAK_DECK_LIMIT}'
+    query = '''SELECT qp.question_id AS id FROM question_performance qp
+        JOIN questions q ON q.id = qp.question_id
+        WHERE qp.user_id = ? AND qp.times_seen >= 2 AND qp.times_incorrect > 0 AND q.is_active = 1'''
+    params = [user_id]
+    if data.get('certificationId'):
+        query += ''' AND EXISTS (
+            SELECT 1 FROM question_domains qd
+            JOIN domains d ON qd.domain_id = d.id
+            WHERE qd.question_id = qp.question_id AND d.certification_id = ?)'''
+        params.append(data['certificationId'])
+    query += ' ORDER BY CAST(qp.times_incorrect AS REAL) / qp.times_seen DESC LIMIT ?'
+    params.append(limit)
+    return [(query, params)]
 
 @app.route('/api/srs/cards', methods=['POST'])
 @token_required
 def add_srs_cards():
-    """Add questions to the SRS deck."""
-    data = request.get_json() or {}
-    question_ids = data.get('questionIds', [])
-    if not question_ids:
-        return jsonify({'error': 'No question IDs provided'}), 400
+    """Add questions to the SRS deck: listed ids, a whole quiz, a domain, or weak questions.
 
-    conn = get_db()
-    c = conn.cursor()
-    added = 0
-    for qid in question_ids:
-        try:
-            c.execute('''INSERT OR IGNORE INTO srs_cards (user_id, question_id)
-                VALUES (?, ?)''', (request.user_id, qid))
-            if c.rowcount > 0:
-                added += 1
-        except sqlite3.IntegrityError:
-            pass  # Question doesn't exist or already added
-    conn.commit()
-    conn.close()
-    return jsonify({'added': added, 'total_requested': len(question_ids)})
+    Each source is one INSERT ... SELECT (questionIds: one per 500 ids).
+    Returns how many cards were added and how many questions matched.
+    """
+    data = request.get_json(silent=True) or {}
+    sources = _srs_deck_sources(data, request.user_id)
+    if isinstance(sources, str):
+        return jsonify({'error': sources}), 400
+    user_id = request.user_id
+    listed = data.get('questionIds')
+
+    def write(c):
+        added = matched = 0
+        for select_sql, params in sources:
+            c.execute(f'INSERT OR IGNORE INTO srs_cards (user_id, question_id) SELECT ?, id FROM ({select_sql})',
+                      (user_id, *params))
+            added += c.rowcount
+            if not listed:
+                c.execute(f'SELECT COUNT(*) AS cnt FROM ({select_sql})', params)
+                matched += c.fetchone()['cnt']
+        return added, len(listed) if listed else matched
+
+    added, requested = _db_writer.run(write)
+    return jsonify({'added': added, 'total_requested': requested})
+
+SRS_MAX_BATCH = 500   # reviews per POST /api/srs/review/batch
+SRS_SCHEDULER = os.environ.get('QUIZ_SRS_SCHEDULER', 'sm2')  # for users without fitted weights: sm2 | fsrs
+SRS_RETENTION = os.environ.get('QUIZ_SRS_RETENTION', '0.9')  # FSRS target recall probability
+if SRS_SCHEDULER not in srs_scheduler.SCHEDULERS:
+    print(f"Warning: unknown QUIZ_SRS_SCHEDULER {SRS_SCHEDULER!r}; using sm2")
+    SRS_SCHEDULER = 'sm2'
+try:
+    SRS_RETENTION = float(SRS_RETENTION)
+except ValueError:
+    pass
+if not srs_scheduler.valid_retention(SRS_RETENTION):
+    print(f"Warning: QUIZ_SRS_RETENTION {SRS_RETENTION!r} is not between 0 and 1; using 0.9")
+    SRS_RETENTION = 0.9
 
-@app.route('/api/srs/review', methods=['POST'])
-@token_required
-def submit_srs_review():
-    """Submit a review result using the SM-2 algorithm."""
-    data = request.get_json() or {}
-    card_id = data.get('cardId')
-    quality = data.get('quality')
+def _parse_reviewed_at(value, now):
+    """A client review time (ISO 8601) as a naive local datetime, capped at now.
 
+    Missing means now; returns None if the value cannot be parsed.
+    """
+    if value is None:
+        return now
+    if not isinstance(value, str):
+        return None
+    try:
+        reviewed_at = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except ValueError:
+        return None
+    if reviewed_at.tzinfo is not None:
+        reviewed_at = reviewed_at.astimezone().replace(tzinfo=None)
+    return min(reviewed_at, now)
+
+def _parse_srs_review(item, now):
+    """(card_id, quality, reviewed_at) from one review object, or an error string."""
+    if not isinstance(item, dict):
+        return 'each review must be an object'
+    card_id, quality = item.get('cardId'), item.get('quality')
     if card_id is None or quality is None:
-        return jsonify({'error': 'cardId and quality are required'}), 400
+        return 'cardId and quality are required'
+    try:
+        card_id = int(card_id)
+    except (TypeError, ValueError):
+        return 'cardId must be an integer'
     if not isinstance(quality, int) or quality < 0 or quality > 5:
-        return jsonify({'error': 'quality must be an integer 0-5'}), 400
-
-    conn = get_db()
-    c = conn.cursor()
-
-    # Fetch the card
-    c.execute('SELECT * FROM srs_cards WHERE id = ? AND user_id = ?', (card_id, request.user_id))
-    card = c.fetchone()
-    if not card:
-        conn.close()
-        return jsonify({'error': 'Card not found'}), 404
-
-    repetitions = card['repetitions']
-    interval = card['interval_days']
-    ease_factor = card['ease_factor']
-
-    # SM-2 algorithm
-    if quality >= 3:  # correct response
-        if repetitions == 0:
-            interval = 1
-        elif repetitions == 1:
-            interval = 6
-        else:
-            interval = round(interval * ease_factor)
-        repetitions += 1
-    else:  # incorrect response
-        repetitions = 0
-        interval = 1
-
-    # Update ease factor
-    ease_factor = max(1.3, ease_factor + (0.1 - (5 - quality) * (0.08 + (5 - quality) * 0.02)))
+        return 'quality must be an integer 0-5'
+    reviewed_at = _parse_reviewed_at(item.get('reviewedAt'), now)
+    if reviewed_at is None:
+        return 'reviewedAt must be an ISO 8601 timestamp'
+    return card_id, quality, reviewed_at
+
+def _srs_scheduler_for(c, user_id):
+    """The user's scheduler: fitted FSRS weights from srs_user_params, else SRS_SCHEDULER."""
+    c.execute('SELECT scheduler, weights, retention FROM srs_user_params WHERE user_id = ?', (user_id,))
+    row = c.fetchone()
+    try:
+        if row:
+            weights = json.loads(row['weights']) if row['weights'] else None
+            retention = row['retention']
+            if retention is not None and not srs_scheduler.valid_retention(retention):
+                print(f"Warning: srs_user_params retention {retention!r} for user {user_id} "
+                      f"is not between 0 and 1; using {SRS_RETENTION}")
+                retention = None
+            return srs_scheduler.get_scheduler(row['scheduler'], weights,
+                                               SRS_RETENTION if retention is None else retention)
+    except ValueError as e:
+        print(f"Warning: bad srs_user_params for user {user_id}: {e}")
+    return srs_scheduler.get_scheduler(SRS_SCHEDULER, retention=SRS_RETENTION)
+
+def _apply_srs_reviews(c, user_id, reviews):
+    """Schedule [(card_id, quality, reviewed_at)] in order and write the results.
+
+    A card reviewed several times is rescheduled from its previous review in
+    the list. Reviews at or before the card's last_reviewed_at were already
+    applied (a retried offline sync) and are skipped, as are missing cards.
+    Every applied review is also appended to srs_review_log.
+    Returns (results, skipped).
+    """
+    scheduler = _srs_scheduler_for(c, user_id)
+    card_ids = sorted({card_id for card_id, _, _ in reviews})
+    cards = {}
+    for start in range(0, len(card_ids), _QUESTION_READ_CHUNK):
+        chunk = card_ids[start:start + _QUESTION_READ_CHUNK]
+        c.execute(f'''SELECT id, question_id, ease_factor, interval_days, repetitions, stability, difficulty,
+                   last_reviewed_at
+            FROM srs_cards WHERE user_id = ? AND id IN ({",".join("?" * len(chunk))})''', (user_id, *chunk))
+        for row in c.fetchall():
+            last = datetime.fromisoformat(row['last_reviewed_at']) if row['last_reviewed_at'] else None
+            cards[row['id']] = (row['question_id'], srs_scheduler.CardState(
+                row['ease_factor'], row['interval_days'], row['repetitions'],
+                row['stability'], row['difficulty'], last))
+
+    results, skipped, updates, performance, log = [], [], {}, [], []
+    for index, (card_id, quality, reviewed_at) in enumerate(reviews):
+        if card_id not in cards:
+            skipped.append({'index': index, 'card_id': card_id, 'reason': 'not_found'})
+            continue
+        question_id, state = cards[card_id]
+        last = state.last_reviewed_at
+        if last is not None and reviewed_at <= last:
+            skipped.append({'index': index, 'card_id': card_id, 'reason': 'already_reviewed'})
+            continue
+        review = scheduler.review(state, quality, reviewed_at)
+        cards[card_id] = (question_id, review.state())
+        updates[card_id] = review
+        performance.append((question_id, quality >= srs_scheduler.PASS_QUALITY, reviewed_at))
+        elapsed = (reviewed_at - last).total_seconds() / 86400 if last else None
+        log.append((user_id, card_id, question_id, quality, reviewed_at, elapsed,
+                    review.interval_days, scheduler.name))
+        results.append({
+            'card_id': card_id,
+            'new_interval': review.interval_days,
+            'new_ease_factor': round(review.ease_factor, 2),
+            'new_status': review.status,
+            'next_review_at': review.next_review_at.isoformat()
+        })
 
-    # Determine status
     now = datetime.now()
-    next_review = now + timedelta(days=interval)
-    status = 'review' if repetitions > 0 else 'learning'
-    if interval >= 21:
-        status = 'graduated'
-
-    c.execute('''UPDATE srs_cards SET
-        ease_factor = ?, interval_days = ?, repetitions = ?,
+    c.executemany('''UPDATE srs_cards SET
+        ease_factor = ?, interval_days = ?, repetitions = ?, stability = ?, difficulty = ?,
         next_review_at = ?, last_reviewed_at = ?, status = ?, updated_at = ?
         WHERE id = ? AND user_id = ?''',
-        (ease_factor, interval, repetitions, next_review, now, status, now,
-         card_id, request.user_id))
-
-    # Also update question_performance
-    is_correct = quality >= 3
-    c.execute('''INSERT INTO question_performance
-        (user_id, question_id, times_seen, times_correct, times_incorrect, last_seen_at, last_correct_at)
-        VALUES (?, ?, 1, ?, ?, ?, ?)
-        ON CONFLICT(user_id, question_id) DO UPDATE SET
-        times_seen = times_seen + 1,
-        times_correct = times_correct + ?,
-        times_incorrect = times_incorrect + ?,
-        last_seen_at = ?,
-        last_correct_at = CASE WHEN ? = 1 THEN ? ELSE last_correct_at END,
-        updated_at = ?''',
-        (request.user_id, card['question_id'],
-         1 if is_correct else 0,
-         0 if is_correct else 1,
-         now,
-         now if is_correct else None,
-         # ON CONFLICT params
-         1 if is_correct else 0,
-         0 if is_correct else 1,
-         now,
-         1 if is_correct else 0, now,
-         now))
+        [(r.ease_factor, r.interval_days, r.repetitions, r.stability, r.difficulty,
+          r.next_review_at, r.reviewed_at, r.status, now, card_id, user_id) for card_id, r in updates.items()])
+    c.executemany('''INSERT INTO srs_review_log
+        (user_id, card_id, question_id, quality, reviewed_at, elapsed_days, interval_days, scheduler)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)''', log)
+    if log:
+        _advance_srs_streak(c, user_id, [reviewed_at.date() for _, _, _, _, reviewed_at, _, _, _ in log])
+    c.executemany(_QUESTION_PERFORMANCE_UPSERT_SQL,
+                  [(user_id, question_id, 1 if is_correct else 0, 0 if is_correct else 1,
+                    reviewed_at, reviewed_at if is_correct else None, None, now)
+                   for question_id, is_correct, reviewed_at in performance])
+    return results, skipped
 
-    conn.commit()
-    conn.close()
+@app.route('/api/srs/review', methods=['POST'])
+@token_required
+def submit_srs_review():
+    """Submit a review result using the SM-2 algorithm."""
+    data = request.get_json() or {}
+    parsed = _parse_srs_review({'cardId': data.get('cardId'), 'quality': data.get('quality')}, datetime.now())
+    if isinstance(parsed, str):
+        return jsonify({'error': parsed}), 400
+
+    results, skipped = _db_writer.run(_apply_srs_reviews, request.user_id, [parsed])
+    if not results:
+        if skipped[0]['reason'] == 'already_reviewed':
+            return jsonify({'error': 'Card was already reviewed at or after this time',
+                            'reason': 'already_reviewed'}), 409
+        return jsonify({'error': 'Card not found', 'reason': 'not_found'}), 404
+    return jsonify(results[0])
+
+@app.route('/api/srs/review/batch', methods=['POST'])
+@token_required
+def submit_srs_review_batch():
+    """Submit an ordered list of reviews in one transaction.
+
+    Body: {reviews: [{cardId, quality, reviewedAt}, ...]}. Reviews are applied
+    in list order, so an offline session can be replayed as recorded, and
+    re-sending a batch that was already applied changes nothing: each review
+    carries the time it was made, and reviews at or before a card's last
+    review are skipped. A malformed review rejects the whole batch with a
+    400 whose `index` names it.
+    """
+    data = request.get_json(silent=True) or {}
+    items = data.get('reviews')
+    if not isinstance(items, list) or not items:
+        return jsonify({'error': 'reviews must be a non-empty list'}), 400
+    if len(items) > SRS_MAX_BATCH:
+        return jsonify({'error': f'At most {SRS_MAX_BATCH} reviews per request'}), 400
 
-    return jsonify({
-        'card_id': card_id,
-        'new_interval': interval,
-        'new_ease_factor': round(ease_factor, 2),
-        'new_status': status,
-        'next_review_at': next_review.isoformat()
-    })
+    now = datetime.now()
+    reviews = []
+    for index, item in enumerate(items):
+        if isinstance(item, dict) and item.get('reviewedAt') is None:
+            parsed = 'reviewedAt is required'
+        else:
+            parsed = _parse_srs_review(item, now)
+        if isinstance(parsed, str):
+            return jsonify({'error': f'reviews[{index}]: {parsed}', 'index': index}), 400
+        reviews.append(parsed)
+
+    results, skipped = _db_writer.run(_apply_srs_reviews, request.user_id, reviews)
+    return jsonify({'results': results, 'applied': len(results), 'skipped': skipped})
 
 @app.route('/api/srs/stats', methods=['GET'])
 @token_required
 def get_srs_stats():
     """Get SRS statistics for the current user."""
     conn = get_db()
-    c = conn.cursor()
-
-    # Total cards
-    c.execute('SELECT COUNT(*) as cnt FROM srs_cards WHERE user_id = ?', (request.user_id,))
-    total_cards = c.fetchone()['cnt']
-
-    # Due today
-    c.execute('''SELECT COUNT(*) as cnt FROM srs_cards
-        WHERE user_id = ? AND next_review_at <= datetime('now') AND status != 'graduated' ''',
-        (request.user_id,))
-    due_today = c.fetchone()['cnt']
-
-    # Status counts
-    c.execute('''SELECT status, COUNT(*) as cnt FROM srs_cards
-        WHERE user_id = ? GROUP BY status''', (request.user_id,))
-    status_counts = {row['status']: row['cnt'] for row in c.fetchall()}
-
-    # Streak: consecutive days with at least one review
-    c.execute('''SELECT DISTINCT DATE(last_reviewed_at) as review_date
-        FROM srs_cards WHERE user_id = ? AND last_reviewed_at IS NOT NULL
-        ORDER BY review_date DESC''', (request.user_id,))
-    review_dates = [row['review_date'] for row in c.fetchall()]
-    streak = 0
-    if review_dates:
-        from datetime import date
-        today = date.today()
-        expected = today
-        for rd in review_dates:
-            if rd is None:
-                break
-            review_d = datetime.strptime(rd, '%Y-%m-%d').date() if isinstance(rd, str) else rd
-            if review_d == expected:
-                streak += 1
-                expected = expected - timedelta(days=1)
-            elif review_d < expected:
-                break
-
+    summary = _srs_summary(conn.cursor(), request.user_id)
     conn.close()
-    return jsonify({
-        'total_cards': total_cards,
-        'due_today': due_today,
-        'new_cards': status_counts.get('new', 0),
-        'learning': status_counts.get('learning', 0),
-        'review': status_counts.get('review', 0),
-        'graduated': status_counts.get('graduated', 0),
-        'streak': streak
-    })
+    return jsonify(summary)
 
 # ==================== Session Plan (Immersive Experience) ====================
 
@@ -3015,17 +5274,10 @@ def get_session_plan():
             pass
 
     # 2. SRS cards due
-    c.execute('''SELECT COUNT(*) as cnt FROM srs_cards
-        WHERE user_id = ? AND next_review_at <= datetime('now') AND status != 'graduated' ''',
-        (request.user_id,))
-    srs_due = c.fetchone()['cnt']
-
-    c.execute('''SELECT COUNT(*) as cnt FROM srs_cards WHERE user_id = ?''', (request.user_id,))
-    srs_total = c.fetchone()['cnt']
-
-    c.execute('''SELECT COUNT(*) as cnt FROM srs_cards
-        WHERE user_id = ? AND status = 'graduated' ''', (request.user_id,))
-    srs_graduated = c.fetchone()['cnt']
+    srs_summary = _srs_summary(c, request.user_id)
+    srs_due = srs_summary['due_today']
+    srs_total = srs_summary['total_cards']
+    srs_graduated = srs_summary['graduated']
 
     if srs_due > 0:
         est_minutes = max(2, round(srs_due * 0.5))
@@ -3045,16 +5297,14 @@ def get_session_plan():
     if primary_cert:
         cert_id = primary_cert['certification_id']
         c.execute('''SELECT d.id, d.name, d.code, d.weight,
-            COALESCE(SUM(qp.times_correct), 0) as correct,
-            COALESCE(SUM(qp.times_seen), 0) as seen
+            COALESCE(s.times_correct, 0) as correct,
+            COALESCE(s.times_seen, 0) as seen
         FROM domains d
-        LEFT JOIN question_domains qd ON qd.domain_id = d.id
-        LEFT JOIN question_performance qp ON qp.question_id = qd.question_id AND qp.user_id = ?
+        LEFT JOIN user_domain_stats s ON s.user_id = ? AND s.domain_id = d.id
         WHERE d.certification_id = ? AND d.parent_domain_id IS NULL
-        GROUP BY d.id
         ORDER BY CASE
-            WHEN COALESCE(SUM(qp.times_seen), 0) = 0 THEN 1.0
-            ELSE 1.0 - (CAST(COALESCE(SUM(qp.times_correct), 0) AS REAL) / MAX(COALESCE(SUM(qp.times_seen), 0), 1))
+            WHEN COALESCE(s.times_seen, 0) = 0 THEN 1.0
+            ELSE 1.0 - (CAST(COALESCE(s.times_correct, 0) AS REAL) / MAX(s.times_seen, 1))
         END DESC''', (request.user_id, cert_id))
 
         for row in c.fetchall():
@@ -3310,7 +5560,7 @@ def get_bookmarks():
         FROM bookmarks b
         JOIN questions q ON b.question_id = q.id
         JOIN quizzes qz ON q.quiz_id = qz.id
-        WHERE b.user_id = ?
+        WHERE b.user_id = ? AND q.is_active = 1
         ORDER BY b.created_at DESC''', (request.user_id,))
     rows = c.fetchall()
     bookmarks = []
@@ -3376,13 +5626,11 @@ def get_cert_readiness(cert_id):
 
     # Domain performance
     c.execute('''SELECT d.id, d.name, d.code, d.weight,
-        COALESCE(SUM(qp.times_correct), 0) as correct,
-        COALESCE(SUM(qp.times_seen), 0) as seen
+        COALESCE(s.times_correct, 0) as correct,
+        COALESCE(s.times_seen, 0) as seen
     FROM domains d
-    LEFT JOIN question_domains qd ON qd.domain_id = d.id
-    LEFT JOIN question_performance qp ON qp.question_id = qd.question_id AND qp.user_id = ?
+    LEFT JOIN user_domain_stats s ON s.user_id = ? AND s.domain_id = d.id
     WHERE d.certification_id = ? AND d.parent_domain_id IS NULL
-    GROUP BY d.id
     ORDER BY d.sort_order''', (request.user_id, cert_id))
     domain_rows = c.fetchall()
 
@@ -3576,20 +5824,13 @@ def update_objectives(cert_id):
     if not ratings:
         return jsonify({'error': 'No ratings provided'}), 400
 
-    conn = get_db()
-    c = conn.cursor()
     now = datetime.now()
-    with _db_write_lock:
-        for domain_id_str, confidence in ratings.items():
-            domain_id = int(domain_id_str)
-            confidence = max(0, min(3, int(confidence)))  # clamp 0-3
-            c.execute('''INSERT INTO objective_confidence (user_id, domain_id, confidence, updated_at)
-                VALUES (?, ?, ?, ?)
-                ON CONFLICT(user_id, domain_id) DO UPDATE SET
-                confidence = excluded.confidence, updated_at = excluded.updated_at''',
-                (request.user_id, domain_id, confidence, now))
-        conn.commit()
-    conn.close()
+    rows = [(request.user_id, int(domain_id_str), max(0, min(3, int(confidence))), now)  # clamp 0-3
+            for domain_id_str, confidence in ratings.items()]
+    _db_writer.run(lambda c: c.executemany('''INSERT INTO objective_confidence (user_id, domain_id, confidence, updated_at)
+        VALUES (?, ?, ?, ?)
+        ON CONFLICT(user_id, domain_id) DO UPDATE SET
+        confidence = excluded.confidence, updated_at = excluded.updated_at''', rows))
     return jsonify({'message': 'Updated', 'count': len(ratings)})
 
 
@@ -3625,7 +5866,7 @@ def community_quizzes():
 
     sql = '''
         SELECT qz.id, qz.title, qz.description,
-               (SELECT COUNT(*) FROM questions WHERE quiz_id = qz.id) AS question_count,
+               (SELECT COUNT(*) FROM questions WHERE quiz_id = qz.id AND is_active = 1) AS question_count,
                u.username
         FROM quizzes qz
         LEFT JOIN users u ON u.id = qz.user_id
@@ -3678,7 +5919,7 @@ def copy_community_quiz(quiz_id):
     c.execute('''INSERT INTO quizzes (user_id, title, description, questions, color, is_migrated)
                  VALUES (?, ?, ?, ?, ?, 1)''',
               (request.user_id, title, source['description'] or '',
-               json.dumps(questions_list), source['color'] or '#6366f1'))
+               _question_blob(questions_list), source['color'] or '#6366f1'))
     new_quiz_id = c.lastrowid
     _insert_questions_for_quiz(c, new_quiz_id, questions_list)
 
@@ -3743,7 +5984,7 @@ def create_sample_quiz():
                  VALUES (?, ?, ?, ?, ?, 1)''',
               (request.user_id, 'Networking Basics (Sample Quiz)',
                'A sample quiz to help you explore the app. Feel free to edit or delete it!',
-               json.dumps(sample_questions), '#6366f1'))
+               _question_blob(sample_questions), '#6366f1'))
     quiz_id = c.lastrowid
     _insert_questions_for_quiz(c, quiz_id, sample_questions)
     conn.commit()
@@ -3752,7 +5993,15 @@ def create_sample_quiz():
 
 @app.route('/api/health')
 def health():
-    return jsonify({'status': 'ok'})
+    conn = get_db()
+    pragmas = _read_pragmas(conn)
+    conn.close()
+    return jsonify({'status': 'ok', 'db_pool': _db_pool.stats(), 'db_writer': _db_writer.stats(),
+                    'db_pragmas': pragmas, 'session_cache': _session_cache.stats(),
+                    'auth_tokens': AUTH_TOKEN_MODE, 'revocations': _revocations.stats(),
+                    'password_hashing': _hash_pool.stats(), 'events': _event_buffer.stats(),
+                    'progress_saves': _progress_buffer.stats(), 'grading': _grader.stats(),
+                    'srs_card_cache': _card_cache.stats()})
 
 # === Admin Routes ===
 
@@ -3782,47 +6031,60 @@ def admin_seed():
 @require_admin_token
 def cleanup_sessions():
     """Delete expired sessions. Run daily via cron."""
-    conn = get_db()
-    c = conn.cursor()
-    with _db_write_lock:
-        c.execute('DELETE FROM sessions WHERE expires_at < datetime("now")')
-        deleted = c.rowcount
-        conn.commit()
-    conn.close()
+    deleted = _db_writer.execute('DELETE FROM sessions WHERE expires_at < datetime("now")')
+    _session_cache.purge_expired()
+    _db_writer.execute('DELETE FROM token_revocations WHERE expires_at < ?', (time.time(),))
     return jsonify({'message': f'Deleted {deleted} expired sessions.'})
 
+@app.route('/api/admin/users/<int:user_id>/deactivate', methods=['POST'])
+@require_admin_token
+def deactivate_user(user_id):
+    """Disable an account and revoke all of its sessions."""
+    def write(c):
+        c.execute('UPDATE users SET is_active = 0 WHERE id = ?', (user_id,))
+        if c.rowcount == 0:
+            return None
+        c.execute('DELETE FROM sessions WHERE user_id = ?', (user_id,))
+        return c.rowcount
+
+    revoked = _db_writer.run(write)
+    if revoked is None:
+        return jsonify({'error': 'User not found'}), 404
+    _session_cache.invalidate_user(user_id)
+    if _token_signer is not None:
+        _revocations.revoke_user(user_id)
+    return jsonify({'message': 'User deactivated', 'sessions_revoked': revoked})
+
 @app.route('/api/admin/events', methods=['GET'])
 @require_admin_token
 def admin_events():
-    """Event log summary: events per user per day, most-used features, drop-off points."""
+    """Event log summary: events per user per day, most-used features, drop-off points.
+
+    Reads only the rollup tables, so the cost does not grow with the event history.
+    """
+    _event_buffer.flush()
     conn = get_db()
     c = conn.cursor()
     try:
         # Events per user per day (last 30 days)
         c.execute('''
-            SELECT u.username, date(e.created_at) as day, e.event, COUNT(*) as count
-            FROM events e
-            LEFT JOIN users u ON e.user_id = u.id
-            WHERE e.created_at >= datetime("now", "-30 days")
-            GROUP BY e.user_id, day, e.event
-            ORDER BY day DESC, count DESC
+            SELECT u.username, r.day, r.event, r.count
+            FROM event_user_daily_counts r
+            LEFT JOIN users u ON r.user_id = u.id
+            WHERE r.day >= date("now", "-30 days")
+            ORDER BY r.day DESC, r.count DESC
         ''')
         daily = [dict(r) for r in c.fetchall()]
 
         # Most used features (all time)
-        c.execute('''
-            SELECT event, COUNT(*) as count
-            FROM events
-            GROUP BY event
-            ORDER BY count DESC
-        ''')
+        c.execute('SELECT event, count FROM event_totals ORDER BY count DESC')
         feature_counts = [dict(r) for r in c.fetchall()]
 
         # Active users (last 7 days)
         c.execute('''
-            SELECT COUNT(DISTINCT user_id) as active_users
-            FROM events
-            WHERE created_at >= datetime("now", "-7 days")
+            SELECT COUNT(DISTINCT NULLIF(user_id, 0)) as active_users
+            FROM event_user_daily_counts
+            WHERE day >= date("now", "-7 days")
         ''')
         active = c.fetchone()['active_users']
 
@@ -3836,27 +6098,252 @@ def admin_events():
         conn.close()
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/admin/events/archive', methods=['POST'])
+@require_admin_token
+def admin_archive_events():
+    """Archive raw events older than QUIZ_EVENT_RETENTION_DAYS. Run daily via cron."""
+    days = request.args.get('days', EVENT_RETENTION_DAYS, type=int)
+    if days <= 0:
+        return jsonify({'error': 'days must be positive'}), 400
+    _event_buffer.flush()
+    moved = archive_events(days)
+    verb = 'Archived' if EVENT_ARCHIVE_DATABASE else 'Deleted'
+    return jsonify({'message': f'{verb} {moved} events older than {days} days.', 'events': moved})
+
+@app.route('/api/admin/sql-profile', methods=['GET'])
+@require_admin_token
+def admin_sql_profile():
+    """Top-N slowest and most frequent SQL statements, plus SQL vs. Python time per route.
+
+    Needs QUIZ_SQL_PROFILE=1. DELETE resets the counters.
+    """
+    limit = request.args.get('limit', 20, type=int)
+    return jsonify(_sql_profiler.report(limit))
+
+@app.route('/api/admin/sql-profile', methods=['DELETE'])
+@require_admin_token
+def admin_sql_profile_reset():
+    _sql_profiler.reset()
+    return jsonify({'message': 'SQL profile reset'})
+
 # === Event Logging ===
+# POST /api/events only appends to an in-process buffer. A flusher thread
+# hands the buffer to the DB writer as one executemany once it holds
+# EVENT_BATCH events or EVENT_FLUSH_MS has passed, so a UI click costs a list
+# append instead of a commit. Pending events are flushed on graceful
+# shutdown; a hard kill loses at most one flush interval.
+#
+# The same writer transaction folds the new rows into the rollup tables
+# (event_user_daily_counts, event_totals), so the admin dashboard never reads
+# raw events. event_rollup_state records the last event id counted; the
+# writer holds the lock from BEGIN IMMEDIATE, so ids below it can never
+# appear later. Raw events older than EVENT_RETENTION_DAYS are moved to a
+# separate archive database by archive_events() (POST /api/admin/events/archive).
+EVENT_BATCH = int(os.environ.get('QUIZ_EVENT_BATCH', 200))
+EVENT_FLUSH_MS = int(os.environ.get('QUIZ_EVENT_FLUSH_MS', 1000))
+EVENT_BUFFER_MAX = int(os.environ.get('QUIZ_EVENT_BUFFER_MAX', 20000))
+EVENT_MAX_PER_REQUEST = 100
+EVENT_RETENTION_DAYS = int(os.environ.get('QUIZ_EVENT_RETENTION_DAYS', 90))  # 0 keeps raw events forever
+# Empty string: delete expired events instead of archiving them
+EVENT_ARCHIVE_DATABASE = os.environ.get('QUIZ_EVENT_ARCHIVE',
+                                        os.path.splitext(DATABASE)[0] + '_events_archive.db')
+EVENT_ARCHIVE_BATCH = 1000
+
+_EVENT_INSERT_SQL = 'INSERT INTO events (user_id, event, metadata, created_at) VALUES (?, ?, ?, ?)'
+
+_EVENT_ROLLUP_SQL = (
+    '''INSERT INTO event_user_daily_counts (day, user_id, event, count)
+       SELECT COALESCE(date(created_at), date('now')), COALESCE(user_id, 0), event, COUNT(*)
+       FROM events WHERE id > ? AND id <= ?
+       GROUP BY 1, 2, 3
+       ON CONFLICT (day, user_id, event) DO UPDATE SET count = count + excluded.count''',
+    '''INSERT INTO event_totals (event, count)
+       SELECT event, COUNT(*) FROM events WHERE id > ? AND id <= ?
+       GROUP BY event
+       ON CONFLICT (event) DO UPDATE SET count = count + excluded.count''',
+)
+
+def _rollup_events(c):
+    """Count events added since the last rollup into the rollup tables.
+
+    Returns the new high-water event id, or 0 if there was nothing new.
+    Must run inside a write transaction (a writer job, or init_db for the backfill).
+    """
+    c.execute("INSERT OR IGNORE INTO event_rollup_state (name, last_event_id) VALUES ('events', 0)")
+    c.execute("SELECT last_event_id FROM event_rollup_state WHERE name = 'events'")
+    last_id = c.fetchone()[0]
+    c.execute('SELECT MAX(id) FROM events')
+    max_id = c.fetchone()[0]
+    if max_id is None or max_id <= last_id:
+        return 0
+    for sql in _EVENT_ROLLUP_SQL:
+        c.execute(sql, (last_id, max_id))
+    c.execute("UPDATE event_rollup_state SET last_event_id = ? WHERE name = 'events'", (max_id,))
+    return max_id
+
+def _write_events(c, rows):
+    """Writer job: persist a batch of (user_id, event, metadata, created_at) rows."""
+    c.executemany(_EVENT_INSERT_SQL, rows)
+    _rollup_events(c)
+    return len(rows)
+
+def _delete_events(c, ids):
+    c.executemany('DELETE FROM events WHERE id = ?', [(event_id,) for event_id in ids])
+    return c.rowcount
+
+def _open_event_archive():
+    archive = sqlite3.connect(EVENT_ARCHIVE_DATABASE, timeout=30)
+    archive.execute('''CREATE TABLE IF NOT EXISTS events (
+        id INTEGER PRIMARY KEY,
+        user_id INTEGER,
+        event TEXT NOT NULL,
+        metadata TEXT,
+        created_at TIMESTAMP
+    )''')
+    archive.execute('CREATE INDEX IF NOT EXISTS idx_events_created ON events(created_at)')
+    archive.commit()
+    return archive
+
+def archive_events(retention_days=EVENT_RETENTION_DAYS):
+    """Move raw events older than retention_days out of the main database.
+
+    Only events already counted in the rollups are moved. Each batch is
+    committed to the archive before it is deleted here, and the archive
+    ignores ids it already holds, so an interrupted run is simply repeated.
+    Returns the number of events removed.
+    """
+    if retention_days <= 0:
+        return 0
+    cutoff = time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime(time.time() - retention_days * 86400))
+    archive = _open_event_archive() if EVENT_ARCHIVE_DATABASE else None
+    conn = get_db()
+    moved = 0
+    try:
+        while True:
+            rows = conn.execute('''
+                SELECT id, user_id, event, metadata, created_at FROM events
+                WHERE created_at < ?
+                  AND id <= (SELECT last_event_id FROM event_rollup_state WHERE name = 'events')
+                ORDER BY created_at LIMIT ?
+            ''', (cutoff, EVENT_ARCHIVE_BATCH)).fetchall()
+            if not rows:
+                break
+            if archive is not None:
+                archive.executemany('INSERT OR IGNORE INTO events VALUES (?, ?, ?, ?, ?)',
+                                    [tuple(r) for r in rows])
+                archive.commit()
+            _db_writer.run(_delete_events, [r['id'] for r in rows])
+            moved += len(rows)
+    finally:
+        conn.close()
+        if archive is not None:
+            archive.close()
+    return moved
+
+class EventBuffer:
+    def __init__(self, batch, interval, max_pending):
+        self.batch = max(1, batch)
+        self.interval = interval
+        self.max_pending = max_pending
+        self._cond = threading.Condition()
+        self._rows = []
+        self._pid = None
+        self._thread = None
+        self._stopping = False
+        self._stats = {'accepted': 0, 'dropped': 0, 'written': 0, 'failed': 0, 'flushes': 0}
+
+    def _ensure_started(self):
+        if self._pid == os.getpid() and self._thread.is_alive():
+            return
+        with self._cond:
+            if self._pid != os.getpid() or not self._thread.is_alive():
+                if self._pid != os.getpid():
+                    self._rows = []  # inherited across fork: the parent flushes its own copy
+                self._pid = os.getpid()
+                self._stopping = False
+                self._thread = threading.Thread(target=self._run, name='event-buffer', daemon=True)
+                self._thread.start()
+
+    def add(self, rows):
+        """Queue rows without waiting on the database; returns how many were kept."""
+        self._ensure_started()
+        with self._cond:
+            kept = rows[:max(self.max_pending - len(self._rows), 0)]
+            self._rows.extend(kept)
+            self._stats['accepted'] += len(kept)
+            self._stats['dropped'] += len(rows) - len(kept)
+            if len(self._rows) >= self.batch:
+                self._cond.notify()
+        return len(kept)
+
+    def flush(self):
+        """Write everything buffered so far and wait for it to commit."""
+        with self._cond:
+            rows, self._rows = self._rows, []
+        self._write(rows)
+
+    def stop(self, timeout=5):
+        """Flush and stop the flusher thread (registered with atexit)."""
+        if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+            with self._cond:
+                self._stopping = True
+                self._cond.notify()
+            self._thread.join(timeout)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: len(self._rows) >= self.batch or self._stopping,
+                                    timeout=self.interval / 1000)
+                rows, self._rows = self._rows, []
+                stopping = self._stopping
+            self._write(rows)
+            if stopping:
+                return
+
+    def _write(self, rows):
+        if not rows:
+            return
+        for start in range(0, len(rows), self.batch):
+            chunk = rows[start:start + self.batch]
+            try:
+                _db_writer.run(_write_events, chunk)
+            except Exception as e:
+                with self._cond:
+                    self._stats['failed'] += len(chunk)
+                app.logger.warning(f"[EVENTS] dropped {len(chunk)} events: {e}")
+            else:
+                with self._cond:
+                    self._stats['written'] += len(chunk)
+        with self._cond:
+            self._stats['flushes'] += 1
+
+    def stats(self):
+        with self._cond:
+            return dict(self._stats, pending=len(self._rows))
+
+_event_buffer = EventBuffer(EVENT_BATCH, EVENT_FLUSH_MS, EVENT_BUFFER_MAX)
+atexit.register(_event_buffer.stop)  # runs before _db_writer.stop (atexit is LIFO)
 
 @app.route('/api/events', methods=['POST'])
 @token_required
 def log_event():
-    """Log a frontend event. Called from the browser on key user actions."""
-    data = request.get_json()
-    event_name = data.get('event', '').strip()
-    if not event_name:
-        return jsonify({'error': 'event required'}), 400
-    metadata = data.get('metadata')
-    conn = get_db()
-    c = conn.cursor()
-    with _db_write_lock:
-        c.execute(
-            'INSERT INTO events (user_id, event, metadata) VALUES (?, ?, ?)',
-            (request.user_id, event_name, json.dumps(metadata) if metadata else None)
-        )
-        conn.commit()
-    conn.close()
-    return jsonify({'ok': True})
+    """Log frontend events: {event, metadata} or {events: [{event, metadata}, ...]}."""
+    data = request.get_json(silent=True) or {}
+    items = data.get('events') if isinstance(data.get('events'), list) else [data]
+    if len(items) > EVENT_MAX_PER_REQUEST:
+        return jsonify({'error': f'At most {EVENT_MAX_PER_REQUEST} events per request'}), 400
+    # Stamp now, in the same UTC format as the column default, since the insert happens later
+    created_at = time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime())
+    rows = []
+    for item in items:
+        event_name = (item.get('event') or '').strip() if isinstance(item, dict) else ''
+        if not event_name:
+            return jsonify({'error': 'event required'}), 400
+        metadata = item.get('metadata')
+        rows.append((request.user_id, event_name, json.dumps(metadata) if metadata else None, created_at))
+    accepted = _event_buffer.add(rows)
+    return jsonify({'ok': True, 'accepted': accepted})
 
 def seed_certifications():
     """Seed the certifications and domains tables with initial IT certification data."""
@@ -5384,7 +7871,7 @@ def seed_security_plus_questions():
 
     # Create the system quiz (user_id=0 as system-owned)
     # First, ensure user_id 0 doesn't cause FK issues — use the first user, or create without FK
-    questions_json = json.dumps([{
+    questions_json = _question_blob([{
         'question': q['question'],
         'type': q['type'],
         'options': q.get('options'),
@@ -5484,12 +7971,15 @@ def seed_study_resources():
 
 
 # Initialize database tables on module load (for WSGI)
+# (run inside an app context so a failing seed still hands its connection back to the pool)
 try:
-    init_db()
-    seed_certifications()
-    seed_sub_objectives()
-    seed_security_plus_questions()
-    seed_study_resources()
+    with app.app_context():
+        init_db()
+        _db_pool.prewarm()
+        seed_certifications()
+        seed_sub_objectives()
+        seed_security_plus_questions()
+        seed_study_resources()
 except Exception as e:
     print(f"[STARTUP] DB init error: {e}", flush=True)
 
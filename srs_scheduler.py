@@ -0,0 +1,216 @@
+"""
+SRS Scheduling - SM-2 and FSRS
+Pure scheduling functions for the spaced repetition deck. Nothing here
+touches the database or reads the clock: callers pass the card's current
+state and the time of the review, and get the new state back. That keeps
+the arithmetic identical whether a review arrives live, in a batch, or is
+replayed from an offline session, and lets it be checked without a server.
+
+Both schedulers implement Scheduler.review(state, quality, reviewed_at).
+
+SM2Scheduler is the SM-2 variant quiz_server has always used:
+  - quality 3-5 is a pass: intervals go 1 day, 6 days, then interval * ease
+  - quality 0-2 resets repetitions and schedules the card for tomorrow
+  - ease moves by 0.1 - (5 - q) * (0.08 + (5 - q) * 0.02), floored at 1.3
+
+FSRSScheduler follows the FSRS-4.5 model: each card carries a memory
+stability (days until recall probability falls to 90%) and a difficulty
+(1-10), updated from the rating and from how overdue the review was. Its 17
+weights can be fitted per user from srs_review_log (see optimize_srs.py).
+Quality maps to FSRS ratings as 0-1 Again, 2 Hard, 3-4 Good, 5 Easy; like
+FSRS, it treats only Again as a lapse. A lapsed card keeps its lowered
+stability but, as under SM-2, comes back the next day (a one-day
+relearning step) rather than after the interval that stability implies.
+
+Under either scheduler a card whose interval reaches 21 days is 'graduated'.
+"""
+
+import abc
+import math
+from collections import namedtuple
+from datetime import timedelta
+
+MIN_EASE = 1.3
+PASS_QUALITY = 3
+GRADUATE_DAYS = 21
+
+# The scheduling columns of an srs_cards row. stability / difficulty are
+# None until FSRS first reviews the card.
+CardState = namedtuple('CardState',
+                       'ease_factor interval_days repetitions stability difficulty last_reviewed_at',
+                       defaults=(None, None, None))
+
+
+class Review(namedtuple('Review', 'ease_factor interval_days repetitions stability difficulty '
+                                  'status reviewed_at next_review_at')):
+    """The outcome of one review: the card's new columns."""
+    __slots__ = ()
+
+    def state(self):
+        """The CardState to schedule the card's next review from."""
+        return CardState(self.ease_factor, self.interval_days, self.repetitions,
+                         self.stability, self.difficulty, self.reviewed_at)
+
+
+def sm2(state, quality):
+    """Return the CardState after one SM-2 review graded quality (0-5)."""
+    ease_factor, interval, repetitions = state.ease_factor, state.interval_days, state.repetitions
+    if quality >= PASS_QUALITY:
+        if repetitions == 0:
+            interval = 1
+        elif repetitions == 1:
+            interval = 6
+        else:
+            interval = round(interval * ease_factor)
+        repetitions += 1
+    else:
+        repetitions = 0
+        interval = 1
+    ease_factor = max(MIN_EASE, ease_factor + (0.1 - (5 - quality) * (0.08 + (5 - quality) * 0.02)))
+    return state._replace(ease_factor=ease_factor, interval_days=interval, repetitions=repetitions)
+
+
+def card_status(interval_days, repetitions):
+    """'graduated', 'review' or 'learning' for a scheduled card."""
+    if interval_days >= GRADUATE_DAYS:
+        return 'graduated'
+    return 'review' if repetitions > 0 else 'learning'
+
+
+class Scheduler(abc.ABC):
+    """Interface: review(state, quality, reviewed_at) -> Review."""
+
+    name = None
+
+    @abc.abstractmethod
+    def review(self, state, quality, reviewed_at):
+        """Schedule one review graded quality (0-5) at reviewed_at; returns a Review."""
+
+    @staticmethod
+    def _result(state, reviewed_at):
+        return Review(state.ease_factor, state.interval_days, state.repetitions,
+                      state.stability, state.difficulty,
+                      card_status(state.interval_days, state.repetitions),
+                      reviewed_at, reviewed_at + timedelta(days=state.interval_days))
+
+
+class SM2Scheduler(Scheduler):
+    name = 'sm2'
+
+    def review(self, state, quality, reviewed_at):
+        # Drop FSRS memory state: it would be stale if the card moved back to FSRS
+        return self._result(sm2(state, quality)._replace(stability=None, difficulty=None), reviewed_at)
+
+
+# FSRS-4.5 forgetting curve: R(t, S) = (1 + FACTOR * t / S) ** DECAY, so R(S, S) = 0.9
+DECAY = -0.5
+FACTOR = 19 / 81
+MAX_INTERVAL = 36500
+RELEARN_DAYS = 1
+
+# Published FSRS-4.5 defaults, used until a user's own weights are fitted
+DEFAULT_WEIGHTS = (0.4872, 1.4003, 3.7145, 13.8206, 5.1618, 1.2298, 0.8975, 0.031, 1.6474,
+                   0.1367, 1.0461, 2.1072, 0.0793, 0.3246, 1.587, 0.2272, 2.8755)
+
+# (low, high) per weight; the optimizer keeps fits inside these
+WEIGHT_BOUNDS = ((0.1, 100), (0.1, 100), (0.1, 100), (0.1, 100), (1, 10), (0.01, 5), (0.01, 5),
+                 (0, 0.8), (0, 6), (0, 0.8), (0.01, 5), (0.1, 5), (0.01, 0.4), (0.01, 0.9),
+                 (0.01, 4), (0, 1), (1, 6))
+
+AGAIN, HARD, GOOD, EASY = 1, 2, 3, 4
+
+
+def fsrs_rating(quality):
+    """Map SM-2 quality (0-5) to an FSRS rating (1-4)."""
+    if quality <= 1:
+        return AGAIN
+    if quality == 2:
+        return HARD
+    return EASY if quality >= 5 else GOOD
+
+
+def valid_retention(retention):
+    """True for a usable FSRS target recall probability: strictly between 0 and 1."""
+    return isinstance(retention, (int, float)) and not isinstance(retention, bool) and 0 < retention < 1
+
+
+def _clamp_difficulty(d):
+    return min(10.0, max(1.0, d))
+
+
+class FSRSScheduler(Scheduler):
+    name = 'fsrs'
+
+    def __init__(self, weights=None, retention=0.9):
+        self.w = tuple(weights) if weights else DEFAULT_WEIGHTS
+        if len(self.w) != len(DEFAULT_WEIGHTS):
+            raise ValueError(f'FSRS needs {len(DEFAULT_WEIGHTS)} weights, got {len(self.w)}')
+        if not valid_retention(retention):
+            raise ValueError(f'FSRS retention must be between 0 and 1 (exclusive), got {retention!r}')
+        self.retention = retention
+
+    @staticmethod
+    def retrievability(elapsed_days, stability):
+        return (1 + FACTOR * elapsed_days / stability) ** DECAY
+
+    def init_difficulty(self, rating):
+        return _clamp_difficulty(self.w[4] - self.w[5] * (rating - 3))
+
+    def next_difficulty(self, difficulty, rating):
+        d = difficulty - self.w[6] * (rating - 3)
+        return _clamp_difficulty(self.w[7] * self.init_difficulty(EASY) + (1 - self.w[7]) * d)
+
+    def recall_stability(self, difficulty, stability, r, rating):
+        w = self.w
+        hard_penalty = w[15] if rating == HARD else 1
+        easy_bonus = w[16] if rating == EASY else 1
+        return stability * (1 + math.exp(w[8]) * (11 - difficulty) * stability ** -w[9]
+                            * (math.exp(w[10] * (1 - r)) - 1) * hard_penalty * easy_bonus)
+
+    def forget_stability(self, difficulty, stability, r):
+        w = self.w
+        s = w[11] * difficulty ** -w[12] * ((stability + 1) ** w[13] - 1) * math.exp(w[14] * (1 - r))
+        return min(s, stability)
+
+    def interval(self, stability):
+        """Days until recall probability falls to the target retention."""
+        days = stability / FACTOR * (self.retention ** (1 / DECAY) - 1)
+        return min(MAX_INTERVAL, max(1, round(days)))
+
+    def review(self, state, quality, reviewed_at):
+        rating = fsrs_rating(quality)
+        stability, difficulty = state.stability, state.difficulty
+        if stability is None and state.last_reviewed_at is not None:
+            # Scheduled by SM-2 so far: its interval is the best stability estimate we have
+            stability, difficulty = max(float(state.interval_days), 0.1), self.init_difficulty(GOOD)
+        if stability is None:
+            stability, difficulty = self.w[rating - 1], self.init_difficulty(rating)
+            repetitions = 0 if rating == AGAIN else 1
+        else:
+            elapsed = max(0.0, (reviewed_at - state.last_reviewed_at).total_seconds() / 86400)
+            r = self.retrievability(elapsed, stability)
+            if rating == AGAIN:
+                stability = self.forget_stability(difficulty, stability, r)
+                repetitions = 0
+            else:
+                stability = self.recall_stability(difficulty, stability, r, rating)
+                repetitions = state.repetitions + 1
+            difficulty = self.next_difficulty(difficulty, rating)
+        stability = min(float(MAX_INTERVAL), max(0.01, stability))
+        # Relearning step: a lapse is seen again tomorrow, whatever its stability
+        interval = RELEARN_DAYS if rating == AGAIN else self.interval(stability)
+        new = state._replace(interval_days=interval, repetitions=repetitions,
+                             stability=stability, difficulty=difficulty)
+        return self._result(new, reviewed_at)
+
+
+SCHEDULERS = {SM2Scheduler.name: SM2Scheduler, FSRSScheduler.name: FSRSScheduler}
+
+
+def get_scheduler(name, weights=None, retention=0.9):
+    """Scheduler instance by name; weights/retention only apply to FSRS."""
+    if name == FSRSScheduler.name:
+        return FSRSScheduler(weights, retention)
+    if name in SCHEDULERS:
+        return SCHEDULERS[name]()
+    raise ValueError(f'Unknown SRS scheduler: {name}')
@@ -2,12 +2,14 @@
 import { getState, setState } from '../state.js';
 import { escapeHtml } from '../utils/dom.js';
 import { icon } from '../utils/icons.js';
-import { getDueCards, submitReview, getSrsStats } from '../services/api.js';
+import { getDueCards, getDueCardsByIds, submitReviewBatch, getSrsStats } from '../services/api.js';
 import { invalidateSession } from './session.js';
 import { showToast } from '../utils/toast.js';
 
 let srs = {
     cards: [],
+    nextIds: [],
+    loadingMore: false,
     currentIndex: 0,
     isFlipped: false,
     stats: null,
@@ -16,9 +18,91 @@ let srs = {
     loading: true,
 };
 
+const PAGE_SIZE = 50;
+const LOAD_AHEAD = 5;  // Fetch the next page when this many cards are left
+
+// Ratings are queued in localStorage and sent in batches, so a session
+// survives going offline and is replayed in order on the next sync.
+const PENDING_KEY = 'srs_pending_reviews';
+const REJECTED_KEY = 'srs_rejected_reviews';  // Reviews the server refused, kept for inspection
+const MAX_REJECTED = 100;
+const FLUSH_EVERY = 10;
+const MAX_BATCH = 500;
+let flushChain = Promise.resolve();
+
+function loadPendingReviews() {
+    try {
+        return JSON.parse(localStorage.getItem(PENDING_KEY)) || [];
+    } catch (e) {
+        return [];
+    }
+}
+
+function savePendingReviews(pending) {
+    if (pending.length) {
+        localStorage.setItem(PENDING_KEY, JSON.stringify(pending));
+    } else {
+        localStorage.removeItem(PENDING_KEY);
+    }
+}
+
+function queueReview(cardId, quality) {
+    const pending = loadPendingReviews();
+    pending.push({ cardId, quality, reviewedAt: new Date().toISOString() });
+    savePendingReviews(pending);
+    if (pending.length >= FLUSH_EVERY) flushReviews();
+}
+
+function quarantineReviews(reviews, reason) {
+    let rejected;
+    try {
+        rejected = JSON.parse(localStorage.getItem(REJECTED_KEY)) || [];
+    } catch (e) {
+        rejected = [];
+    }
+    rejected.push(...reviews.map(review => ({ ...review, reason })));
+    localStorage.setItem(REJECTED_KEY, JSON.stringify(rejected.slice(-MAX_REJECTED)));
+}
+
+function flushReviews() {
+    flushChain = flushChain.then(async () => {
+        let pending = loadPendingReviews();
+        while (pending.length) {
+            const batch = pending.slice(0, MAX_BATCH);
+            try {
+                await submitReviewBatch(batch);
+            } catch (e) {
+                // Network errors, 5xx, 401 and rate limits are retried on the next flush.
+                // Any other 4xx will never succeed: set the rejected review (or the whole
+                // batch, if the server didn't say which) aside so later reviews can sync.
+                if (!e.status || e.status >= 500 || [401, 408, 429].includes(e.status)) {
+                    console.error('SRS review sync failed:', e);
+                    return;
+                }
+                const index = e.data && e.data.index;
+                if (Number.isInteger(index) && index >= 0 && index < batch.length) {
+                    console.warn('SRS review rejected:', e.message, batch[index]);
+                    quarantineReviews([batch[index]], e.message);
+                    pending = loadPendingReviews();
+                    pending.splice(index, 1);
+                    savePendingReviews(pending);
+                    continue;
+                }
+                console.warn('SRS review batch rejected:', e.message);
+                quarantineReviews(batch, e.message);
+            }
+            pending = loadPendingReviews().slice(batch.length);
+            savePendingReviews(pending);
+        }
+    });
+    return flushChain;
+}
+
 export async function initSrsReview() {
     srs = {
         cards: [],
+        nextIds: [],
+        loadingMore: false,
         currentIndex: 0,
         isFlipped: false,
         stats: null,
@@ -29,11 +113,14 @@ export async function initSrsReview() {
     setState({ view: 'srsReview' });
 
     try {
+        // Send reviews left over from an earlier (possibly offline) session first
+        await flushReviews();
         const [dueData, statsData] = await Promise.all([
-            getDueCards(50),
+            getDueCards(PAGE_SIZE),
             getSrsStats(),
         ]);
         srs.cards = dueData.cards || [];
+        srs.nextIds = dueData.next_card_ids || [];
         srs.stats = statsData;
         srs.loading = false;
         setState({ view: 'srsReview' });
@@ -297,16 +384,36 @@ export async function srsRate(quality) {
     srs.sessionTotal++;
     if (quality >= 3) srs.sessionCorrect++;
 
-    // Submit review to backend (fire-and-forget)
-    submitReview(card.id, quality).catch(e => console.error('SRS review failed:', e));
+    queueReview(card.id, quality);
 
     // Advance to next card
     srs.currentIndex++;
     srs.isFlipped = false;
+    if (srs.cards.length - srs.currentIndex <= LOAD_AHEAD) loadMoreCards();
+    if (srs.currentIndex >= srs.cards.length && !srs.loadingMore) flushReviews();
+    setState({ view: 'srsReview' });
+}
+
+async function loadMoreCards() {
+    if (srs.loadingMore || !srs.nextIds.length) return;
+    const session = srs;
+    session.loadingMore = true;
+    try {
+        const data = await getDueCardsByIds(session.nextIds, PAGE_SIZE);
+        session.cards.push(...(data.cards || []));
+        session.nextIds = data.next_card_ids || [];
+    } catch (e) {
+        console.error('Failed to load more review cards:', e);
+        session.nextIds = [];
+    }
+    session.loadingMore = false;
+    if (session !== srs || getState().view !== 'srsReview') return;  // Left or restarted meanwhile
+    if (srs.currentIndex >= srs.cards.length) flushReviews();
     setState({ view: 'srsReview' });
 }
 
 export function exitSrsReview() {
+    flushReviews();
     invalidateSession();
     setState({ view: 'mission-control' });
 }
@@ -18,11 +18,78 @@ export function registerStateCallbacks(updateFn, clearAuthFn) {
     authClearer = clearAuthFn;
 }
 
+/**
+ * Persist tokens from a login/register/refresh response.
+ * In signed-token mode the access token is short-lived and comes with a
+ * refresh token and its lifetime; in session mode only `token` is set.
+ */
+function storeTokens(data) {
+    localStorage.setItem('token', data.token);
+    if (data.refresh_token) localStorage.setItem('refresh_token', data.refresh_token);
+    if (data.expires_in) {
+        localStorage.setItem('token_expires_at', String(Date.now() + data.expires_in * 1000));
+    } else {
+        localStorage.removeItem('token_expires_at');
+    }
+}
+
+/**
+ * Remove every stored credential (the same keys clearAuth in state.js clears)
+ */
+function clearStoredAuth() {
+    localStorage.removeItem('token');
+    localStorage.removeItem('refresh_token');
+    localStorage.removeItem('token_expires_at');
+    localStorage.removeItem('user');
+}
+
+let refreshInFlight = null;
+
+/**
+ * Get a new access token using the stored refresh token.
+ * Concurrent callers share one request. Resolves to true on success.
+ */
+async function refreshAccessToken() {
+    const refreshToken = localStorage.getItem('refresh_token');
+    if (!refreshToken) return false;
+    if (!refreshInFlight) {
+        refreshInFlight = fetch(`${API_URL}/auth/refresh`, {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ refresh_token: refreshToken })
+        })
+            .then(async res => {
+                if (!res.ok) return false;
+                const data = await res.json();
+                // Logged out (or in as someone else) while this was in flight
+                if (localStorage.getItem('refresh_token') !== refreshToken) return false;
+                storeTokens(data);
+                return true;
+            })
+            .catch(() => false)
+            .finally(() => { refreshInFlight = null; });
+    }
+    return refreshInFlight;
+}
+
+/**
+ * Renew a signed access token shortly before it expires (no-op in session mode)
+ */
+function tokenExpiring() {
+    const expiresAt = Number(localStorage.getItem('token_expires_at'));
+    return Boolean(expiresAt) && Date.now() > expiresAt - 30000;
+}
+
+async function ensureFreshToken() {
+    if (tokenExpiring()) await refreshAccessToken();
+}
+
 /**
  * Core API call function with retry logic and error handling
  * Exported so state.js can use the same client (fixes Bug #8)
  */
 export async function apiCall(endpoint, options = {}, retryCount = 0) {
+    await ensureFreshToken();
     const token = localStorage.getItem('token');
     
     const headers = { 'Content-Type': 'application/json', ...options.headers };
@@ -45,25 +112,35 @@ export async function apiCall(endpoint, options = {}, retryCount = 0) {
             
             // Handle specific HTTP errors
             if (res.status === 401) {
+                // Expired access token: refresh once and replay the request
+                if (!options.authRetried && await refreshAccessToken()) {
+                    return apiCall(endpoint, { ...options, authRetried: true }, retryCount);
+                }
                 // Clear auth from localStorage directly to avoid circular import
-                localStorage.removeItem('token');
-                localStorage.removeItem('user');
+                clearStoredAuth();
                 if (authClearer) authClearer();
                 showToast('Session expired - please log in again', 'error');
                 throw new Error('Unauthorized');
-            } else if (res.status === 404) {
-                throw new Error(data.error || 'Not found');
+            }
+            let message;
+            if (res.status === 404) {
+                message = data.error || 'Not found';
             } else if (res.status === 403) {
-                throw new Error(data.error || 'Access denied');
+                message = data.error || 'Access denied';
             } else if (res.status === 409) {
-                throw new Error(data.error || 'Already exists');
+                message = data.error || 'Already exists';
             } else if (res.status === 500) {
-                throw new Error(data.error || 'Server error');
+                message = data.error || 'Server error';
             } else if (res.status === 503) {
-                throw new Error(data.error || 'Service unavailable');
+                message = data.error || 'Service unavailable';
             } else {
-                throw new Error(data.error || `Request failed (${res.status})`);
+                message = data.error || `Request failed (${res.status})`;
             }
+            // Callers that need to tell a rejected request from a failed one read these
+            const error = new Error(message);
+            error.status = res.status;
+            error.data = data;
+            throw error;
         }
         
         return await res.json();
@@ -99,7 +176,7 @@ export async function login(username, password) {
         });
         
         // Save to localStorage (Bug #4 fix)
-        localStorage.setItem('token', data.token);
+        storeTokens(data);
         localStorage.setItem('user', JSON.stringify(data.user));
         
         // Update state via callback
@@ -138,7 +215,7 @@ export async function register(username, password, email = null) {
         });
         
         // Save to localStorage (Bug #4 fix)
-        localStorage.setItem('token', data.token);
+        storeTokens(data);
         localStorage.setItem('user', JSON.stringify(data.user));
         
         // Update state via callback — new users go to immersive onboarding
@@ -169,8 +246,16 @@ export async function register(username, password, email = null) {
  * Logout user
  */
 export function logout() {
-    localStorage.removeItem('token');
-    localStorage.removeItem('user');
+    flushEvents();
+    const token = localStorage.getItem('token');
+    if (token) {
+        // Best-effort server-side revocation; the local logout never waits on it
+        fetch(`${API_URL}/auth/logout`, {
+            method: 'POST',
+            headers: { 'Authorization': `Bearer ${token}` }
+        }).catch(() => {});
+    }
+    clearStoredAuth();
     if (authClearer) authClearer();
     showToast('Logged out successfully', 'info');
 }
@@ -204,6 +289,7 @@ export async function getQuiz(id) {
  * Uses a longer timeout since generation can take 5-30 seconds
  */
 export async function generateQuizAI(params) {
+    await ensureFreshToken();
     const token = localStorage.getItem('token');
     const headers = { 'Content-Type': 'application/json' };
     if (token) headers['Authorization'] = `Bearer ${token}`;
@@ -224,8 +310,7 @@ export async function generateQuizAI(params) {
 
         if (!res.ok) {
             if (res.status === 401) {
-                localStorage.removeItem('token');
-                localStorage.removeItem('user');
+                clearStoredAuth();
                 if (authClearer) authClearer();
                 showToast('Session expired - please log in again', 'error');
             }
@@ -249,6 +334,7 @@ export async function generateQuizAI(params) {
  * Upload a file and extract text for study material
  */
 export async function uploadMaterial(file) {
+    await ensureFreshToken();
     const token = localStorage.getItem('token');
     const formData = new FormData();
     formData.append('file', file);
@@ -272,8 +358,7 @@ export async function uploadMaterial(file) {
 
         if (!res.ok) {
             if (res.status === 401) {
-                localStorage.removeItem('token');
-                localStorage.removeItem('user');
+                clearStoredAuth();
                 if (authClearer) authClearer();
                 showToast('Session expired - please log in again', 'error');
             }
@@ -412,6 +497,16 @@ export async function saveQuizProgressToServer(quizId, progressData) {
     });
 }
 
+/**
+ * Send only the changed parts of quiz progress (see PATCH /api/progress/<id>)
+ */
+export async function patchQuizProgressOnServer(quizId, delta) {
+    return await apiCall(`/progress/${quizId}`, {
+        method: 'PATCH',
+        body: JSON.stringify(delta)
+    });
+}
+
 /**
  * Clear quiz progress on server
  */
@@ -531,16 +626,27 @@ export async function getWeakQuestions(certId = null, limit = 20) {
 // ==================== Exam Simulation ====================
 
 /**
- * Start an exam simulation
+ * Start an exam simulation (omitAnswers: leave out answer keys; grade with gradeAnswers)
  */
-export async function startSimulation(certId, questionCount = null) {
+export async function startSimulation(certId, questionCount = null, omitAnswers = false) {
     const data = await apiCall(`/certifications/${certId}/simulate`, {
         method: 'POST',
-        body: JSON.stringify({ question_count: questionCount })
+        body: JSON.stringify({ question_count: questionCount, omit_answers: omitAnswers })
     });
     return data.simulation;
 }
 
+/**
+ * Grade answers server-side. answers: { [questionId]: answer } using original
+ * (unshuffled) option indices. Resolves to { results, score, total, missing }.
+ */
+export async function gradeAnswers(answers) {
+    return await apiCall('/grade', {
+        method: 'POST',
+        body: JSON.stringify({ answers })
+    });
+}
+
 /**
  * Record a completed exam simulation
  */
@@ -554,11 +660,49 @@ export async function recordSimulation(payload) {
 /**
  * Log an analytics event (fire-and-forget, never throws)
  */
-export function logEvent(event, metadata = null) {
-    apiCall('/events', {
+const EVENT_BATCH_SIZE = 20;
+const EVENT_FLUSH_MS = 2000;
+let pendingEvents = [];
+let eventFlushTimer = null;
+
+/**
+ * Send queued events in one request. Best-effort: failures are ignored and
+ * no auth handling runs, so a flush racing logout never shows an error.
+ * An expiring signed access token is refreshed first, or the server would
+ * reject the batch. keepalive lets the request outlive the page when it is
+ * being hidden.
+ */
+async function flushEvents(keepalive = false) {
+    clearTimeout(eventFlushTimer);
+    eventFlushTimer = null;
+    let token = localStorage.getItem('token');
+    if (!pendingEvents.length || !token) return;
+    const events = pendingEvents;
+    pendingEvents = [];
+    if (tokenExpiring()) {
+        await refreshAccessToken();
+        token = localStorage.getItem('token');
+        if (!token) return;
+    }
+    fetch(`${API_URL}/events`, {
         method: 'POST',
-        body: JSON.stringify({ event, metadata })
-    }).catch(() => {}); // Silently ignore failures
+        keepalive,
+        headers: { 'Content-Type': 'application/json', 'Authorization': `Bearer ${token}` },
+        body: JSON.stringify({ events })
+    }).catch(() => {});
+}
+
+document.addEventListener('visibilitychange', () => {
+    if (document.visibilityState === 'hidden') flushEvents(true);
+});
+
+export function logEvent(event, metadata = null) {
+    pendingEvents.push({ event, metadata });
+    if (pendingEvents.length >= EVENT_BATCH_SIZE) {
+        flushEvents();
+    } else if (!eventFlushTimer) {
+        eventFlushTimer = setTimeout(flushEvents, EVENT_FLUSH_MS);
+    }
 }
 
 // ==================== Study Sessions ====================
@@ -646,6 +790,17 @@ export async function addToReview(questionIds) {
     });
 }
 
+/**
+ * Build a review deck on the server from one source, without listing ids:
+ * { quizId }, { certificationId, domainId } or { weak: true, certificationId?, limit? }
+ */
+export async function addDeckToReview(deck) {
+    return await apiCall('/srs/cards', {
+        method: 'POST',
+        body: JSON.stringify(deck)
+    });
+}
+
 /**
  * Get cards due for review
  */
@@ -653,6 +808,13 @@ export async function getDueCards(limit = 20) {
     return await apiCall(`/srs/due?limit=${limit}`);
 }
 
+/**
+ * Get specific cards (a previous response's next_card_ids) and the ids after them
+ */
+export async function getDueCardsByIds(ids, limit = 20) {
+    return await apiCall(`/srs/due?limit=${limit}&ids=${ids.join(',')}`);
+}
+
 /**
  * Submit a review result (SM-2 algorithm)
  */
@@ -663,6 +825,18 @@ export async function submitReview(cardId, quality) {
     });
 }
 
+/**
+ * Submit reviews in order in one request: [{ cardId, quality, reviewedAt }].
+ * Re-sending reviews the server already applied is harmless (they are skipped).
+ * A rejected review fails the request with status 400 and data.index set.
+ */
+export async function submitReviewBatch(reviews) {
+    return await apiCall('/srs/review/batch', {
+        method: 'POST',
+        body: JSON.stringify({ reviews })
+    });
+}
+
 /**
  * Get SRS statistics
  */
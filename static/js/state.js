@@ -7,6 +7,7 @@ import {
     saveProfileToServer,
     getQuizProgress,
     saveQuizProgressToServer,
+    patchQuizProgressOnServer,
     clearQuizProgressOnServer,
     getAllProgress,
     registerStateCallbacks
@@ -167,7 +168,10 @@ export function saveAuth(token, user) {
 
 export function clearAuth() {
     localStorage.removeItem('token');
+    localStorage.removeItem('refresh_token');
+    localStorage.removeItem('token_expires_at');
     localStorage.removeItem('user');
+    syncedProgress = null;
     setState({ isAuthenticated: false, user: null, token: null, view: 'landing', profileLoaded: false });
 }
 
@@ -239,14 +243,16 @@ export function getUnlockedAchievements() { return []; }
 
 // ==================== QUIZ PROGRESS (SERVER SYNC) ====================
 
-/**
- * Save quiz progress to server
- */
-export async function saveQuizProgress() {
-    const s = getState();
-    if (!s.currentQuiz) return;
-    
-    const progressData = {
+// Last progress the server accepted, so saves only send what changed.
+// Saves run one at a time; calls made while one is waiting collapse into it.
+let syncedProgress = null;  // { quizId, snapshot }
+let progressSaveChain = Promise.resolve();
+let progressSaveQueued = false;
+
+const PROGRESS_FIELDS = ['question_index', 'study_mode', 'randomize_options', 'timer_enabled', 'time_remaining'];
+
+function progressSnapshot(s) {
+    return JSON.parse(JSON.stringify({
         question_index: s.currentQuestionIndex,
         answers: s.answers,
         flagged: Array.from(s.flaggedQuestions),
@@ -255,18 +261,71 @@ export async function saveQuizProgress() {
         option_shuffles: s.optionShuffles,
         timer_enabled: s.timerEnabled,
         time_remaining: s.timeRemaining,
-    };
-    
-    try {
-        await saveQuizProgressToServer(s.currentQuiz.id, progressData);
-    } catch (e) {
-        console.error('Failed to save progress to server:', e);
-        // Fallback to localStorage
-        localStorage.setItem(`quizmaster_progress_${s.currentQuiz.id}`, JSON.stringify({
-            ...progressData,
-            savedAt: Date.now(),
-        }));
+    }));
+}
+
+function progressDelta(prev, next) {
+    const delta = {};
+    for (const field of PROGRESS_FIELDS) {
+        if (prev[field] !== next[field]) delta[field] = next[field] ?? null;
     }
+    const same = (a, b) => JSON.stringify(a ?? null) === JSON.stringify(b ?? null);
+
+    const answers = {};
+    const answerCount = Math.max(prev.answers.length, next.answers.length);
+    for (let i = 0; i < answerCount; i++) {
+        if (!same(prev.answers[i], next.answers[i])) answers[i] = next.answers[i] ?? null;
+    }
+    if (Object.keys(answers).length) delta.answers = answers;
+
+    const flagged = {};
+    const wasFlagged = new Set(prev.flagged);
+    const isFlagged = new Set(next.flagged);
+    for (const i of isFlagged) if (!wasFlagged.has(i)) flagged[i] = true;
+    for (const i of wasFlagged) if (!isFlagged.has(i)) flagged[i] = false;
+    if (Object.keys(flagged).length) delta.flagged = flagged;
+
+    const shuffles = {};
+    for (const key of new Set([...Object.keys(prev.option_shuffles), ...Object.keys(next.option_shuffles)])) {
+        if (!same(prev.option_shuffles[key], next.option_shuffles[key])) shuffles[key] = next.option_shuffles[key] ?? null;
+    }
+    if (Object.keys(shuffles).length) delta.option_shuffles = shuffles;
+    return delta;
+}
+
+/**
+ * Save quiz progress to server: the full state the first time for a quiz,
+ * then only what changed since the last successful save.
+ */
+export function saveQuizProgress() {
+    if (progressSaveQueued) return progressSaveChain;
+    progressSaveQueued = true;
+    progressSaveChain = progressSaveChain.then(async () => {
+        progressSaveQueued = false;
+        const s = getState();
+        if (!s.currentQuiz) return;
+        const quizId = s.currentQuiz.id;
+        const snapshot = progressSnapshot(s);
+
+        try {
+            if (syncedProgress && syncedProgress.quizId === quizId) {
+                const delta = progressDelta(syncedProgress.snapshot, snapshot);
+                if (Object.keys(delta).length) await patchQuizProgressOnServer(quizId, delta);
+            } else {
+                await saveQuizProgressToServer(quizId, snapshot);
+            }
+            syncedProgress = { quizId, snapshot };
+        } catch (e) {
+            console.error('Failed to save progress to server:', e);
+            syncedProgress = null;  // resend the full state next time
+            // Fallback to localStorage
+            localStorage.setItem(`quizmaster_progress_${quizId}`, JSON.stringify({
+                ...snapshot,
+                savedAt: Date.now(),
+            }));
+        }
+    });
+    return progressSaveChain;
 }
 
 /**
@@ -310,6 +369,8 @@ export async function loadQuizProgress(quizId) {
  * Clear quiz progress on server
  */
 export async function clearQuizProgress(quizId) {
+    await progressSaveChain;  // don't let an in-flight save recreate the cleared row
+    if (syncedProgress && syncedProgress.quizId === quizId) syncedProgress = null;
     try {
         await clearQuizProgressOnServer(quizId);
     } catch (e) {
@@ -0,0 +1,96 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture(scope='session')
+def server(tmp_path_factory):
+    """quiz_server, imported against a scratch database."""
+    os.environ['QUIZ_DATABASE'] = str(tmp_path_factory.mktemp('db') / 'quiz_test.db')
+    import quiz_server
+    return quiz_server
+
+
+@pytest.fixture
+def db(server):
+    """A cursor on the scratch database; everything it writes is rolled back."""
+    conn = server._connect()
+    c = conn.cursor()
+    c.execute('BEGIN')
+    yield c
+    conn.rollback()
+    conn.close()
+
+
+_user_seq = iter(range(1, 10 ** 6))
+
+
+@pytest.fixture
+def make_user(db):
+    """Create a user row and return its id."""
+    def make():
+        n = next(_user_seq)
+        db.execute("INSERT INTO users (username, email, password_hash, salt) VALUES (?, ?, 'x', 'x')",
+                   (f'test{n}', f'test{n}@example.com'))
+        return db.lastrowid
+    return make
+
+
+@pytest.fixture
+def api(server):
+    """call(method, url, body=None, user=None) -> (status, json) through the Flask test client.
+
+    users are registered on first use by name and stay logged in for the session.
+    """
+    client = server.app.test_client()
+    tokens = {}
+
+    def call(method, url, body=None, user=None):
+        headers = {}
+        if user is not None:
+            if user not in tokens:
+                n = next(_user_seq)
+                r = client.post('/api/auth/register', json={
+                    'username': f'{user}{n}', 'email': f'{user}{n}@example.com', 'password': 'password123'})
+                tokens[user] = r.get_json()['token']
+            headers['Authorization'] = f'Bearer {tokens[user]}'
+        r = getattr(client, method)(url, json=body, headers=headers)
+        return r.status_code, r.get_json()
+    return call
+
+
+@pytest.fixture
+def make_quiz(api):
+    """make(user, questions=None, public=False) -> (quiz_id, [question ids]), created through the API.
+
+    questions defaults to three choice questions whose answer is option 1.
+    """
+    def make(user, questions=None, public=False):
+        if questions is None:
+            questions = [{'question': f'Q{i}', 'type': 'choice', 'options': ['a', 'b', 'c'], 'correct': [1]}
+                         for i in range(3)]
+        _, r = api('post', '/api/quizzes', {'title': 'T', 'questions': questions}, user)
+        quiz_id = r['quiz_id']
+        if public:
+            api('patch', f'/api/quizzes/{quiz_id}/settings', {'is_public': True}, user)
+        _, r = api('get', f'/api/quizzes/{quiz_id}', user=user)
+        return quiz_id, [q['id'] for q in r['quiz']['questions']]
+    return make
+
+
+@pytest.fixture
+def make_db_quiz(server, db, make_user):
+    """make(questions, user_id=None) -> (quiz_id, [question ids]), inserted on the db cursor."""
+    def make(questions, user_id=None):
+        if user_id is None:
+            user_id = make_user()
+        db.execute("INSERT INTO quizzes (user_id, title, questions, is_migrated) VALUES (?, 'T', '[]', 1)",
+                   (user_id,))
+        quiz_id = db.lastrowid
+        server._insert_questions_for_quiz(db, quiz_id, questions)
+        db.execute('SELECT id FROM questions WHERE quiz_id = ? ORDER BY question_index', (quiz_id,))
+        return quiz_id, [row['id'] for row in db.fetchall()]
+    return make
@@ -0,0 +1,47 @@
+"""POST /api/auth/login: password hashing never holds a database connection."""
+
+import hashlib
+import sqlite3
+
+import pytest
+
+
+@pytest.fixture
+def hash_calls(server, monkeypatch):
+    """Records, for every hash pool job, whether the request had a pooled connection bound."""
+    calls = []
+    run = server._hash_pool.run
+
+    def spy(fn, *args):
+        calls.append((fn.__name__, server.g.get('_db_conn') is not None))
+        return run(fn, *args)
+    monkeypatch.setattr(server._hash_pool, 'run', spy)
+    return calls
+
+
+def test_login_hashes_without_a_request_connection(server, api, hash_calls):
+    api('post', '/api/auth/register', {'username': 'hasher', 'email': 'hasher@example.com',
+                                      'password': 'password123'})
+    hash_calls.clear()
+    client = server.app.test_client()
+    r = client.post('/api/auth/login', json={'username': 'hasher', 'password': 'password123'})
+    assert r.status_code == 200 and r.get_json()['token']
+    r = client.post('/api/auth/login', json={'username': 'hasher', 'password': 'wrong-password'})
+    assert r.status_code == 401
+    assert hash_calls == [('_verify_password_scheme', False)] * 2
+
+
+def test_legacy_hash_is_upgraded_on_login(server, api, hash_calls):
+    api('post', '/api/auth/register', {'username': 'legacy', 'email': 'legacy@example.com',
+                                      'password': 'password123'})
+    conn = sqlite3.connect(server.DATABASE)
+    conn.execute("UPDATE users SET password_hash = ?, salt = 'pepper' WHERE username = 'legacy'",
+                 (hashlib.sha256(b'password123pepper').hexdigest(),))
+    conn.commit()
+    hash_calls.clear()
+    r = server.app.test_client().post('/api/auth/login', json={'username': 'legacy', 'password': 'password123'})
+    assert r.status_code == 200
+    assert hash_calls == [('_verify_password_scheme', False), ('hash_password', False)]
+    stored, salt = conn.execute("SELECT password_hash, salt FROM users WHERE username = 'legacy'").fetchone()
+    conn.close()
+    assert server._verify_password_scheme('password123', stored, salt) == server.PASSWORD_SCHEME
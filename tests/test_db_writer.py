@@ -0,0 +1,44 @@
+"""DBWriter: jobs share one transaction, but a failing job only loses its own writes."""
+
+import pytest
+
+
+@pytest.fixture
+def writer(server):
+    w = server.DBWriter(max_batch=10, window=0.1)
+    w.run(lambda c: c.execute('CREATE TABLE IF NOT EXISTS writer_test (job TEXT)'))
+    yield w
+    w.run(lambda c: c.execute('DROP TABLE writer_test'))
+    w.stop()
+
+
+def insert(c, job, fail=False):
+    c.execute('INSERT INTO writer_test (job) VALUES (?)', (job,))
+    if fail:
+        raise ValueError(job)
+    return job
+
+
+def test_failed_job_rolls_back_alone(server, writer):
+    batches = writer.stats()['batches']
+    futures = [writer.submit(insert, 'a'), writer.submit(insert, 'b', True), writer.submit(insert, 'c')]
+    assert futures[0].result(5) == 'a' and futures[2].result(5) == 'c'
+    with pytest.raises(ValueError):
+        futures[1].result(5)
+    assert writer.stats()['batches'] == batches + 1
+
+    conn = server._connect()
+    rows = sorted(row['job'] for row in conn.execute('SELECT job FROM writer_test'))
+    conn.close()
+    assert rows == ['a', 'c']
+
+
+def test_execute_returns_rowcount(writer):
+    writer.run(insert, 'x')
+    writer.run(insert, 'x')
+    assert writer.execute("UPDATE writer_test SET job = 'y' WHERE job = 'x'") == 2
+
+
+def test_jobs_cannot_submit_jobs(writer):
+    with pytest.raises(RuntimeError):
+        writer.run(lambda c: writer.submit(insert, 'nested'))
@@ -0,0 +1,74 @@
+"""user_domain_stats must stay equal to a rebuild from question_performance."""
+
+import random
+from datetime import datetime, timedelta
+
+T0 = datetime(2025, 3, 1, 8, 0)
+
+
+def domain_snapshot(db):
+    """Non-empty rows keyed by (user, domain); last_seen_at is compared separately."""
+    db.execute('SELECT * FROM user_domain_stats')
+    return {(row['user_id'], row['domain_id']): (row['times_seen'], row['times_correct'], row['times_incorrect'],
+                                                  row['unique_questions'])
+            for row in db.fetchall() if row['unique_questions'] or row['times_seen']}
+
+
+def test_domain_counters_match_rebuild(server, db, make_user, make_db_quiz):
+    rng = random.Random(2)
+    users = [make_user() for _ in range(3)]
+    _, questions = make_db_quiz([{'question': f'd{i}', 'correct': [0]} for i in range(12)], users[0])
+    db.execute('SELECT id FROM domains ORDER BY id LIMIT 4')
+    domains = [row['id'] for row in db.fetchall()]
+    assert domains, 'seeded certification domains are missing'
+
+    for step in range(1500):
+        op = rng.random()
+        at = T0 + timedelta(minutes=rng.randint(0, 10000))
+        if op < 0.45:
+            correct = rng.random() < 0.6
+            db.execute(server._QUESTION_PERFORMANCE_UPSERT_SQL,
+                       (rng.choice(users), rng.choice(questions), int(correct), int(not correct),
+                        at, at if correct else None, None, at))
+        elif op < 0.6:
+            db.execute('''UPDATE question_performance SET times_seen = times_seen + 2, times_correct = times_correct + 1,
+                          times_incorrect = times_incorrect + 1, last_seen_at = ?
+                          WHERE user_id = ? AND question_id = ?''', (at, rng.choice(users), rng.choice(questions)))
+        elif op < 0.7:
+            db.execute('DELETE FROM question_performance WHERE user_id = ? AND question_id = ?',
+                       (rng.choice(users), rng.choice(questions)))
+        elif op < 0.85:
+            db.execute('INSERT OR IGNORE INTO question_domains (question_id, domain_id) VALUES (?, ?)',
+                       (rng.choice(questions), rng.choice(domains)))
+        elif op < 0.97:
+            db.execute('DELETE FROM question_domains WHERE question_id = ? AND domain_id = ?',
+                       (rng.choice(questions), rng.choice(domains)))
+        elif len(users) > 1:
+            # Deleting a user cascades through question_performance
+            db.execute('DELETE FROM users WHERE id = ?', (users.pop(),))
+
+    db.execute('SELECT user_id, domain_id, last_seen_at FROM user_domain_stats')
+    last_seen = {(row['user_id'], row['domain_id']): row['last_seen_at'] for row in db.fetchall()}
+    maintained = domain_snapshot(db)
+    server.rebuild_user_domain_stats(db)
+    assert maintained == domain_snapshot(db)
+
+    # last_seen_at only moves forward, so it may be newer than the rebuilt value, never older
+    db.execute('SELECT user_id, domain_id, last_seen_at FROM user_domain_stats')
+    for row in db.fetchall():
+        kept = last_seen[(row['user_id'], row['domain_id'])]
+        assert str(kept) >= str(row['last_seen_at'])
+
+
+def test_domain_stats_sum_performance_per_domain(server, db, make_user, make_db_quiz):
+    user_id = make_user()
+    _, (q1, q2) = make_db_quiz([{'question': 'x', 'correct': [0]}, {'question': 'y', 'correct': [0]}], user_id)
+    db.execute('SELECT id FROM domains ORDER BY id LIMIT 1')
+    domain = db.fetchone()['id']
+    db.executemany('INSERT INTO question_domains (question_id, domain_id) VALUES (?, ?)', [(q1, domain), (q2, domain)])
+    for question, correct in ((q1, 1), (q1, 0), (q2, 1)):
+        db.execute(server._QUESTION_PERFORMANCE_UPSERT_SQL,
+                   (user_id, question, correct, 1 - correct, T0, T0 if correct else None, None, T0))
+    db.execute('SELECT * FROM user_domain_stats WHERE user_id = ? AND domain_id = ?', (user_id, domain))
+    row = db.fetchone()
+    assert (row['times_seen'], row['times_correct'], row['times_incorrect'], row['unique_questions']) == (3, 2, 1, 2)
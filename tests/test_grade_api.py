@@ -0,0 +1,44 @@
+"""POST /api/grade: only visible questions are graded; omit_answers simulations rely on it."""
+
+import sqlite3
+
+
+def test_private_answer_keys_are_not_graded_for_others(api, make_quiz):
+    _, ids = make_quiz('owner')
+    body = {'answers': {str(i): 1 for i in ids}}
+    status, r = api('post', '/api/grade', body, 'owner')
+    assert status == 200 and r['score'] == 3 and all(v['correct'] == [1] for v in r['results'].values())
+    status, r = api('post', '/api/grade', body, 'stranger')
+    assert status == 200 and r['results'] == {} and sorted(r['missing']) == sorted(str(i) for i in ids)
+
+
+def test_public_quiz_is_gradable_by_anyone(api, make_quiz):
+    _, ids = make_quiz('author', public=True)
+    status, r = api('post', '/api/grade', {'answers': {str(ids[0]): 0}}, 'reader')
+    assert status == 200 and r['results'][str(ids[0])] == {'is_correct': False, 'correct': [1]}
+
+
+def test_omit_answers_simulation_is_graded_through_the_api(server, api, make_quiz):
+    _, ids = make_quiz('examinee')
+    _, r = api('get', '/api/certifications', user='examinee')
+    cert = r['certifications'][0]['id']
+    conn = sqlite3.connect(server.DATABASE)
+    domain = conn.execute('SELECT id FROM domains WHERE certification_id = ? LIMIT 1', (cert,)).fetchone()[0]
+    conn.executemany('INSERT OR IGNORE INTO question_domains (question_id, domain_id) VALUES (?, ?)',
+                     [(i, domain) for i in ids])
+    conn.commit()
+    try:
+        status, r = api('post', f'/api/certifications/{cert}/simulate',
+                        {'question_count': 3, 'omit_answers': True}, 'examinee')
+        assert status == 200
+        sim_ids = [q['id'] for q in r['simulation']['questions'] if q['id'] in ids]
+        assert sim_ids and not any('correct' in q for q in r['simulation']['questions'])
+
+        _, r = api('post', '/api/grade', {'answers': {str(i): 1 for i in sim_ids}}, 'examinee')
+        assert r['score'] == len(sim_ids)
+        assert all(v == {'is_correct': True, 'correct': [1]} for v in r['results'].values())
+    finally:
+        conn.execute('DELETE FROM question_domains WHERE domain_id = ? AND question_id IN (%s)'
+                     % ','.join('?' * len(ids)), (domain, *ids))
+        conn.commit()
+        conn.close()
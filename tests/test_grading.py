@@ -0,0 +1,102 @@
+"""CompiledQuestion must grade exactly as the pre-engine _check_answer_correct did."""
+
+import json
+
+import pytest
+
+
+def legacy_check(user_answer, correct_data, q_type, qrow):
+    """_check_answer_correct as it was before answers were graded by GradingEngine."""
+    if user_answer is None:
+        return False
+    if q_type == 'truefalse':
+        if isinstance(correct_data, list) and len(correct_data) > 0:
+            correct_bool = correct_data[0] == 0
+            user_bool = bool(user_answer)
+            return user_bool == correct_bool
+        return False
+    if q_type == 'choice':
+        if isinstance(correct_data, list) and len(correct_data) > 0:
+            if isinstance(user_answer, list):
+                return set(user_answer) == set(correct_data)
+            return user_answer == correct_data[0]
+        return user_answer == correct_data
+    elif q_type == 'matching':
+        if isinstance(user_answer, dict):
+            pairs = json.loads(qrow['pairs']) if qrow['pairs'] else []
+            return len(user_answer) == len(pairs)
+        return False
+    elif q_type == 'ordering':
+        if isinstance(user_answer, list):
+            expected = list(range(len(user_answer)))
+            actual = [item.get('origIndex', i) if isinstance(item, dict) else item
+                      for i, item in enumerate(user_answer)]
+            return actual == expected
+        return False
+    return False
+
+
+PAIRS = json.dumps([{'left': f'term {j}', 'right': f'definition {j}'} for j in range(3)])
+
+# (type, correct, pairs) x answers
+QUESTIONS = [
+    ('choice', [2], None),
+    ('choice', [0, 2], None),
+    ('choice', [], None),
+    ('choice', 1, None),
+    ('choice', None, None),
+    ('truefalse', [0], None),
+    ('truefalse', [1], None),
+    ('truefalse', [], None),
+    ('matching', [0, 1, 2], PAIRS),
+    ('matching', [0, 1, 2], None),
+    ('ordering', [0, 1, 2], None),
+    ('fillblank', ['x'], None),
+]
+ANSWERS = [
+    None, 0, 1, 2, True, False, 'True', '', [2], [0, 2], [2, 0], [0, 1, 2], [], [[2]],
+    {'0': 0, '1': 1, '2': 2}, {'0': 0}, {},
+    [0, 1, 2], [1, 0, 2], [{'origIndex': 0}, {'origIndex': 1}, {'origIndex': 2}],
+    [{'origIndex': 1}, {'origIndex': 0}], [{}, {}], ['a', 'b'],
+]
+
+
+def row_for(q_type, correct, pairs):
+    return {'id': 1, 'quiz_id': 1, 'type': q_type,
+            'correct': json.dumps(correct) if correct is not None else None, 'pairs': pairs}
+
+
+@pytest.mark.parametrize('q_type, correct, pairs', QUESTIONS)
+def test_compiled_grade_matches_legacy(server, q_type, correct, pairs):
+    row = row_for(q_type, correct, pairs)
+    grader = server.CompiledQuestion.from_row(row)
+    correct_data = json.loads(row['correct']) if row['correct'] else []
+    for answer in ANSWERS:
+        try:
+            expected = legacy_check(answer, correct_data, q_type, row)
+        except (TypeError, AttributeError):
+            expected = False  # the old grader raised here; the engine grades it as wrong
+        assert grader.grade(answer) == expected, (q_type, correct, answer)
+
+
+def test_unparseable_answer_key_grades_as_wrong(server):
+    grader = server.CompiledQuestion.from_row({'id': 1, 'quiz_id': 1, 'type': 'choice',
+                                               'correct': '[1,', 'pairs': None})
+    assert grader.grade(1) is False and grader.answer_key is None
+
+
+def test_engine_recompiles_edited_question(server):
+    engine = server.GradingEngine(10)
+    row = row_for('choice', [1], None)
+    assert engine.grade_many([row], [1]) == [True]
+    edited = dict(row, correct=json.dumps([3]))
+    assert engine.grade_many([edited], [1]) == [False]
+    assert engine.grade_many([edited], [3]) == [True]
+    assert engine.stats()['compiled'] == 2 and engine.stats()['hits'] == 1
+
+
+def test_engine_evicts_least_recently_used(server):
+    engine = server.GradingEngine(2)
+    rows = [dict(row_for('choice', [0], None), id=i) for i in range(3)]
+    engine.graders(rows)
+    assert engine.stats()['size'] == 2 and engine.stats()['evictions'] == 1
@@ -0,0 +1,78 @@
+"""optimize_srs.replay must model exactly what srs_scheduler.FSRSScheduler does."""
+
+import random
+from datetime import datetime, timedelta
+
+import pytest
+
+np = pytest.importorskip('numpy')
+
+import optimize_srs  # noqa: E402
+import srs_scheduler as srs  # noqa: E402
+
+T0 = datetime(2025, 1, 1, 9, 0)
+
+
+def scheduler_states(scheduler, qualities, gaps):
+    """(stability, difficulty) after each review, replayed through FSRSScheduler."""
+    state, at, states = srs.CardState(2.5, 0, 0), T0, []
+    for quality, gap in zip(qualities, gaps):
+        at += timedelta(days=gap)
+        review = scheduler.review(state, quality, at)
+        states.append((review.stability, review.difficulty))
+        state = review.state()
+    return states
+
+
+@pytest.mark.parametrize('weights', [srs.DEFAULT_WEIGHTS, 'random'])
+def test_replay_matches_scheduler(weights):
+    rng = random.Random(7)
+    if weights == 'random':
+        weights = [rng.uniform(lo, hi) for lo, hi in srs.WEIGHT_BOUNDS]
+    scheduler = srs.FSRSScheduler(weights)
+
+    histories = []
+    for _ in range(40):
+        length = rng.randint(2, 12)
+        qualities = [rng.randint(0, 5) for _ in range(length)]
+        gaps = [0.0] + [rng.choice([0.2, 1, 3, 7.5, 30, 200]) for _ in range(length - 1)]
+        histories.append((qualities, gaps))
+
+    length = max(len(q) for q, _ in histories)
+    ratings = np.ones((len(histories), length), dtype=np.int64)
+    elapsed = np.zeros((len(histories), length))
+    mask = np.zeros((len(histories), length), dtype=bool)
+    for i, (qualities, gaps) in enumerate(histories):
+        ratings[i, :len(qualities)] = [srs.fsrs_rating(q) for q in qualities]
+        elapsed[i, :len(gaps)] = gaps
+        mask[i, :len(qualities)] = True
+
+    stability, difficulty, _ = optimize_srs.replay(np.array(weights), ratings, elapsed, mask)
+    for i, (qualities, gaps) in enumerate(histories):
+        for k, (s, d) in enumerate(scheduler_states(scheduler, qualities, gaps)):
+            assert stability[i, k] == pytest.approx(s, rel=1e-9)
+            assert difficulty[i, k] == pytest.approx(d, rel=1e-9)
+
+
+def test_log_loss_prefers_the_weights_that_generated_the_reviews():
+    rng = np.random.default_rng(3)
+    scheduler = srs.FSRSScheduler()
+    ratings = np.full((200, 8), srs.GOOD)
+    elapsed = np.zeros((200, 8))
+    for i in range(200):
+        stability = srs.DEFAULT_WEIGHTS[srs.GOOD - 1]
+        difficulty = scheduler.init_difficulty(srs.GOOD)
+        for k in range(1, 8):
+            t = float(rng.uniform(0.5, 3) * stability)
+            r = scheduler.retrievability(t, stability)
+            rating = srs.GOOD if rng.random() < r else srs.AGAIN
+            ratings[i, k], elapsed[i, k] = rating, t
+            stability = (scheduler.recall_stability(difficulty, stability, r, rating) if rating != srs.AGAIN
+                         else scheduler.forget_stability(difficulty, stability, r))
+            stability = min(float(srs.MAX_INTERVAL), max(0.01, stability))
+            difficulty = scheduler.next_difficulty(difficulty, rating)
+    mask = np.ones_like(ratings, dtype=bool)
+    true_loss = optimize_srs.log_loss(np.array(srs.DEFAULT_WEIGHTS), ratings, elapsed, mask)
+    skewed = np.array(srs.DEFAULT_WEIGHTS)
+    skewed[2] *= 5
+    assert true_loss < optimize_srs.log_loss(skewed, ratings, elapsed, mask)
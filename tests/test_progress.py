@@ -0,0 +1,88 @@
+"""Quiz progress deltas: merging then applying must equal applying one by one."""
+
+import copy
+import random
+
+import pytest
+
+
+def random_delta(server, rng):
+    if rng.random() < 0.1:
+        state = copy.deepcopy(server.PROGRESS_DEFAULTS)
+        state['question_index'] = rng.randint(0, 9)
+        state['answers'] = [rng.choice([None, 0, 1, [0, 2]]) for _ in range(rng.randint(0, 6))]
+        state['flagged'] = sorted(rng.sample(range(8), rng.randint(0, 3)))
+        return server._progress_delta(state)
+    body = {}
+    if rng.random() < 0.5:
+        body['question_index'] = rng.randint(0, 9)
+    if rng.random() < 0.3:
+        body['quiz_streak'] = rng.randint(0, 5)
+    if rng.random() < 0.7:
+        body['answers'] = {str(rng.randint(0, 9)): rng.choice([None, 0, 1, 2, True, [1, 3]])
+                           for _ in range(rng.randint(1, 3))}
+    if rng.random() < 0.4:
+        body['flagged'] = {str(rng.randint(0, 9)): rng.random() < 0.5 for _ in range(rng.randint(1, 2))}
+    if rng.random() < 0.3:
+        body['option_shuffles'] = {str(rng.randint(0, 9)): rng.choice([None, [2, 0, 1], [1, 0]])}
+    return server._parse_progress_patch(body)
+
+
+def test_merged_deltas_apply_like_the_sequence(server):
+    rng = random.Random(5)
+    for _ in range(500):
+        start = server._progress_state(None)
+        deltas = [random_delta(server, rng) for _ in range(rng.randint(1, 8))]
+
+        stepwise = copy.deepcopy(start)
+        for delta in deltas:
+            stepwise = server._apply_progress_delta(stepwise, copy.deepcopy(delta))
+
+        merged = deltas[0]
+        for delta in deltas[1:]:
+            merged = server._merge_progress_delta(merged, delta)
+        assert server._apply_progress_delta(copy.deepcopy(start), merged) == stepwise
+
+
+def test_apply_patch_to_state(server):
+    state = server._progress_state(None)
+    state['answers'] = [1]
+    state['flagged'] = [0, 4]
+    state['option_shuffles'] = {'0': [1, 0]}
+    delta = server._parse_progress_patch({'question_index': 3, 'answers': {'3': 2},
+                                          'flagged': {'4': False, '2': True},
+                                          'option_shuffles': {'0': None, '3': [0, 1]}})
+    state = server._apply_progress_delta(state, delta)
+    assert state['question_index'] == 3
+    assert state['answers'] == [1, None, None, 2]
+    assert state['flagged'] == [0, 2]
+    assert state['option_shuffles'] == {'3': [0, 1]}
+
+
+def test_replace_discards_earlier_deltas(server):
+    older = server._parse_progress_patch({'answers': {'0': 1}, 'question_index': 5})
+    full = dict(server.PROGRESS_DEFAULTS, answers=[2], question_index=1)
+    merged = server._merge_progress_delta(older, server._progress_delta(full))
+    state = server._apply_progress_delta(server._progress_state(None), merged)
+    assert state['answers'] == [2] and state['question_index'] == 1
+
+
+@pytest.mark.parametrize('body', [{'answers': [1, 2]}, {'answers': {'x': 1}}, {'flagged': {'-1': True}},
+                                  {'option_shuffles': {str(10 ** 6): [0]}}])
+def test_parse_patch_rejects_bad_input(server, body):
+    with pytest.raises(ValueError):
+        server._parse_progress_patch(body)
+
+
+def test_write_progress_applies_to_stored_row(server, db, make_user, make_db_quiz):
+    user_id = make_user()
+    quiz_id, _ = make_db_quiz([], user_id)
+    key = (user_id, quiz_id)
+    first = server._parse_progress_patch({'answers': {'0': 1}, 'question_index': 1})
+    second = server._parse_progress_patch({'answers': {'2': 0}, 'flagged': {'2': True}})
+    assert server._write_progress(db, [(key, first)]) == 1
+    assert server._write_progress(db, [(key, second)]) == 1
+    db.execute('SELECT * FROM quiz_progress WHERE user_id = ? AND quiz_id = ?', key)
+    state = server._progress_state(db.fetchone())
+    assert state['answers'] == [1, None, 0] and state['flagged'] == [2] and state['question_index'] == 1
+    assert state['option_shuffles'] == {}
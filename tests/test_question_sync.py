@@ -0,0 +1,114 @@
+"""_sync_questions_for_quiz: edits keep question ids; removals are soft deletes."""
+
+import pytest
+
+
+def q(text, correct=0, **extra):
+    return {'question': text, 'type': 'choice', 'options': ['a', 'b', 'c'], 'correct': [correct], **extra}
+
+
+@pytest.fixture
+def quiz(server, db, make_db_quiz):
+    """(quiz_id, read) for a quiz with three questions; read() returns its active questions."""
+    quiz_id, _ = make_db_quiz([q('one'), q('two'), q('three')])
+    return quiz_id, lambda: server._read_questions_for_quiz(db, quiz_id)
+
+
+def test_unchanged_list_writes_nothing(server, db, quiz):
+    quiz_id, read = quiz
+    before = read()
+    changes = server._sync_questions_for_quiz(db, quiz_id, before)
+    assert changes == {'inserted': 0, 'updated': 0, 'removed': 0, 'unchanged': 3}
+    assert read() == before
+
+
+def test_edit_by_id_keeps_the_row(server, db, quiz):
+    quiz_id, read = quiz
+    questions = read()
+    questions[1]['correct'] = [2]
+    questions[1]['question'] = 'two, reworded'
+    changes = server._sync_questions_for_quiz(db, quiz_id, questions)
+    assert changes['updated'] == 1 and changes['inserted'] == 0
+    after = read()
+    assert after[1]['id'] == questions[1]['id'] and after[1]['correct'] == [2]
+
+
+def test_text_editor_round_trip_without_ids(server, db, quiz):
+    quiz_id, read = quiz
+    before = read()
+    stripped = [{k: v for k, v in question.items() if k != 'id'} for question in before]
+    # Reordered questions are found by content
+    reordered = [stripped[2], stripped[0], stripped[1]]
+    changes = server._sync_questions_for_quiz(db, quiz_id, reordered)
+    assert changes == {'inserted': 0, 'updated': 3, 'removed': 0, 'unchanged': 0}
+    assert [x['id'] for x in read()] == [before[2]['id'], before[0]['id'], before[1]['id']]
+
+    # An edited question keeps its row when it stays in its slot with the same
+    # stem, or the same type and options
+    current = read()
+    edited = [{k: v for k, v in question.items() if k != 'id'} for question in current]
+    edited[1]['correct'] = [1]
+    edited[2]['question'] = 'two?'
+    changes = server._sync_questions_for_quiz(db, quiz_id, edited)
+    assert changes == {'inserted': 0, 'updated': 2, 'removed': 0, 'unchanged': 1}
+    after = read()
+    assert [x['id'] for x in after] == [x['id'] for x in current]
+    assert after[1]['correct'] == [1] and after[2]['question'] == 'two?'
+
+
+def test_removed_question_is_soft_deleted_and_revived(server, db, quiz):
+    quiz_id, read = quiz
+    before = read()
+    changes = server._sync_questions_for_quiz(db, quiz_id, [before[0], before[2]])
+    assert changes['removed'] == 1
+    db.execute('SELECT is_active FROM questions WHERE id = ?', (before[1]['id'],))
+    assert db.fetchone()['is_active'] == 0
+    assert [x['id'] for x in read()] == [before[0]['id'], before[2]['id']]
+
+    # Pasting the same question back (no id) reuses the old row and its history
+    revived = [before[0], {k: v for k, v in before[1].items() if k != 'id'}, before[2]]
+    changes = server._sync_questions_for_quiz(db, quiz_id, revived)
+    assert changes['inserted'] == 0
+    assert [x['id'] for x in read()] == [x['id'] for x in before]
+
+
+
+def test_removed_question_leaves_weak_list_and_bookmarks(api, make_quiz):
+    questions = [q('one'), q('two'), q('three')]
+    quiz_id, ids = make_quiz('editor', questions)
+    for _ in range(2):
+        api('post', f'/api/quizzes/{quiz_id}/attempts', {'answers': {'0': 1, '1': 1, '2': 1}}, 'editor')
+    for question_id in ids:
+        api('post', '/api/bookmarks', {'question_id': question_id}, 'editor')
+
+    _, r = api('get', '/api/questions/weak', user='editor')
+    assert {x['question_id'] for x in r['questions']} == set(ids)
+
+    status, _ = api('put', f'/api/quizzes/{quiz_id}', {'title': 'T', 'questions': [questions[0], questions[2]]},
+                    'editor')
+    assert status == 200
+    _, r = api('get', '/api/questions/weak', user='editor')
+    assert {x['question_id'] for x in r['questions']} == {ids[0], ids[2]}
+    _, r = api('get', '/api/bookmarks', user='editor')
+    assert {x['question_id'] for x in r['bookmarks']} == {ids[0], ids[2]}
+
+def test_new_and_replaced_questions_are_inserted(server, db, quiz):
+    quiz_id, read = quiz
+    before = read()
+    replacement = {'question': 'something else', 'type': 'truefalse', 'options': ['True', 'False'],
+                   'correct': [0]}
+    changes = server._sync_questions_for_quiz(db, quiz_id, [before[0], replacement, before[2], q('four')])
+    assert changes == {'inserted': 2, 'updated': 0, 'removed': 1, 'unchanged': 2}
+    after = read()
+    assert after[0]['id'] == before[0]['id'] and after[2]['id'] == before[2]['id']
+    assert after[1]['id'] not in {x['id'] for x in before}
+    assert [x['question'] for x in after] == ['one', 'something else', 'three', 'four']
+
+
+def test_foreign_ids_are_not_claimed(server, db, quiz, make_db_quiz):
+    quiz_id, read = quiz
+    other_quiz, _ = make_db_quiz([q('theirs')])
+    theirs = server._read_questions_for_quiz(db, other_quiz)[0]
+    changes = server._sync_questions_for_quiz(db, quiz_id, read() + [dict(theirs, question='stolen')])
+    assert changes['inserted'] == 1
+    assert server._read_questions_for_quiz(db, other_quiz)[0]['question'] == 'theirs'
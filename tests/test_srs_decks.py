@@ -0,0 +1,35 @@
+"""POST /api/srs/cards: every deck source only adds questions the user may see."""
+
+import pytest
+
+
+def test_question_ids_from_private_quiz_are_not_added(api, make_quiz):
+    quiz_id, ids = make_quiz('alice')
+    status, r = api('post', '/api/srs/cards', {'questionIds': ids}, 'mallory')
+    assert status == 200 and r['added'] == 0
+    _, r = api('get', '/api/srs/due', user='mallory')
+    assert r['cards'] == []
+    status, r = api('post', '/api/srs/cards', {'quizId': quiz_id}, 'mallory')
+    assert r['added'] == 0
+
+
+def test_own_questions_are_added_once(api, make_quiz):
+    quiz_id, ids = make_quiz('bob')
+    assert api('post', '/api/srs/cards', {'questionIds': ids[:2]}, 'bob')[1] == {'added': 2, 'total_requested': 2}
+    assert api('post', '/api/srs/cards', {'quizId': quiz_id}, 'bob')[1] == {'added': 1, 'total_requested': 3}
+
+
+@pytest.mark.parametrize('body, message', [
+    ({}, 'No question IDs provided'),
+    ({'questionIds': [{}]}, 'questionIds must be integers'),
+    ({'questionIds': [True]}, 'questionIds must be integers'),
+    ({'questionIds': 5}, 'questionIds must be a list'),
+    ({'quizId': 'x'}, 'quizId must be an integer'),
+    ({'weak': True, 'limit': True}, 'limit must be an integer 1-500'),
+    ({'weak': True, 'limit': 501}, 'limit must be an integer 1-500'),
+    ({'certificationId': 1}, 'certificationId needs domainId or weak: true'),
+    ({'domainId': 3}, 'certificationId is required with domainId'),
+    ({'quizId': 1, 'weak': True}, 'Provide only one of questionIds, quizId, domainId or weak'),
+])
+def test_bad_deck_requests_are_rejected(api, body, message):
+    assert api('post', '/api/srs/cards', body, 'carol') == (400, {'error': message})
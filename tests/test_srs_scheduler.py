@@ -0,0 +1,153 @@
+"""Tests for srs_scheduler: SM-2 and FSRS scheduling."""
+
+import random
+from datetime import datetime, timedelta
+
+import pytest
+
+import srs_scheduler as srs
+
+T0 = datetime(2025, 1, 1, 9, 0)
+
+
+def legacy_sm2(ease_factor, interval, repetitions, quality):
+    """The SM-2 step submit_srs_review used to run inline."""
+    if quality >= 3:
+        if repetitions == 0:
+            interval = 1
+        elif repetitions == 1:
+            interval = 6
+        else:
+            interval = round(interval * ease_factor)
+        repetitions += 1
+    else:
+        repetitions = 0
+        interval = 1
+    ease_factor = max(1.3, ease_factor + (0.1 - (5 - quality) * (0.08 + (5 - quality) * 0.02)))
+    status = 'review' if repetitions > 0 else 'learning'
+    if interval >= 21:
+        status = 'graduated'
+    return ease_factor, interval, repetitions, status
+
+
+def test_sm2_matches_legacy_implementation():
+    rng = random.Random(11)
+    for _ in range(2000):
+        state, legacy = srs.CardState(2.5, 0, 0), (2.5, 0, 0)
+        for _ in range(rng.randint(1, 15)):
+            quality = rng.randint(0, 5)
+            review = srs.SM2Scheduler().review(state, quality, T0)
+            ease, interval, repetitions, status = legacy_sm2(*legacy, quality)
+            assert (review.ease_factor, review.interval_days, review.repetitions, review.status) == \
+                (ease, interval, repetitions, status)
+            state, legacy = review.state(), (ease, interval, repetitions)
+
+
+def test_sm2_pass_sequence():
+    state = srs.CardState(2.5, 0, 0)
+    intervals = []
+    for _ in range(4):
+        state = srs.sm2(state, 5)
+        intervals.append(state.interval_days)
+    assert intervals[:2] == [1, 6]
+    assert intervals[2] == round(6 * 2.7) and intervals[3] > intervals[2]
+
+
+def test_sm2_failure_resets_and_floors_ease():
+    state = srs.CardState(1.35, 30, 5)
+    state = srs.sm2(state, 0)
+    assert (state.interval_days, state.repetitions) == (1, 0)
+    assert state.ease_factor == srs.MIN_EASE
+
+
+def test_sm2_scheduler_review_dates_and_status():
+    review = srs.SM2Scheduler().review(srs.CardState(2.5, 20, 4), 4, T0)
+    assert review.interval_days == 50 and review.status == 'graduated'
+    assert review.reviewed_at == T0 and review.next_review_at == T0 + timedelta(days=50)
+    first = srs.SM2Scheduler().review(srs.CardState(2.5, 0, 0), 2, T0)
+    assert first.status == 'learning' and first.next_review_at == T0 + timedelta(days=1)
+
+
+def test_sm2_scheduler_drops_fsrs_state():
+    review = srs.SM2Scheduler().review(srs.CardState(2.5, 6, 2, 12.0, 4.0, T0), 4, T0 + timedelta(days=6))
+    assert review.stability is None and review.difficulty is None
+
+
+def fsrs_history(scheduler, qualities, gap_days):
+    """Review a new card with each quality in turn, gap_days apart; returns every Review."""
+    state, at, reviews = srs.CardState(2.5, 0, 0), T0, []
+    for quality in qualities:
+        review = scheduler.review(state, quality, at)
+        reviews.append(review)
+        state, at = review.state(), at + timedelta(days=gap_days)
+    return reviews
+
+
+def test_scheduler_is_abstract():
+    with pytest.raises(TypeError):
+        srs.Scheduler()
+
+
+def test_fsrs_first_review_uses_initial_stability():
+    scheduler = srs.FSRSScheduler()
+    review = scheduler.review(srs.CardState(2.5, 0, 0), 4, T0)
+    assert review.stability == srs.DEFAULT_WEIGHTS[srs.GOOD - 1]
+    assert review.difficulty == scheduler.init_difficulty(srs.GOOD)
+    assert review.repetitions == 1
+    assert review.next_review_at == T0 + timedelta(days=review.interval_days)
+
+
+def test_fsrs_passes_grow_the_interval():
+    reviews = fsrs_history(srs.FSRSScheduler(), [4, 4, 4, 4, 4], gap_days=10)
+    intervals = [r.interval_days for r in reviews]
+    assert intervals == sorted(intervals) and intervals[-1] > intervals[0]
+    assert reviews[-1].status == 'graduated'
+
+
+def test_fsrs_lapse_on_mature_card_comes_back_tomorrow():
+    scheduler = srs.FSRSScheduler()
+    mature = srs.CardState(2.5, 120, 6, 56.0, 5.0, T0)
+    review = scheduler.review(mature, 1, T0 + timedelta(days=60))
+    assert review.interval_days == srs.RELEARN_DAYS
+    assert review.repetitions == 0 and review.status == 'learning'
+    # The lowered stability is kept, so recovery starts from it rather than from scratch
+    assert 1 < review.stability < 56.0
+    again = scheduler.review(review.state(), 4, review.next_review_at)
+    assert again.interval_days > 1
+
+
+def test_fsrs_hard_and_easy_bracket_good():
+    scheduler = srs.FSRSScheduler()
+    state = srs.CardState(2.5, 10, 3, 10.0, 5.0, T0)
+    at = T0 + timedelta(days=10)
+    hard, good, easy = (scheduler.review(state, q, at).stability for q in (2, 4, 5))
+    assert hard < good < easy
+
+
+def test_fsrs_takes_over_sm2_card():
+    scheduler = srs.FSRSScheduler()
+    sm2_card = srs.CardState(2.5, 6, 2, None, None, T0)
+    review = scheduler.review(sm2_card, 4, T0 + timedelta(days=6))
+    assert review.stability > 6 and review.repetitions == 3
+
+
+@pytest.mark.parametrize('retention', [0, 0.0, 1, 1.5, -0.1, None, True, '0.9'])
+def test_fsrs_rejects_bad_retention(retention):
+    with pytest.raises(ValueError):
+        srs.FSRSScheduler(retention=retention)
+
+
+def test_fsrs_interval_follows_retention():
+    assert srs.FSRSScheduler(retention=0.9).interval(10) == 10
+    assert srs.FSRSScheduler(retention=0.8).interval(10) > 10
+    assert srs.FSRSScheduler(retention=0.95).interval(10) < 10
+
+
+def test_get_scheduler():
+    assert isinstance(srs.get_scheduler('sm2'), srs.SM2Scheduler)
+    fsrs = srs.get_scheduler('fsrs', retention=0.85)
+    assert isinstance(fsrs, srs.FSRSScheduler) and fsrs.retention == 0.85
+    with pytest.raises(ValueError):
+        srs.get_scheduler('leitner')
+    with pytest.raises(ValueError):
+        srs.get_scheduler('fsrs', weights=[1.0] * 3)
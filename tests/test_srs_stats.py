@@ -0,0 +1,119 @@
+"""srs_user_stats: trigger-maintained counts and the incremental streak."""
+
+import random
+from datetime import datetime, timedelta
+
+import pytest
+
+TODAY = datetime.now().replace(hour=12, minute=0, second=0, microsecond=0)
+
+
+@pytest.fixture
+def deck(db, make_user, make_db_quiz):
+    """(user_id, [card ids]): a user with one card per question of a ten-question quiz."""
+    user_id = make_user()
+    quiz_id, _ = make_db_quiz([{'question': f'q{i}', 'correct': [0]} for i in range(10)], user_id)
+    db.execute('INSERT INTO srs_cards (user_id, question_id) SELECT ?, id FROM questions WHERE quiz_id = ?',
+               (user_id, quiz_id))
+    db.execute('SELECT id FROM srs_cards WHERE user_id = ? ORDER BY id', (user_id,))
+    return user_id, [row['id'] for row in db.fetchall()]
+
+
+def stored_streak(db, user_id):
+    db.execute('SELECT streak_days, last_review_day FROM srs_user_stats WHERE user_id = ?', (user_id,))
+    row = db.fetchone()
+    return row['streak_days'], row['last_review_day']
+
+
+def stats_snapshot(db):
+    db.execute('SELECT * FROM srs_user_stats ORDER BY user_id')
+    return [dict(row) for row in db.fetchall()]
+
+
+def test_streak_extends_day_by_day(server, db, deck):
+    user_id, cards = deck
+    for offset in (3, 2, 1, 0):
+        server._apply_srs_reviews(db, user_id, [(cards[offset], 4, TODAY - timedelta(days=offset))])
+    assert stored_streak(db, user_id) == (4, TODAY.date().isoformat())
+    assert server._srs_summary(db, user_id)['streak'] == 4
+
+
+def test_gap_restarts_streak(server, db, deck):
+    user_id, cards = deck
+    for offset in (5, 4, 1, 0):
+        server._apply_srs_reviews(db, user_id, [(cards[offset], 4, TODAY - timedelta(days=offset))])
+    assert stored_streak(db, user_id) == (2, TODAY.date().isoformat())
+
+
+def test_late_offline_day_fills_the_gap(server, db, deck):
+    user_id, cards = deck
+    for offset in (3, 2, 0):
+        server._apply_srs_reviews(db, user_id, [(cards[offset], 4, TODAY - timedelta(days=offset))])
+    assert stored_streak(db, user_id)[0] == 1
+    # A review made offline yesterday syncs after today's
+    server._apply_srs_reviews(db, user_id, [(cards[1], 3, TODAY - timedelta(days=1))])
+    assert stored_streak(db, user_id) == (4, TODAY.date().isoformat())
+    assert stored_streak(db, user_id) == server._recompute_srs_streak(db, user_id)
+
+
+def test_streak_lapses_after_a_day_without_reviews(server, db, deck):
+    user_id, cards = deck
+    server._apply_srs_reviews(db, user_id, [(cards[0], 4, TODAY - timedelta(days=2)),
+                                            (cards[1], 4, TODAY - timedelta(days=1))])
+    assert stored_streak(db, user_id)[0] == 2
+    db.execute('UPDATE srs_user_stats SET last_review_day = ? WHERE user_id = ?',
+               ((TODAY - timedelta(days=2)).date().isoformat(), user_id))
+    assert server._srs_summary(db, user_id)['streak'] == 0
+
+
+def test_advance_matches_recompute_for_random_syncs(server, db, deck):
+    user_id, cards = deck
+    rng = random.Random(9)
+    reviews = [(rng.choice(cards), rng.randint(0, 5),
+                TODAY - timedelta(days=rng.randint(0, 12), minutes=rng.randint(0, 600)))
+               for _ in range(60)]
+    rng.shuffle(reviews)
+    while reviews:
+        size = rng.randint(1, 6)
+        batch, reviews = reviews[:size], reviews[size:]
+        batch.sort(key=lambda review: review[2])
+        server._apply_srs_reviews(db, user_id, batch)
+        assert stored_streak(db, user_id) == server._recompute_srs_streak(db, user_id)
+
+
+def test_card_counts_match_rebuild(server, db, deck, make_user):
+    user_id, cards = deck
+    rng = random.Random(4)
+    other_user = make_user()
+    db.execute('INSERT INTO srs_cards (user_id, question_id) SELECT ?, question_id FROM srs_cards WHERE user_id = ?',
+               (other_user, user_id))
+    db.execute('SELECT question_id FROM srs_cards WHERE user_id = ?', (user_id,))
+    question_ids = [row['question_id'] for row in db.fetchall()]
+    for step in range(300):
+        db.execute('SELECT id FROM srs_cards WHERE user_id IN (?, ?)', (user_id, other_user))
+        live = [row['id'] for row in db.fetchall()]
+        op = rng.random()
+        if op < 0.6 and live:
+            db.execute('UPDATE srs_cards SET status = ? WHERE id = ?',
+                       (rng.choice(['new', 'learning', 'review', 'graduated']), rng.choice(live)))
+        elif op < 0.75 and live:
+            server._apply_srs_reviews(db, user_id, [(rng.choice(live), rng.randint(0, 5),
+                                                     TODAY + timedelta(minutes=step))])
+        elif op < 0.9 and live:
+            db.execute('DELETE FROM srs_cards WHERE id = ?', (rng.choice(live),))
+        else:
+            db.execute('INSERT OR IGNORE INTO srs_cards (user_id, question_id, status) VALUES (?, ?, ?)',
+                       (rng.choice([user_id, other_user]), rng.choice(question_ids), rng.choice(['new', 'learning'])))
+    # Deleting a question cascades to its cards
+    db.execute('DELETE FROM questions WHERE id = (SELECT question_id FROM srs_cards WHERE user_id = ? LIMIT 1)',
+               (other_user,))
+
+    maintained = stats_snapshot(db)
+    server.rebuild_srs_user_stats(db)
+    rebuilt = stats_snapshot(db)
+    by_user = {row['user_id']: row for row in rebuilt}
+    for row in maintained:
+        if row['total_cards'] == 0:
+            assert row['user_id'] not in by_user or by_user[row['user_id']]['total_cards'] == 0
+        else:
+            assert row == by_user[row['user_id']]